@@ -2,10 +2,21 @@ from datetime import UTC
 
 from fastapi import APIRouter, Depends, HTTPException, status
 
+from app.core.http import http_pool_stats
+from app.core.indexes import index_manager
 from app.core.security import get_current_active_admin
 from app.models.user import User
-from app.services.analytics import get_top_urls
-from app.services.url import delete_short_url, get_short_url_by_code
+from app.services.analytics import count_clicks, get_top_urls
+from app.services.click_counters import click_counters
+from app.services.click_ingest import click_ingestor
+from app.services.code_pool import code_pool
+from app.services.expiry import expiry_sweeper
+from app.services.link_cache import code_filter_stats, link_cache
+from app.services.preview import preview_cache
+from app.services.preview_refresh import preview_refresher
+from app.services.preview_worker import preview_worker
+from app.services.short_code import counter_codes
+from app.services.url import create_metrics, delete_short_url, get_short_url_by_code
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -46,6 +57,28 @@ async def admin_delete_url(
     return {"message": "URL deleted successfully", "short_code": short_code}
 
 
+@router.get("/metrics")
+async def get_runtime_metrics(current_admin: User = Depends(get_current_active_admin)):
+    """
+    Get in-process cache and pipeline counters for this worker (admin only).
+    """
+    return {
+        "link_cache": link_cache.stats(),
+        "code_filter": code_filter_stats(),
+        "click_ingest": click_ingestor.stats(),
+        "click_counters": click_counters.stats(),
+        "expiry": expiry_sweeper.stats(),
+        "code_pool": code_pool.stats(),
+        "counter_codes": counter_codes.stats(),
+        "short_url_create": create_metrics.stats(),
+        "preview_cache": preview_cache.stats(),
+        "preview_worker": preview_worker.stats(),
+        "preview_refresh": preview_refresher.stats(),
+        "indexes": index_manager.stats(),
+        "http_pool": http_pool_stats(),
+    }
+
+
 @router.get("/stats/summary")
 async def get_admin_summary(current_admin: User = Depends(get_current_active_admin)):
     """
@@ -53,7 +86,6 @@ async def get_admin_summary(current_admin: User = Depends(get_current_active_adm
     """
     from datetime import datetime, timedelta
 
-    from app.models.click import ClickLog
     from app.models.url import ShortURL
     from app.models.user import User as UserModel
 
@@ -63,16 +95,16 @@ async def get_admin_summary(current_admin: User = Depends(get_current_active_adm
 
     # Get counts
     total_urls = await ShortURL.count()
-    total_clicks = await ClickLog.count()
+    total_clicks = await count_clicks()
     total_users = await UserModel.count()
 
     # Get today's activity
     urls_today = await ShortURL.find({"created_at": {"$gte": today_start}}).count()
-    clicks_today = await ClickLog.find({"timestamp": {"$gte": today_start}}).count()
+    clicks_today = await count_clicks(today_start)
 
     # Get this week's activity
     urls_this_week = await ShortURL.find({"created_at": {"$gte": week_start}}).count()
-    clicks_this_week = await ClickLog.find({"timestamp": {"$gte": week_start}}).count()
+    clicks_this_week = await count_clicks(week_start)
 
     return {
         "total_urls": total_urls,
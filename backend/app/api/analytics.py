@@ -34,11 +34,7 @@ async def get_url_statistics(short_code: str, current_user: User = Depends(get_c
                 status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view these stats"
             )
 
-    stats = await get_url_stats(short_code)
-    if not stats:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Statistics not found")
-
-    return stats
+    return await get_url_stats(short_url, days=30, date_format="%Y-%m-%d")
 
 
 @router.get("/{short_code}/realtime")
@@ -58,8 +54,13 @@ async def get_realtime_clicks(short_code: str, current_user: User = Depends(get_
         if short_url.user.id != current_user.id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
 
-    clicks = await get_real_time_clicks(short_code)
-    return {"short_code": short_code, "clicks": clicks}
+    counts = await get_real_time_clicks(short_code)
+    return {
+        "short_code": short_code,
+        "clicks": counts["total"],
+        "clicks_today": counts["today"],
+        "clicks_this_week": counts["this_week"],
+    }
 
 
 @router.get("/{short_code}/browsers")
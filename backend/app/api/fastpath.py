@@ -0,0 +1,89 @@
+import logging
+import re
+from functools import lru_cache
+from urllib.parse import quote
+
+from app.core.config import settings
+from app.services.click_ingest import enqueue_click
+from app.services.url import resolve_short_code
+
+logger = logging.getLogger(__name__)
+
+# A single path segment that could be a short code or custom alias
+SHORT_CODE_PATH = re.compile(r"/([A-Za-z0-9_-]{1,64})")
+
+
+@lru_cache(maxsize=settings.LINK_CACHE_MAX_SIZE)
+def _redirect_headers(original_url: str, cache_control: str) -> list[tuple[bytes, bytes]]:
+    # Same escaping as starlette's RedirectResponse
+    location = quote(original_url, safe=":/%#?=@[]!$&'()*+,;")
+    return [
+        (b"location", location.encode("latin-1")),
+        (b"cache-control", cache_control.encode("latin-1")),
+        (b"content-length", b"0"),
+    ]
+
+
+class RedirectFastPath:
+    """
+    ASGI middleware that answers short-code redirects before FastAPI routing.
+
+    Only successful redirects are served here. Reserved paths, misses,
+    deactivated or expired links and lookup errors fall through to the
+    regular redirect route so every error response stays the same.
+    """
+
+    def __init__(self, app, reserved: set[str] | frozenset[str] = frozenset()):
+        self.app = app
+        self.reserved = frozenset(reserved)
+
+    async def __call__(self, scope, receive, send):
+        # GET only, like the redirect route; HEAD from link checkers must not count as a click
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+
+        match = SHORT_CODE_PATH.fullmatch(scope["path"])
+        if not match or match.group(1) in self.reserved:
+            return await self.app(scope, receive, send)
+
+        try:
+            short_url = await resolve_short_code(match.group(1))
+        except Exception:
+            logger.warning("Fast path lookup failed, deferring to router", exc_info=True)
+            short_url = None
+
+        if short_url is None or not short_url.is_active or short_url.is_expired:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        client = scope.get("client")
+        await enqueue_click(
+            short_url=short_url,
+            ip_address=client[0] if client else None,
+            user_agent=_header(headers, b"user-agent"),
+            referrer=_header(headers, b"referer"),
+        )
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": short_url.redirect_status,
+                "headers": _redirect_headers(short_url.original_url, short_url.cache_control),
+            }
+        )
+        await send({"type": "http.response.body", "body": b""})
+
+
+def _header(headers: dict[bytes, bytes], name: bytes) -> str | None:
+    value = headers.get(name)
+    return value.decode("latin-1") if value is not None else None
+
+
+def reserved_root_paths(routes) -> set[str]:
+    """Collect the static single-segment paths an app serves (e.g. "health")."""
+    reserved = set()
+    for route in routes:
+        path = getattr(route, "path", "")
+        if path.count("/") == 1 and "{" not in path:
+            reserved.add(path.strip("/"))
+    return reserved
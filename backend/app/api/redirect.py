@@ -1,10 +1,10 @@
-from datetime import UTC, datetime
-
 from fastapi import APIRouter, HTTPException, Request, status
 from fastapi.responses import RedirectResponse
 
-from app.services.click import log_click
-from app.services.url import get_short_url_by_code
+from app.core.dates import has_expired
+from app.services.click_ingest import enqueue_click
+from app.services.link_cache import remember_missing, short_code_may_exist
+from app.services.url import get_short_url_by_code, resolve_short_code
 
 router = APIRouter(tags=["Redirect"])
 
@@ -13,34 +13,35 @@ router = APIRouter(tags=["Redirect"])
 async def redirect_to_url(short_code: str, request: Request):
     """
     Redirect to the original URL.
-    Uses 302 redirect to preserve analytics tracking.
+    Uses the link's redirect policy: an uncached 302 by default so every click
+    is tracked, or a cacheable 302/301 for links served from edge caches.
     """
-    short_url = await get_short_url_by_code(short_code)
+    short_url = await resolve_short_code(short_code)
 
     if not short_url:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
 
+    # Checked first because the expiry sweeper also deactivates expired links
+    if short_url.is_expired:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="URL has expired")
+
     if not short_url.is_active:
         raise HTTPException(status_code=status.HTTP_410_GONE, detail="URL has been deactivated")
 
-    # Check expiration
-    if short_url.expiration and datetime.now(UTC) > short_url.expiration:
-        raise HTTPException(status_code=status.HTTP_410_GONE, detail="URL has expired")
-
-    # Log the click asynchronously (fire and forget pattern)
+    # Queue the click for the background consumer (never blocks the redirect)
     client_ip = request.client.host if request.client else None
     user_agent = request.headers.get("user-agent")
     referrer = request.headers.get("referer")
 
-    try:
-        await log_click(
-            short_url=short_url, ip_address=client_ip, user_agent=user_agent, referrer=referrer
-        )
-    except Exception:
-        pass  # Don't fail redirect if logging fails
+    await enqueue_click(
+        short_url=short_url, ip_address=client_ip, user_agent=user_agent, referrer=referrer
+    )
 
-    # 302 redirect (not 301) to ensure we always track clicks
-    return RedirectResponse(url=short_url.original_url, status_code=status.HTTP_302_FOUND)
+    return RedirectResponse(
+        url=short_url.original_url,
+        status_code=short_url.redirect_status,
+        headers={"Cache-Control": short_url.cache_control},
+    )
 
 
 @router.get("/{short_code}/preview")
@@ -49,15 +50,22 @@ async def get_url_preview_page(short_code: str):
     Get URL preview information without redirecting.
     Useful for preview cards/tooltips.
     """
+    if not short_code_may_exist(short_code):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
+
     short_url = await get_short_url_by_code(short_code)
 
-    if not short_url or not short_url.is_active:
+    if not short_url:
+        remember_missing(short_code)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
 
-    # Check expiration
-    if short_url.expiration and datetime.now(UTC) > short_url.expiration:
+    # Check expiration (before is_active, the expiry sweeper deactivates expired links)
+    if has_expired(short_url.expiration):
         raise HTTPException(status_code=status.HTTP_410_GONE, detail="URL has expired")
 
+    if not short_url.is_active:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
+
     return {
         "original_url": short_url.original_url,
         "title": short_url.preview_title,
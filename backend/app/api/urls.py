@@ -1,4 +1,7 @@
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -6,22 +9,49 @@ from app.core.config import settings
 from app.core.security import get_current_user
 from app.models.url import ShortURL
 from app.models.user import User
-from app.schemas.url import URLCreate, URLPreview, URLResponse, URLStats
+from app.schemas.url import (
+    URLBulkCreate,
+    URLBulkResult,
+    URLCreate,
+    URLPreview,
+    URLResponse,
+    URLStats,
+)
+from app.services.analytics import get_url_stats
+from app.services.preview import fetch_url_preview as fetch_preview_service
 from app.services.url import (
     create_short_url,
+    create_short_urls,
     delete_short_url,
-)
-from app.services.url import fetch_url_preview as fetch_preview_service
-from app.services.url import (
     get_short_url_by_code,
-    get_url_stats,
     get_user_urls,
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/urls", tags=["URLs"])
 limiter = Limiter(key_func=get_remote_address)
 
 
+def to_url_response(short_url: ShortURL) -> URLResponse:
+    return URLResponse(
+        id=str(short_url.id),
+        original_url=short_url.original_url,
+        short_code=short_url.short_code,
+        short_url=f"{settings.BASE_URL}/{short_url.short_code}",
+        clicks=short_url.clicks,
+        expiration=short_url.expiration,
+        created_at=short_url.created_at,
+        preview_title=short_url.preview_title,
+        preview_description=short_url.preview_description,
+        preview_image=short_url.preview_image,
+        preview_status=short_url.preview_status,
+        redirect_policy=short_url.redirect_policy,
+        redirect_max_age=short_url.redirect_max_age,
+        click_sample_rate=short_url.click_sample_rate,
+    )
+
+
 @router.post("/shorten", response_model=URLResponse, status_code=status.HTTP_201_CREATED)
 @limiter.limit(settings.RATE_LIMIT_SHORTEN)
 async def shorten_url(
@@ -33,24 +63,57 @@ async def shorten_url(
     - **original_url**: The URL to shorten
     - **custom_alias**: Optional custom alias (4-20 chars, alphanumeric, dash, underscore)
     - **expiration_days**: Optional days until expiration (1-365)
+    - **redirect_policy**: temporary (302), cached (302 + max-age) or permanent (301)
+    - **redirect_max_age**: Optional cache lifetime in seconds for cached/permanent
+    - **click_sample_rate**: Log 1 in N clicks (1 logs every click)
     """
     try:
         short_url = await create_short_url(url_data, current_user)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
 
-    return URLResponse(
-        id=str(short_url.id),
-        original_url=short_url.original_url,
-        short_code=short_url.short_code,
-        short_url=f"{settings.BASE_URL}/{short_url.short_code}",
-        clicks=short_url.clicks,
-        expiration=short_url.expiration,
-        created_at=short_url.created_at,
-        preview_title=short_url.preview_title,
-        preview_description=short_url.preview_description,
-        preview_image=short_url.preview_image,
-    )
+    return to_url_response(short_url)
+
+
+@router.post("/shorten/bulk")
+@limiter.limit(settings.RATE_LIMIT_BULK_SHORTEN)
+async def shorten_urls_bulk(
+    request: Request, bulk_data: URLBulkCreate, current_user: User = Depends(get_current_user)
+):
+    """
+    Create many shortened URLs in one request.
+
+    - **items**: Up to BULK_SHORTEN_MAX_ITEMS objects shaped like /shorten's body
+    - **fetch_previews**: Queue background preview fetches (off by default)
+
+    Streams one JSON object per line (`{"index", "url", "error"}`) as each
+    chunk of items is written, so large batches start returning immediately.
+    A failed item, including one that fails validation, carries an error and
+    does not affect the others. If a whole chunk fails, each of its items
+    carries the error and the remaining chunks are still attempted.
+    """
+    items = bulk_data.items
+    chunk_size = settings.BULK_SHORTEN_CHUNK_SIZE
+
+    async def stream_results():
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start : start + chunk_size]
+            try:
+                results = await create_short_urls(chunk, current_user, bulk_data.fetch_previews)
+            except Exception:
+                # The response is already streaming, so report the chunk instead of aborting
+                logger.exception("Bulk shorten failed for items %d-%d", start, start + len(chunk))
+                results = ["Could not create short URL"] * len(chunk)
+            lines = []
+            for offset, result in enumerate(results):
+                if isinstance(result, str):
+                    line = URLBulkResult(index=start + offset, error=result)
+                else:
+                    line = URLBulkResult(index=start + offset, url=to_url_response(result))
+                lines.append(line.model_dump_json() + "\n")
+            yield "".join(lines)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 
 @router.get("", response_model=list[URLResponse])
@@ -61,22 +124,7 @@ async def list_user_urls(
     List all URLs created by the current user.
     """
     urls = await get_user_urls(current_user, skip=skip, limit=limit)
-
-    return [
-        URLResponse(
-            id=str(url.id),
-            original_url=url.original_url,
-            short_code=url.short_code,
-            short_url=f"{settings.BASE_URL}/{url.short_code}",
-            clicks=url.clicks,
-            expiration=url.expiration,
-            created_at=url.created_at,
-            preview_title=url.preview_title,
-            preview_description=url.preview_description,
-            preview_image=url.preview_image,
-        )
-        for url in urls
-    ]
+    return [to_url_response(url) for url in urls]
 
 
 @router.get("/preview", response_model=URLPreview)
@@ -127,18 +175,7 @@ async def get_url_details(short_code: str, current_user: User = Depends(get_curr
                 status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this URL"
             )
 
-    return URLResponse(
-        id=str(short_url.id),
-        original_url=short_url.original_url,
-        short_code=short_url.short_code,
-        short_url=f"{settings.BASE_URL}/{short_url.short_code}",
-        clicks=short_url.clicks,
-        expiration=short_url.expiration,
-        created_at=short_url.created_at,
-        preview_title=short_url.preview_title,
-        preview_description=short_url.preview_description,
-        preview_image=short_url.preview_image,
-    )
+    return to_url_response(short_url)
 
 
 @router.delete("/{short_code}", status_code=status.HTTP_200_OK)
@@ -0,0 +1,102 @@
+import json
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+
+import redis.asyncio as redis
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.core.database import db
+
+BENCH_DB_NAME = f"{settings.MONGODB_DB_NAME}_bench"
+
+
+async def connect_benchmark_mongo(in_memory: bool) -> None:
+    """
+    Point Beanie at a throwaway benchmark database.
+
+    Uses MONGODB_URL (database "<MONGODB_DB_NAME>_bench") or, with in_memory,
+    mongomock-motor so no server is needed.
+    """
+    from app.models.click import ClickLog, ClickRollup
+    from app.models.url import ShortURL
+    from app.models.user import User
+
+    if in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+
+        db.client = AsyncMongoMockClient()
+    else:
+        db.client = AsyncIOMotorClient(settings.MONGODB_URL)
+
+    await db.client.drop_database(BENCH_DB_NAME)
+    await init_beanie(
+        database=db.client[BENCH_DB_NAME], document_models=[User, ShortURL, ClickLog, ClickRollup]
+    )
+
+
+async def connect_benchmark_redis(in_memory: bool) -> None:
+    """
+    Point the app at Redis for a benchmark run.
+
+    Uses REDIS_URL or, with in_memory, fakeredis so no server is needed.
+    """
+    if in_memory:
+        from fakeredis import FakeAsyncRedis
+
+        db.redis_client = FakeAsyncRedis(decode_responses=True)
+    else:
+        db.redis_client = redis.from_url(
+            settings.REDIS_URL, encoding="utf-8", decode_responses=True
+        )
+
+
+async def close_benchmark_redis() -> None:
+    """Close the benchmark Redis client."""
+    if db.redis_client:
+        await db.redis_client.close()
+        db.redis_client = None
+
+
+async def close_benchmark_mongo() -> None:
+    """Drop the benchmark database and close the client."""
+    if db.client:
+        await db.client.drop_database(BENCH_DB_NAME)
+        db.client.close()
+
+
+def summarize(samples: list[float], cpu_seconds: float | None = None) -> dict:
+    """Summarize per-call wall-clock samples (seconds) as microsecond percentiles."""
+    ordered = sorted(samples)
+    total = sum(ordered)
+    result = {
+        "calls": len(ordered),
+        "mean_us": round(statistics.fmean(ordered) * 1e6, 2),
+        "p50_us": round(ordered[len(ordered) // 2] * 1e6, 2),
+        "p99_us": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6, 2),
+        "ops_per_sec": round(len(ordered) / total, 1) if total else None,
+    }
+    if cpu_seconds is not None:
+        result["cpu_us_per_call"] = round(cpu_seconds / len(ordered) * 1e6, 2)
+    return result
+
+
+async def measure(call: Callable[[], Awaitable], iterations: int, warmup: int = 50) -> dict:
+    """Await call() repeatedly and summarize wall-clock and CPU time per call."""
+    for _ in range(warmup):
+        await call()
+
+    samples = []
+    cpu_start = time.process_time()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, time.process_time() - cpu_start)
+
+
+def emit(results: dict) -> None:
+    """Print results as JSON so runs can be diffed across commits."""
+    print(json.dumps(results, indent=2, default=str))
@@ -0,0 +1,93 @@
+"""
+Compare redirect throughput through FastAPI routing and the ASGI fast path.
+
+Calls the ASGI app directly (no sockets, no HTTP client) with the link
+already in the local cache, so the numbers isolate framework overhead:
+
+    python -m app.benchmarks.fastpath --iterations 20000
+"""
+
+import argparse
+import asyncio
+
+from app.api.fastpath import RedirectFastPath, reserved_root_paths
+from app.benchmarks.common import emit, measure
+from app.main import app
+from app.services.link_cache import LinkRecord, link_cache
+
+SHORT_CODE = "benchfp"
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": f"/{SHORT_CODE}",
+    "raw_path": f"/{SHORT_CODE}".encode(),
+    "root_path": "",
+    "query_string": b"",
+    "headers": [
+        (b"host", b"localhost:8000"),
+        (b"user-agent", b"Mozilla/5.0 (X11; Linux x86_64) Chrome/120.0"),
+        (b"referer", b"https://example.com/"),
+    ],
+    "client": ("127.0.0.1", 50000),
+    "server": ("localhost", 8000),
+}
+
+
+async def _receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def redirect_call(asgi_app):
+    async def call() -> None:
+        status = None
+
+        async def send(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        await asgi_app(dict(SCOPE), _receive, send)
+        if status != 302:
+            raise RuntimeError(f"Expected a 302, got {status}")
+
+    return call
+
+
+async def run(iterations: int) -> dict:
+    link_cache.set(
+        SHORT_CODE,
+        LinkRecord(
+            id="0" * 24,
+            short_code=SHORT_CODE,
+            original_url="https://example.com/landing?utm_source=bench",
+            is_active=True,
+        ),
+        ttl=3600,
+    )
+    fast_app = RedirectFastPath(app, reserved=reserved_root_paths(app.routes))
+
+    routed = await measure(redirect_call(app), iterations)
+    fast = await measure(redirect_call(fast_app), iterations)
+
+    return {
+        "benchmark": "redirect_fast_path",
+        "iterations": iterations,
+        "fastapi_route": routed,
+        "asgi_fast_path": fast,
+        "throughput_gain": round(fast["ops_per_sec"] / routed["ops_per_sec"], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    emit(asyncio.run(run(args.iterations)))
+
+
+if __name__ == "__main__":
+    main()
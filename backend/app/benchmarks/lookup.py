@@ -0,0 +1,73 @@
+"""
+Compare the redirect lookup paths.
+
+Times ShortURL.find_one (full Beanie hydration) against find_link_record
+(projected Motor query into a slotted LinkRecord) for the same document:
+
+    python -m app.benchmarks.lookup --iterations 5000
+    python -m app.benchmarks.lookup --in-memory   # mongomock-motor, no server
+
+With --in-memory both paths share the same mock driver cost, so the gap is
+the per-redirect CPU spent on validation, Link resolution and state snapshots.
+"""
+
+import argparse
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+from app.benchmarks.common import (
+    close_benchmark_mongo,
+    connect_benchmark_mongo,
+    emit,
+    measure,
+)
+from app.models.url import ShortURL
+from app.models.user import User
+from app.services.url import find_link_record
+
+SHORT_CODE = "benchlk"
+
+
+async def seed() -> None:
+    user = User(email="bench@example.com", hashed_password="x")
+    await user.insert()
+    await ShortURL(
+        original_url="https://example.com/" + "path/" * 20,
+        short_code=SHORT_CODE,
+        user=user,
+        expiration=datetime.now(UTC) + timedelta(days=30),
+        preview_title="Example title " * 10,
+        preview_description="Example description " * 25,
+        preview_image="https://example.com/image.png",
+    ).insert()
+
+
+async def run(iterations: int, in_memory: bool) -> dict:
+    await connect_benchmark_mongo(in_memory)
+    try:
+        await seed()
+        beanie = await measure(lambda: ShortURL.find_one({"short_code": SHORT_CODE}), iterations)
+        projected = await measure(lambda: find_link_record(SHORT_CODE), iterations)
+    finally:
+        await close_benchmark_mongo()
+
+    return {
+        "benchmark": "redirect_lookup",
+        "backend": "mongomock" if in_memory else "mongodb",
+        "iterations": iterations,
+        "beanie_find_one": beanie,
+        "projected_lookup": projected,
+        "cpu_speedup": round(beanie["cpu_us_per_call"] / projected["cpu_us_per_call"], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--in-memory", action="store_true", help="Use mongomock-motor")
+    args = parser.parse_args()
+    emit(asyncio.run(run(args.iterations, args.in_memory)))
+
+
+if __name__ == "__main__":
+    main()
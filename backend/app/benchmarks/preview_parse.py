@@ -0,0 +1,139 @@
+"""
+Compare preview extraction on large pages: BeautifulSoup vs the streaming parser.
+
+The BeautifulSoup path is what fetch_url_preview used to do: decode the
+whole body and parse it into a tree. The streaming path feeds the body to
+the head-only parser in network-sized chunks. Pages are generated in
+memory, so only parsing is measured, not the network:
+
+    python -m app.benchmarks.preview_parse --sizes 100000,1000000,5000000
+"""
+
+import argparse
+import asyncio
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from app.benchmarks.common import emit, measure
+from app.core.config import settings
+from app.schemas.url import URLPreview
+from app.services.preview import PREVIEW_CHUNK_SIZE, extract_head_metadata
+
+URL = "https://example.com/article"
+SIZES = "100000,1000000,5000000"
+
+HEAD = """<!DOCTYPE html>
+<html><head>
+<meta charset="utf-8">
+<title>A fairly typical article page</title>
+<meta name="description" content="Plain description">
+<meta property="og:title" content="Open Graph &amp; friends">
+<meta property="og:description" content="What the page is about">
+<meta property="og:image" content="https://example.com/cover.png">
+<style>{styles}</style>
+</head>
+"""
+PARAGRAPH = "<p>Lorem ipsum dolor sit amet, <a href='/x'>consectetur</a> adipiscing elit.</p>\n"
+
+
+def build_page(size: int) -> bytes:
+    head = HEAD.format(styles=".c{color:red}" * 200)
+    body = PARAGRAPH * max(1, (size - len(head)) // len(PARAGRAPH))
+    return f"{head}<body>{body}</body></html>".encode()
+
+
+def beautifulsoup_preview(url: str, body: bytes) -> URLPreview:
+    """The previous implementation: parse the whole page into a tree."""
+    preview = URLPreview(url=url)
+    soup = BeautifulSoup(body.decode("utf-8"), "html.parser")
+
+    og_title = soup.find("meta", property="og:title")
+    og_desc = soup.find("meta", property="og:description")
+    og_image = soup.find("meta", property="og:image")
+
+    if og_title:
+        preview.title = og_title.get("content", "")[:200]
+    elif soup.title:
+        preview.title = soup.title.string[:200] if soup.title.string else None
+
+    if og_desc:
+        preview.description = og_desc.get("content", "")[:500]
+    else:
+        meta_desc = soup.find("meta", attrs={"name": "description"})
+        if meta_desc:
+            preview.description = meta_desc.get("content", "")[:500]
+
+    if og_image:
+        preview.image = og_image.get("content", "")
+    return preview
+
+
+async def streamed_preview(url: str, body: bytes) -> URLPreview:
+    async def chunks():
+        for start in range(0, len(body), PREVIEW_CHUNK_SIZE):
+            yield body[start : start + PREVIEW_CHUNK_SIZE]
+
+    return await extract_head_metadata(url, chunks(), "utf-8", settings.PREVIEW_MAX_BYTES)
+
+
+def parse_call(parse, body: bytes):
+    async def call() -> None:
+        result = parse(URL, body)
+        if asyncio.iscoroutine(result):
+            await result
+
+    return call
+
+
+async def peak_memory(call) -> int:
+    tracemalloc.start()
+    try:
+        await call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+async def run(sizes: list[int], iterations: int) -> dict:
+    results = {}
+    for size in sizes:
+        body = build_page(size)
+        expected = beautifulsoup_preview(URL, body)
+        if await streamed_preview(URL, body) != expected:
+            raise RuntimeError("Streaming parser disagrees with BeautifulSoup")
+
+        soup = parse_call(beautifulsoup_preview, body)
+        streamed = parse_call(streamed_preview, body)
+        soup_result = await measure(soup, iterations, warmup=1)
+        streamed_result = await measure(streamed, iterations, warmup=1)
+        soup_result["peak_memory_bytes"] = await peak_memory(soup)
+        streamed_result["peak_memory_bytes"] = await peak_memory(streamed)
+        results[f"{size}_bytes"] = {
+            "beautifulsoup": soup_result,
+            "streaming": streamed_result,
+            "speedup": round(soup_result["mean_us"] / streamed_result["mean_us"], 1),
+            "memory_reduction": round(
+                soup_result["peak_memory_bytes"] / streamed_result["peak_memory_bytes"], 1
+            ),
+        }
+
+    return {
+        "benchmark": "preview_parse",
+        "chunk_size": PREVIEW_CHUNK_SIZE,
+        "max_bytes": settings.PREVIEW_MAX_BYTES,
+        "pages": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default=SIZES, help="Comma-separated page sizes in bytes")
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    emit(asyncio.run(run(sizes, args.iterations)))
+
+
+if __name__ == "__main__":
+    main()
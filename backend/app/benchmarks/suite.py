@@ -0,0 +1,305 @@
+"""
+End-to-end latency and throughput benchmarks for the API.
+
+Drives the real app.main:app over ASGI (httpx, no sockets) with the click
+pipeline and link cache listener running, and prints p50/p99 and req/s per
+scenario as JSON so runs can be compared across commits:
+
+    python -m app.benchmarks.suite --in-memory                 # mongomock + fakeredis
+    python -m app.benchmarks.suite                              # MONGODB_URL / REDIS_URL
+    python -m app.benchmarks.suite --in-memory --scenarios redirect_hit,login
+
+Without --in-memory the benchmark database is dropped and recreated, and
+Redis should be a scratch instance. mongomock scans every document in
+Python, so in-memory runs default to the 10k and 100k stats tiers only.
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+from datetime import UTC, datetime, timedelta
+
+from bson import ObjectId
+from httpx import ASGITransport, AsyncClient
+
+from app.api import auth as auth_api
+from app.api import urls as urls_api
+from app.benchmarks.common import (
+    close_benchmark_mongo,
+    close_benchmark_redis,
+    connect_benchmark_mongo,
+    connect_benchmark_redis,
+    emit,
+    measure,
+)
+from app.core.security import create_access_token, get_password_hash
+from app.main import app, limiter
+from app.models.click import ClickLog, ClickRollup
+from app.models.url import ShortURL
+from app.models.user import User
+from app.schemas.url import URLPreview
+from app.services import link_cache as link_cache_module
+from app.services import preview_worker as preview_worker_module
+from app.services import rollup as rollup_module
+from app.services.click_counters import start_click_counters, stop_click_counters
+from app.services.click_ingest import start_click_ingestor, stop_click_ingestor
+from app.services.code_pool import code_pool, start_code_pool, stop_code_pool
+from app.services.link_cache import start_invalidation_listener, stop_invalidation_listener
+from app.services.preview_worker import start_preview_worker, stop_preview_worker
+from app.services.rollup import RollupBatch, rebuild_rollups
+
+SCENARIOS = ("redirect_hit", "redirect_miss", "shorten", "stats", "login")
+CLICK_COUNTS = "10000,100000,1000000"
+IN_MEMORY_CLICK_COUNTS = "10000,100000"
+
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "benchmark-password"
+HIT_CODE = "benchhit"
+
+REFERRERS = [None, "https://google.com", "https://twitter.com", "https://news.ycombinator.com"]
+DEVICES = [
+    ("desktop", "Chrome", "Windows"),
+    ("mobile", "Safari", "iOS"),
+    ("tablet", "Chrome", "Android"),
+]
+COUNTRIES = [None, "US", "DE", "IN", "BR"]
+
+
+async def _offline_preview(url: str) -> URLPreview:
+    # Preview fetches go to the network and would dominate, and vary, every run
+    return URLPreview(url=url)
+
+
+async def _write_rollups_one_by_one(batch: RollupBatch) -> None:
+    # mongomock's bulk_write does not accept current pymongo UpdateOne operations
+    collection = ClickRollup.get_motor_collection()
+    for query, update in batch.updates():
+        await collection.update_one(query, update, upsert=True)
+
+
+async def seed_user() -> User:
+    user = User(email=BENCH_EMAIL, hashed_password=get_password_hash(BENCH_PASSWORD))
+    await user.insert()
+    return user
+
+
+async def seed_link(user: User, short_code: str, clicks: int = 0) -> ShortURL:
+    short_url = ShortURL(
+        original_url=f"https://example.com/{short_code}",
+        short_code=short_code,
+        user=user,
+        clicks=clicks,
+    )
+    await short_url.insert()
+    return short_url
+
+
+async def seed_clicks(short_url: ShortURL, count: int, chunk_size: int = 10000) -> None:
+    """Insert count click logs spread over the last 30 days."""
+    rng = random.Random(count)
+    collection = ClickLog.get_motor_collection()
+    now = datetime.now(UTC)
+    short_url_id = str(short_url.id)
+
+    for start in range(0, count, chunk_size):
+        docs = []
+        for _ in range(min(chunk_size, count - start)):
+            device, browser, os_name = rng.choice(DEVICES)
+            docs.append(
+                {
+                    "_id": ObjectId(),
+                    "short_url_id": short_url_id,
+                    "ip_address": "203.0.113.1",
+                    "user_agent": "Mozilla/5.0",
+                    "referrer": rng.choice(REFERRERS),
+                    "country": rng.choice(COUNTRIES),
+                    "device_type": device,
+                    "browser": browser,
+                    "os": os_name,
+                    "timestamp": now - timedelta(seconds=rng.randrange(30 * 86400)),
+                    "weight": 1,
+                }
+            )
+        await collection.insert_many(docs, ordered=False)
+
+
+def expect(client: AsyncClient, method: str, url: str, status: int, **kwargs):
+    """Build a request call that fails loudly on an unexpected status."""
+
+    async def call() -> None:
+        response = await client.request(method, url, **kwargs)
+        if response.status_code != status:
+            raise RuntimeError(f"{method} {url} returned {response.status_code}, expected {status}")
+
+    return call
+
+
+async def run_scenarios(
+    client: AsyncClient,
+    user: User,
+    scenarios: set[str],
+    iterations: int,
+    stats_iterations: int,
+    login_iterations: int,
+    click_counts: list[int],
+) -> dict:
+    token = create_access_token({"sub": user.email, "user_id": str(user.id)})
+    auth = {"Authorization": f"Bearer {token}"}
+    results = {}
+
+    if "redirect_hit" in scenarios:
+        results["redirect_hit"] = await measure(
+            expect(client, "GET", f"/{HIT_CODE}", 302), iterations
+        )
+
+    if "redirect_miss" in scenarios:
+        # A fresh code every time, as scanners and typos produce
+        codes = itertools.count()
+
+        async def miss() -> None:
+            await expect(client, "GET", f"/miss{next(codes):08d}", 404)()
+
+        results["redirect_miss"] = await measure(miss, iterations)
+
+    if "shorten" in scenarios:
+        results["shorten"] = await measure(
+            expect(
+                client,
+                "POST",
+                "/api/v1/urls/shorten",
+                201,
+                json={"original_url": "https://example.com/some/long/path?ref=bench"},
+                headers=auth,
+            ),
+            iterations,
+        )
+
+    if "stats" in scenarios:
+        for count in click_counts:
+            short_url = await seed_link(user, f"stats{count}", clicks=count)
+            await seed_clicks(short_url, count)
+            await rebuild_rollups(str(short_url.id))
+            results[f"stats_{count}_clicks"] = await measure(
+                expect(
+                    client, "GET", f"/api/v1/urls/{short_url.short_code}/stats", 200, headers=auth
+                ),
+                stats_iterations,
+                warmup=1,
+            )
+            results[f"analytics_stats_{count}_clicks"] = await measure(
+                expect(client, "GET", f"/api/v1/stats/{short_url.short_code}", 200, headers=auth),
+                stats_iterations,
+                warmup=1,
+            )
+
+    if "login" in scenarios:
+        results["login"] = await measure(
+            expect(
+                client,
+                "POST",
+                "/api/v1/auth/login",
+                200,
+                json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD},
+            ),
+            login_iterations,
+            warmup=1,
+        )
+
+    return results
+
+
+async def run(args: argparse.Namespace) -> dict:
+    scenarios = set(args.scenarios.split(","))
+    click_counts = args.click_counts or (IN_MEMORY_CLICK_COUNTS if args.in_memory else CLICK_COUNTS)
+    unknown = scenarios - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    await connect_benchmark_mongo(args.in_memory)
+    await connect_benchmark_redis(args.in_memory)
+
+    # Measure the request path, not the per-IP rate limits
+    rate_limiters = (limiter, urls_api.limiter, auth_api.limiter)
+    for rate_limiter in rate_limiters:
+        rate_limiter.enabled = False
+    scrape_preview = preview_worker_module.cached_url_preview
+    preview_worker_module.cached_url_preview = _offline_preview
+    write_rollups = rollup_module.write_rollups
+    if args.in_memory:
+        rollup_module.write_rollups = _write_rollups_one_by_one
+
+    try:
+        user = await seed_user()
+        await seed_link(user, HIT_CODE)
+
+        await start_invalidation_listener()
+        # mongomock's bulk_write does not accept current pymongo UpdateOne operations
+        if not args.in_memory:
+            await start_click_counters()
+        await start_click_ingestor()
+        await start_code_pool()
+        await code_pool.refill()
+        await start_preview_worker()
+        # Let the existence filter load so misses take the production path
+        for _ in range(100):
+            if link_cache_module.code_filter is not None:
+                break
+            await asyncio.sleep(0.05)
+
+        transport = ASGITransport(app=app, client=("203.0.113.1", 50000))
+        async with AsyncClient(transport=transport, base_url="http://bench") as client:
+            results = await run_scenarios(
+                client,
+                user,
+                scenarios,
+                iterations=args.iterations,
+                stats_iterations=args.stats_iterations,
+                login_iterations=args.login_iterations,
+                click_counts=[int(count) for count in click_counts.split(",")],
+            )
+    finally:
+        await stop_preview_worker()
+        await stop_code_pool()
+        await stop_click_ingestor()
+        if not args.in_memory:
+            await stop_click_counters()
+        await stop_invalidation_listener()
+        preview_worker_module.cached_url_preview = scrape_preview
+        rollup_module.write_rollups = write_rollups
+        for rate_limiter in rate_limiters:
+            rate_limiter.enabled = True
+        await close_benchmark_redis()
+        await close_benchmark_mongo()
+
+    return {
+        "benchmark": "api_suite",
+        "backend": "mongomock+fakeredis" if args.in_memory else "mongodb+redis",
+        "iterations": args.iterations,
+        "click_counts": click_counts,
+        "scenarios": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--in-memory", action="store_true", help="Use mongomock-motor and fakeredis"
+    )
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--stats-iterations", type=int, default=5)
+    parser.add_argument(
+        "--login-iterations", type=int, default=20, help="Login is bcrypt-bound, keep this low"
+    )
+    parser.add_argument(
+        "--click-counts",
+        help=f"Comma-separated click log volumes for the stats scenarios "
+        f"(default {CLICK_COUNTS}, or {IN_MEMORY_CLICK_COUNTS} with --in-memory)",
+    )
+    args = parser.parse_args()
+    emit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
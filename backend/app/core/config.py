@@ -14,6 +14,8 @@ class Settings(BaseSettings):
     # MongoDB
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "eclipseurl"
+    # Create missing indexes at startup (unique ones first, the rest in the background)
+    MONGODB_ENSURE_INDEXES: bool = True
 
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
@@ -26,11 +28,92 @@ class Settings(BaseSettings):
     # Rate Limiting
     RATE_LIMIT_SHORTEN: str = "10/minute"
     RATE_LIMIT_REGISTER: str = "5/hour"
+    RATE_LIMIT_BULK_SHORTEN: str = "10/minute"
 
     # URL Settings
     SHORT_CODE_LENGTH: int = 7
     BASE_URL: str = "http://localhost:8000"
 
+    # "random" codes, or "counter" codes from leased ID blocks (no collision checks).
+    # Never change SHORT_CODE_PERMUTATION_KEY once counter codes have been issued.
+    SHORT_CODE_STRATEGY: str = "random"
+    SHORT_CODE_COUNTER_BLOCK_SIZE: int = 1000
+    SHORT_CODE_PERMUTATION_KEY: str = "eclipse-url"
+
+    # Pre-generated short code pool (Redis set, refilled in the background)
+    CODE_POOL_ENABLED: bool = True
+    CODE_POOL_TARGET_SIZE: int = 10000
+    CODE_POOL_LOW_WATERMARK: int = 2000
+    CODE_POOL_REFILL_BATCH_SIZE: int = 1000
+    CODE_POOL_CHECK_INTERVAL_SECONDS: float = 5.0
+
+    # Bulk shortening (items are written and streamed back in chunks)
+    BULK_SHORTEN_MAX_ITEMS: int = 10000
+    BULK_SHORTEN_CHUNK_SIZE: int = 500
+
+    # Outbound HTTP (shared pooled session for preview fetches)
+    HTTP_POOL_LIMIT: int = 100
+    HTTP_POOL_LIMIT_PER_HOST: int = 4
+    HTTP_DNS_CACHE_TTL_SECONDS: int = 300
+    HTTP_KEEPALIVE_SECONDS: float = 30.0
+    PREVIEW_FETCH_TIMEOUT_SECONDS: float = 5.0
+    PREVIEW_MAX_BYTES: int = 512 * 1024  # stop reading a page here if </head> has not shown up
+
+    # Preview cache (local + Redis, failures cached for the negative TTL)
+    PREVIEW_CACHE_MAX_SIZE: int = 5000
+    PREVIEW_CACHE_TTL_SECONDS: int = 3600
+    PREVIEW_CACHE_NEGATIVE_TTL_SECONDS: int = 300
+
+    # Background preview fetching (in-process queue drained by a pool of fetchers)
+    PREVIEW_QUEUE_MAX_SIZE: int = 10000
+    PREVIEW_WORKER_CONCURRENCY: int = 10
+
+    # Preview refresh (re-crawls previews older than PREVIEW_REFRESH_AFTER_DAYS, off while 0)
+    PREVIEW_REFRESH_AFTER_DAYS: int = 30
+    PREVIEW_REFRESH_INTERVAL_SECONDS: float = 60.0
+    PREVIEW_REFRESH_BATCH_SIZE: int = 200
+    PREVIEW_REFRESH_CONCURRENCY: int = 10
+    PREVIEW_REFRESH_PER_HOST_CONCURRENCY: int = 2
+    PREVIEW_REFRESH_PER_HOST_INTERVAL_SECONDS: float = 1.0
+    # One process refreshes at a time; the lease must outlast a pass plus the interval
+    PREVIEW_REFRESH_LEASE_SECONDS: float = 300.0
+
+    # Link cache (redirect path)
+    LINK_CACHE_MAX_SIZE: int = 10000
+    LINK_CACHE_TTL_SECONDS: int = 30
+    LINK_REDIS_TTL_SECONDS: int = 3600
+    MISSING_CODE_CACHE_TTL_SECONDS: int = 10
+    CODE_FILTER_ENABLED: bool = True
+    CODE_FILTER_CAPACITY: int = 1_000_000
+    CODE_FILTER_ERROR_RATE: float = 0.01
+    CODE_FILTER_HEADROOM: float = 0.25  # Room for new codes before the filter is resized
+    CODE_FILTER_RELOAD_JITTER_SECONDS: float = 10.0
+    # Older filters stop rejecting codes, bounding the cost of a lost announcement
+    CODE_FILTER_MAX_AGE_SECONDS: float = 600.0
+    REDIRECT_FAST_PATH: bool = False
+    REDIRECT_CACHE_MAX_AGE_SECONDS: int = 3600
+
+    # Click ingestion ("memory" queues in-process, "stream" uses a Redis Stream)
+    CLICK_INGEST_MODE: str = "memory"
+    CLICK_QUEUE_MAX_SIZE: int = 10000
+    CLICK_BATCH_SIZE: int = 500
+    CLICK_FLUSH_INTERVAL_SECONDS: float = 1.0
+    CLICK_SHUTDOWN_TIMEOUT_SECONDS: float = 10.0
+    CLICK_COUNTER_FLUSH_INTERVAL_SECONDS: float = 5.0
+    CLICK_STREAM_KEY: str = "click-events"
+    CLICK_STREAM_GROUP: str = "click-ingest"
+    CLICK_STREAM_MAXLEN: int = 1_000_000
+    CLICK_STREAM_CLAIM_IDLE_MS: int = 60000
+    CLICK_ROLLUP_HOUR_RETENTION_DAYS: int = 14
+    CLICK_ROLLUP_MAX_KEYS: int = 1000  # Per dimension of each rollup document
+
+    # Link expiry (archiving is off while EXPIRY_ARCHIVE_AFTER_DAYS is 0)
+    EXPIRY_SWEEP_INTERVAL_SECONDS: float = 60.0
+    EXPIRY_SWEEP_BATCH_SIZE: int = 1000
+    EXPIRY_ARCHIVE_AFTER_DAYS: int = 0
+    # One process sweeps at a time; the lease must outlast a sweep plus the interval
+    EXPIRY_SWEEP_LEASE_SECONDS: float = 300.0
+
     # CORS
     CORS_ORIGINS: list[str] = ["http://localhost:3000", "http://localhost:8000"]
 
@@ -13,17 +13,27 @@ class Database:
 db = Database()
 
 
-async def connect_to_mongo():
-    """Initialize MongoDB connection with Beanie ODM."""
-    db.client = AsyncIOMotorClient(settings.MONGODB_URL)
-
+def document_models() -> list:
+    """Every Beanie document model of the app."""
     # Import models here to avoid circular imports
-    from app.models.click import ClickLog
+    from app.models.click import ClickLog, ClickRollup
     from app.models.url import ShortURL
     from app.models.user import User
 
+    return [User, ShortURL, ClickLog, ClickRollup]
+
+
+async def connect_to_mongo():
+    """
+    Initialize MongoDB connection with Beanie ODM.
+
+    Indexes are not created here; see app.core.indexes.
+    """
+    db.client = AsyncIOMotorClient(settings.MONGODB_URL)
     await init_beanie(
-        database=db.client[settings.MONGODB_DB_NAME], document_models=[User, ShortURL, ClickLog]
+        database=db.client[settings.MONGODB_DB_NAME],
+        document_models=document_models(),
+        skip_indexes=True,
     )
 
 
@@ -0,0 +1,25 @@
+from datetime import UTC, datetime
+
+
+def utc_now() -> datetime:
+    """Current time as a timezone-aware UTC datetime."""
+    return datetime.now(UTC)
+
+
+def as_utc(value: datetime | None) -> datetime | None:
+    """
+    Make a datetime timezone-aware, treating naive values as UTC.
+
+    MongoDB stores UTC without an offset, so datetimes read back through
+    Motor are naive and cannot be compared with aware ones.
+    """
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=UTC)
+
+
+def has_expired(expiration: datetime | None, now: datetime | None = None) -> bool:
+    """Return True if an expiration time has passed."""
+    if expiration is None:
+        return False
+    return (now or utc_now()) >= as_utc(expiration)
@@ -0,0 +1,81 @@
+from collections import Counter
+
+import aiohttp
+
+from app.core.config import settings
+
+
+class HTTPClient:
+    def __init__(self):
+        self.session: aiohttp.ClientSession | None = None
+        self.events = Counter()
+
+
+http = HTTPClient()
+
+
+def _count(event: str):
+    async def handler(session, context, params) -> None:
+        http.events[event] += 1
+
+    return handler
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_count("requests"))
+    trace.on_request_exception.append(_count("request_errors"))
+    trace.on_connection_create_end.append(_count("connections_created"))
+    trace.on_connection_reuseconn.append(_count("connections_reused"))
+    trace.on_dns_cache_hit.append(_count("dns_cache_hits"))
+    trace.on_dns_cache_miss.append(_count("dns_cache_misses"))
+    return trace
+
+
+async def open_http_session():
+    """
+    Create the shared outbound HTTP session.
+
+    One pooled connector serves every outbound fetch, so connections and DNS
+    results are reused across requests and HTTP_POOL_LIMIT caps the sockets
+    this worker holds open, HTTP_POOL_LIMIT_PER_HOST those to one host.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=settings.HTTP_POOL_LIMIT,
+        limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL_SECONDS,
+        keepalive_timeout=settings.HTTP_KEEPALIVE_SECONDS,
+    )
+    http.session = aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=settings.PREVIEW_FETCH_TIMEOUT_SECONDS),
+        headers={"User-Agent": f"{settings.APP_NAME}-Preview/1.0"},
+        trace_configs=[_trace_config()],
+    )
+
+
+async def close_http_session():
+    """Close the shared outbound HTTP session and its connections."""
+    if http.session:
+        await http.session.close()
+        http.session = None
+
+
+def get_http_session() -> aiohttp.ClientSession | None:
+    """Get the shared outbound HTTP session, or None outside the app lifespan."""
+    return http.session
+
+
+def http_pool_stats() -> dict:
+    """Return connection pool limits, occupancy and reuse counters."""
+    stats = {"open": http.session is not None, **http.events}
+    if http.session is not None:
+        connector = http.session.connector
+        # aiohttp has no public occupancy API; these are its pool bookkeeping
+        stats.update(
+            limit=connector.limit,
+            limit_per_host=connector.limit_per_host,
+            in_use=len(getattr(connector, "_acquired", ())),
+            idle=sum(len(conns) for conns in getattr(connector, "_conns", {}).values()),
+        )
+    return stats
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+
+from beanie import Document
+from beanie.odm.utils.typing import get_index_attributes
+from pymongo import IndexModel
+
+from app.core.config import settings
+from app.core.database import document_models
+
+logger = logging.getLogger(__name__)
+
+
+def declared_indexes(model: type[Document]) -> list[IndexModel]:
+    """Indexes a model declares, through Indexed() fields and Settings.indexes."""
+    indexes = []
+    for name, field in model.model_fields.items():
+        attributes = get_index_attributes(field)
+        if attributes is not None:
+            key_type, options = attributes
+            indexes.append(IndexModel([(field.alias or name, key_type)], **options))
+    # Beanie wraps Settings.indexes in IndexModelField once the model is initialized
+    for index in model.get_settings().indexes or []:
+        indexes.append(getattr(index, "index", index))
+    return indexes
+
+
+def index_key(index: IndexModel | dict) -> tuple:
+    """The (field, direction) pairs of an IndexModel or an index_information() entry."""
+    document = index.document if isinstance(index, IndexModel) else index
+    key = document["key"]
+    # IndexModel keeps a mapping, index_information() a list of pairs
+    return tuple(key.items() if isinstance(key, dict) else key)
+
+
+class IndexManager:
+    """
+    Creates the declared MongoDB indexes without holding up startup.
+
+    Beanie is initialized with skip_indexes, so connecting never waits on an
+    index build. start() creates missing unique indexes first, because
+    duplicate detection depends on them, and builds the rest in a background
+    task. Indexes that already exist on the same keys are left untouched, so
+    every start is idempotent.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._builder: asyncio.Task | None = None
+        self.created: list[str] = []
+        self.existing = 0
+        self.failed: list[str] = []
+
+    async def ensure(self, models: list[type[Document]], unique: bool | None = None) -> list[str]:
+        """
+        Create the declared indexes missing from each model's collection.
+
+        With unique set, only unique (True) or only non-unique (False)
+        indexes are considered. Returns the names of the indexes created.
+        """
+        created = []
+        for model in models:
+            collection = model.get_motor_collection()
+            existing = {index_key(info) for info in (await collection.index_information()).values()}
+            missing = []
+            for index in declared_indexes(model):
+                if unique is not None and bool(index.document.get("unique")) != unique:
+                    continue
+                if index_key(index) in existing:
+                    self.existing += 1
+                else:
+                    missing.append(index)
+
+            for index in missing:
+                name = f"{collection.name}.{index.document['name']}"
+                try:
+                    await collection.create_indexes([index])
+                except Exception:
+                    self.failed.append(name)
+                    logger.exception("Failed to create index %s", name)
+                    continue
+                logger.info("Created index %s", name)
+                created.append(name)
+
+        self.created += created
+        return created
+
+    async def start(self, models: list[type[Document]]) -> None:
+        """Create unique indexes now and the others in the background, if enabled."""
+        if not self.enabled or self._builder is not None:
+            return
+        await self.ensure(models, unique=True)
+        self._builder = asyncio.create_task(self.ensure(models, unique=False))
+
+    async def stop(self) -> None:
+        """Stop waiting on background builds. Builds already sent finish server-side."""
+        if self._builder is not None:
+            self._builder.cancel()
+            try:
+                await self._builder
+            except asyncio.CancelledError:
+                pass
+            self._builder = None
+
+    def stats(self) -> dict:
+        """Return which indexes were created, found or failed."""
+        return {
+            "enabled": self.enabled,
+            "building": self._builder is not None and not self._builder.done(),
+            "created": self.created,
+            "existing": self.existing,
+            "failed": self.failed,
+        }
+
+
+index_manager = IndexManager(enabled=settings.MONGODB_ENSURE_INDEXES)
+
+
+async def start_index_builds() -> None:
+    """Create missing indexes, unique ones before startup continues."""
+    await index_manager.start(document_models())
+
+
+async def stop_index_builds() -> None:
+    """Stop waiting on background index builds."""
+    await index_manager.stop()
+
+
+def plan_stages(plan: dict) -> list[dict]:
+    """Flatten a winning plan into its stages, outermost first."""
+    # Slot-based plans nest the classic plan under queryPlan
+    plan = plan.get("queryPlan", plan)
+    stages = [{"stage": plan["stage"], "index": plan.get("indexName")}]
+    for child in [plan.get("inputStage"), *plan.get("inputStages", [])]:
+        if child:
+            stages += plan_stages(child)
+    return stages
+
+
+def summarize_plan(explanation: dict) -> dict:
+    """Reduce explain() output to the winning plan's stages and scan counts."""
+    stages = plan_stages(explanation["queryPlanner"]["winningPlan"])
+    execution = explanation.get("executionStats", {})
+    return {
+        "stages": [stage["stage"] for stage in stages],
+        "indexes": [stage["index"] for stage in stages if stage["index"]],
+        "collection_scan": any(stage["stage"] == "COLLSCAN" for stage in stages),
+        "returned": execution.get("nReturned"),
+        "keys_examined": execution.get("totalKeysExamined"),
+        "docs_examined": execution.get("totalDocsExamined"),
+    }
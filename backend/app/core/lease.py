@@ -0,0 +1,70 @@
+import logging
+from uuid import uuid4
+
+from app.core.database import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Renews the lease if this process holds it, otherwise takes it if it is free.
+# KEYS: lease. ARGV: holder token, lease in milliseconds.
+ACQUIRE_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+if redis.call("SET", KEYS[1], ARGV[1], "NX", "PX", ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+# Frees the lease only if this process still holds it. KEYS: lease. ARGV: holder token.
+RELEASE_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease:
+    """
+    Lets one process of the deployment run a periodic background job.
+
+    The holder renews the lease on every acquire() and the others are
+    refused until it is released or lapses after seconds, so the lease must
+    outlast a run plus the interval between runs. Without Redis every
+    process holds it.
+    """
+
+    def __init__(self, key: str, seconds: float):
+        self.key = key
+        self.seconds = seconds
+        self._token = uuid4().hex
+        self.held = False
+
+    async def acquire(self) -> bool:
+        """Take or renew the lease. Returns whether this process holds it."""
+        redis = get_redis()
+        if not redis:
+            self.held = True
+            return True
+        try:
+            script = redis.register_script(ACQUIRE_LEASE_SCRIPT)
+            held = await script(keys=[self.key], args=[self._token, int(self.seconds * 1000)])
+        except Exception:
+            # Skip rather than risk every process running the job at once
+            logger.warning("Could not take the %s lease", self.key, exc_info=True)
+            held = False
+        self.held = bool(held)
+        return self.held
+
+    async def release(self) -> None:
+        """Give up the lease so another process can take over right away."""
+        self.held = False
+        try:
+            redis = get_redis()
+            if redis:
+                script = redis.register_script(RELEASE_LEASE_SCRIPT)
+                await script(keys=[self.key], args=[self._token])
+        except Exception:
+            pass  # The lease lapses on its own
@@ -0,0 +1,38 @@
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for duplicate detection.
+
+    Lowercases the scheme and host, drops default ports and trailing slashes
+    and sorts query parameters, so equivalent spellings of a destination
+    compare equal. The stored original_url is left untouched.
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"  # IPv6 literal
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    userinfo = parts.netloc.rpartition("@")[0]
+    netloc = f"{userinfo}@{host}" if userinfo else host
+
+    path = parts.path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, parts.fragment))
+
+
+def url_hash(url: str) -> str:
+    """Compact hash of the normalized URL, indexed per user for re-shortening lookups."""
+    return hashlib.blake2b(normalize_url(url).encode(), digest_size=12).hexdigest()
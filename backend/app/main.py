@@ -13,6 +13,15 @@ from app.core.database import (
     connect_to_mongo,
     connect_to_redis,
 )
+from app.core.http import close_http_session, open_http_session
+from app.core.indexes import start_index_builds, stop_index_builds
+from app.services.click_counters import start_click_counters, stop_click_counters
+from app.services.click_ingest import start_click_ingestor, stop_click_ingestor
+from app.services.code_pool import start_code_pool, stop_code_pool
+from app.services.expiry import start_expiry_sweeper, stop_expiry_sweeper
+from app.services.link_cache import start_invalidation_listener, stop_invalidation_listener
+from app.services.preview_refresh import start_preview_refresher, stop_preview_refresher
+from app.services.preview_worker import start_preview_worker, stop_preview_worker
 
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address)
@@ -23,9 +32,27 @@ async def lifespan(app: FastAPI):
     """Manage application lifecycle - startup and shutdown."""
     # Startup
     await connect_to_mongo()
+    await start_index_builds()
     await connect_to_redis()
+    await open_http_session()
+    await start_invalidation_listener()
+    await start_click_counters()
+    await start_click_ingestor()
+    await start_expiry_sweeper()
+    await start_code_pool()
+    await start_preview_worker()
+    await start_preview_refresher()
     yield
     # Shutdown
+    await stop_preview_refresher()
+    await stop_preview_worker()
+    await stop_code_pool()
+    await stop_expiry_sweeper()
+    await stop_click_ingestor()
+    await stop_click_counters()
+    await stop_invalidation_listener()
+    await close_http_session()
+    await stop_index_builds()
     await close_mongo_connection()
     await close_redis_connection()
 
@@ -70,3 +97,9 @@ app.include_router(analytics.router, prefix=settings.API_V1_STR)
 app.include_router(admin.router, prefix=settings.API_V1_STR)
 # Redirect router at root level for short URLs
 app.include_router(redirect.router)
+
+if settings.REDIRECT_FAST_PATH:
+    from app.api.fastpath import RedirectFastPath, reserved_root_paths  # noqa: E402
+
+    # Added last so it runs outermost, ahead of CORS and routing
+    app.add_middleware(RedirectFastPath, reserved=reserved_root_paths(app.routes))
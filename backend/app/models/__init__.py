@@ -1,6 +1,6 @@
 # Database models
-from app.models.click import ClickLog
+from app.models.click import ClickLog, ClickRollup
 from app.models.url import ShortURL
 from app.models.user import User
 
-__all__ = ["User", "ShortURL", "ClickLog"]
+__all__ = ["User", "ShortURL", "ClickLog", "ClickRollup"]
@@ -1,7 +1,11 @@
 from datetime import datetime
+from enum import StrEnum
 
 from beanie import Document
-from pydantic import ConfigDict, Field
+from pydantic import ConfigDict, Field, field_validator
+from pymongo import ASCENDING, IndexModel
+
+from app.core.dates import as_utc, utc_now
 
 
 class ClickLog(Document):
@@ -26,8 +30,66 @@ class ClickLog(Document):
     device_type: str | None = None  # mobile, desktop, tablet
     browser: str | None = None
     os: str | None = None
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=utc_now)
+    weight: int = 1  # Clicks this log stands for when the link samples clicks
+    counted: bool = True  # False until a stream click's counters are written
 
     class Settings:
         name = "click_logs"
         use_state_management = True
+        indexes = [
+            # One link's clicks in time order (rollup rebuilds)
+            IndexModel([("short_url_id", ASCENDING), ("timestamp", ASCENDING)]),
+        ]
+
+    @field_validator("timestamp")
+    @classmethod
+    def _assume_utc(cls, value: datetime) -> datetime:
+        # MongoDB hands datetimes back naive
+        return as_utc(value)
+
+
+class RollupPeriod(StrEnum):
+    """Time span one click rollup covers."""
+
+    HOUR = "hour"
+    DAY = "day"
+    TOTAL = "total"  # All time, bucket is None
+
+
+class ClickRollup(Document):
+    """
+    Pre-aggregated click counts for one link and one hour, day or all time.
+
+    Counters are keyed by the dimension value with "%", "." and "$" escaped
+    so they can be used as field names, and each dimension holds at most
+    CLICK_ROLLUP_MAX_KEYS of them; see app.services.rollup.
+    """
+
+    short_url_id: str
+    period: RollupPeriod
+    bucket: datetime | None = None  # Start of the UTC hour or day
+    clicks: int = 0
+    referrers: dict[str, int] = Field(default_factory=dict)
+    countries: dict[str, int] = Field(default_factory=dict)
+    devices: dict[str, int] = Field(default_factory=dict)
+    browsers: dict[str, int] = Field(default_factory=dict)
+    operating_systems: dict[str, int] = Field(default_factory=dict)
+    expires_at: datetime | None = None  # Hour rollups only
+
+    class Settings:
+        name = "click_rollups"
+        indexes = [
+            IndexModel(
+                [("short_url_id", ASCENDING), ("period", ASCENDING), ("bucket", ASCENDING)],
+                unique=True,
+            ),
+            # Platform-wide click counts, covered so the sum never reads documents (admin summary)
+            IndexModel([("period", ASCENDING), ("bucket", ASCENDING), ("clicks", ASCENDING)]),
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
+
+    @field_validator("bucket", "expires_at")
+    @classmethod
+    def _assume_utc(cls, value: datetime | None) -> datetime | None:
+        return as_utc(value)
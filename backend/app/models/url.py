@@ -1,11 +1,30 @@
 from datetime import datetime
+from enum import StrEnum
 
 from beanie import Document, Indexed, Link
-from pydantic import ConfigDict, Field
+from pydantic import ConfigDict, Field, field_validator
+from pymongo import ASCENDING, DESCENDING, IndexModel
 
+from app.core.dates import as_utc, has_expired, utc_now
 from app.models.user import User
 
 
+class RedirectPolicy(StrEnum):
+    """How a short link's redirect may be cached by browsers and CDNs."""
+
+    TEMPORARY = "temporary"  # 302, never cached, every click reaches us
+    CACHED = "cached"  # 302 with Cache-Control: max-age
+    PERMANENT = "permanent"  # 301, cached by clients
+
+
+class PreviewStatus(StrEnum):
+    """Progress of a link's background preview fetch."""
+
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+
 class ShortURL(Document):
     model_config = ConfigDict(
         json_schema_extra={
@@ -19,26 +38,61 @@ class ShortURL(Document):
     )
 
     original_url: str
+    url_hash: str | None = None  # normalized original_url, see app.core.normalize
     short_code: Indexed(str, unique=True)
     user: Link[User]
     custom_alias: str | None = None
     clicks: int = 0
     expiration: datetime | None = None
     is_active: bool = True
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utc_now)
     updated_at: datetime | None = None
 
+    # Redirect caching and click sampling (log 1 in click_sample_rate clicks)
+    redirect_policy: RedirectPolicy = RedirectPolicy.TEMPORARY
+    redirect_max_age: int | None = None
+    click_sample_rate: int = 1
+
     # URL Preview metadata
     preview_title: str | None = None
     preview_description: str | None = None
     preview_image: str | None = None
+    preview_status: PreviewStatus | None = None  # None when no preview was requested
+    preview_fetched_at: datetime | None = None
 
     class Settings:
         name = "short_urls"
         use_state_management = True
+        indexes = [
+            # A user's links, newest first
+            IndexModel(
+                [("user.$id", ASCENDING), ("is_active", ASCENDING), ("created_at", DESCENDING)]
+            ),
+            # Links created since a point in time (admin summary)
+            IndexModel([("created_at", ASCENDING)]),
+            # Expiry sweeper: active links past expiration, long-dead links to archive
+            IndexModel([("is_active", ASCENDING), ("expiration", ASCENDING)]),
+            # Re-shortening: a user's existing link to the same destination
+            IndexModel([("user.$id", ASCENDING), ("url_hash", ASCENDING)]),
+            # Top links: most-clicked active links first (admin)
+            IndexModel([("is_active", ASCENDING), ("clicks", DESCENDING)]),
+            # Preview refresher: links whose preview is stale or was never fetched
+            IndexModel(
+                [
+                    ("is_active", ASCENDING),
+                    ("preview_status", ASCENDING),
+                    ("preview_fetched_at", ASCENDING),
+                    ("created_at", ASCENDING),
+                ]
+            ),
+        ]
+
+    @field_validator("created_at", "updated_at", "expiration", "preview_fetched_at")
+    @classmethod
+    def _assume_utc(cls, value: datetime | None) -> datetime | None:
+        # MongoDB hands datetimes back naive
+        return as_utc(value)
 
     @property
     def is_expired(self) -> bool:
-        if self.expiration is None:
-            return False
-        return datetime.utcnow() > self.expiration
+        return has_expired(self.expiration)
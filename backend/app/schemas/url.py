@@ -2,6 +2,9 @@ from datetime import datetime
 
 from pydantic import BaseModel, Field
 
+from app.core.config import settings
+from app.models.url import PreviewStatus, RedirectPolicy
+
 
 class URLCreate(BaseModel):
     original_url: str = Field(..., description="The original URL to shorten")
@@ -15,6 +18,19 @@ class URLCreate(BaseModel):
     expiration_days: int | None = Field(
         None, ge=1, le=365, description="Number of days until URL expires"
     )
+    redirect_policy: RedirectPolicy = Field(
+        RedirectPolicy.TEMPORARY,
+        description="temporary (302), cached (302 + max-age) or permanent (301)",
+    )
+    redirect_max_age: int | None = Field(
+        None, ge=1, le=31536000, description="Seconds browsers and CDNs may cache the redirect"
+    )
+    click_sample_rate: int = Field(
+        1, ge=1, le=1000, description="Log 1 in N clicks and scale counters by N"
+    )
+    reuse_existing: bool = Field(
+        False, description="Return your existing link to the same destination if there is one"
+    )
 
 
 class URLResponse(BaseModel):
@@ -28,6 +44,29 @@ class URLResponse(BaseModel):
     preview_title: str | None = None
     preview_description: str | None = None
     preview_image: str | None = None
+    preview_status: PreviewStatus | None = None
+    redirect_policy: RedirectPolicy = RedirectPolicy.TEMPORARY
+    redirect_max_age: int | None = None
+    click_sample_rate: int = 1
+
+
+class URLBulkCreate(BaseModel):
+    # Validated per item by create_short_urls, so one bad item fails on its own
+    items: list[dict] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.BULK_SHORTEN_MAX_ITEMS,
+        description="URLs to shorten, each shaped like URLCreate",
+    )
+    fetch_previews: bool = Field(
+        False, description="Queue a background preview fetch for every URL"
+    )
+
+
+class URLBulkResult(BaseModel):
+    index: int
+    url: URLResponse | None = None
+    error: str | None = None
 
 
 class URLStats(BaseModel):
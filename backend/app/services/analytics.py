@@ -1,106 +1,103 @@
-from collections import Counter
 from datetime import UTC, datetime, timedelta
 
-from app.core.database import get_redis
-from app.models.click import ClickLog
+from app.models.click import ClickRollup, RollupPeriod
 from app.models.url import ShortURL
 from app.schemas.url import URLStats
+from app.services.click import get_click_counts
+from app.services.rollup import rollup_counts
 
 
-async def get_url_stats(short_code: str) -> URLStats | None:
-    """Get comprehensive statistics for a shortened URL."""
-    # Find the URL
-    short_url = await ShortURL.find_one({"short_code": short_code})
-    if not short_url:
-        return None
+def stats_rollup_query(short_url_id: str, since: datetime) -> dict:
+    """Query for a link's all-time rollup and its day rollups since a UTC midnight."""
+    return {
+        "short_url_id": short_url_id,
+        "$or": [
+            {"period": RollupPeriod.TOTAL.value},
+            {"period": RollupPeriod.DAY.value, "bucket": {"$gte": since}},
+        ],
+    }
 
-    short_url_id = str(short_url.id)
-    now = datetime.now(UTC)
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = today_start - timedelta(days=7)
 
-    # Get all click logs for this URL
-    all_clicks = await ClickLog.find({"short_url_id": short_url_id}).to_list()
+async def load_rollups(short_url_id: str, since: datetime) -> tuple[ClickRollup | None, dict]:
+    """
+    Fetch a link's all-time rollup and its day rollups since a UTC midnight.
 
-    # Calculate click counts
-    total_clicks = len(all_clicks)
-    clicks_today = sum(1 for c in all_clicks if c.timestamp >= today_start)
-    clicks_this_week = sum(1 for c in all_clicks if c.timestamp >= week_start)
+    Returns the total rollup (None before the first click) and the clicks
+    per day, read from at most one document per day requested.
+    """
+    rollups = await ClickRollup.find(stats_rollup_query(short_url_id, since)).to_list()
 
-    # Calculate top referrers
-    referrers = [c.referrer for c in all_clicks if c.referrer]
-    referrer_counts = Counter(referrers)
-    top_referrers = [
-        {"referrer": ref or "Direct", "count": count}
-        for ref, count in referrer_counts.most_common(10)
-    ]
+    total = next((r for r in rollups if r.period == RollupPeriod.TOTAL), None)
+    daily = {r.bucket.date(): r.clicks for r in rollups if r.period == RollupPeriod.DAY}
+    return total, daily
 
-    # Add "Direct" for clicks without referrer
-    direct_count = sum(1 for c in all_clicks if not c.referrer)
-    if direct_count > 0:
-        top_referrers.append({"referrer": "Direct", "count": direct_count})
-        top_referrers.sort(key=lambda x: x["count"], reverse=True)
-        top_referrers = top_referrers[:10]
-
-    # Calculate clicks by country
-    countries = [c.country for c in all_clicks if c.country]
-    country_counts = Counter(countries)
-    clicks_by_country = [
-        {"country": country or "Unknown", "count": count}
-        for country, count in country_counts.most_common(10)
-    ]
 
-    # Calculate clicks by device
-    devices = [c.device_type for c in all_clicks if c.device_type]
-    device_counts = Counter(devices)
-    clicks_by_device = [
-        {"device": device, "count": count} for device, count in device_counts.most_common()
-    ]
+async def get_url_stats(short_url: ShortURL, days: int = 7, date_format: str = "%b %d") -> URLStats:
+    """
+    Get comprehensive statistics for a shortened URL.
 
-    # Calculate clicks over time (last 30 days)
-    thirty_days_ago = now - timedelta(days=30)
-    daily_clicks = {}
+    Reads the link's click rollups rather than its click logs, so the cost
+    depends on days, not on how often the link was clicked. clicks_over_time
+    covers the last days UTC days, today included, with each date rendered
+    through date_format.
+    """
+    now = datetime.now(UTC)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today_start - timedelta(days=7)
+    series_start = today_start - timedelta(days=days - 1)
 
-    for click in all_clicks:
-        if click.timestamp >= thirty_days_ago:
-            date_key = click.timestamp.strftime("%Y-%m-%d")
-            daily_clicks[date_key] = daily_clicks.get(date_key, 0) + 1
+    total, daily = await load_rollups(str(short_url.id), min(week_start, series_start))
+    total = total or ClickRollup(short_url_id=str(short_url.id), period=RollupPeriod.TOTAL)
 
-    # Fill in missing days with zeros
+    # Fill in days without clicks with zeros
     clicks_over_time = []
-    current_date = thirty_days_ago
-    while current_date <= now:
-        date_key = current_date.strftime("%Y-%m-%d")
-        clicks_over_time.append({"date": date_key, "count": daily_clicks.get(date_key, 0)})
-        current_date += timedelta(days=1)
+    for offset in range(days):
+        day = series_start + timedelta(days=offset)
+        clicks_over_time.append(
+            {"date": day.strftime(date_format), "count": daily.get(day.date(), 0)}
+        )
 
     return URLStats(
-        short_code=short_code,
+        short_code=short_url.short_code,
         original_url=short_url.original_url,
-        total_clicks=total_clicks,
-        clicks_today=clicks_today,
-        clicks_this_week=clicks_this_week,
-        top_referrers=top_referrers,
-        clicks_by_country=clicks_by_country,
-        clicks_by_device=clicks_by_device,
+        total_clicks=total.clicks,
+        clicks_today=daily.get(today_start.date(), 0),
+        clicks_this_week=sum(c for day, c in daily.items() if day >= week_start.date()),
+        top_referrers=[
+            {"referrer": referrer, "count": count}
+            for referrer, count in rollup_counts(total.referrers, limit=10)
+        ],
+        clicks_by_country=[
+            {"country": country, "count": count}
+            for country, count in rollup_counts(total.countries, limit=10)
+        ],
+        clicks_by_device=[
+            {"device": device, "count": count} for device, count in rollup_counts(total.devices)
+        ],
         clicks_over_time=clicks_over_time,
     )
 
 
-async def get_real_time_clicks(short_code: str) -> int:
-    """Get real-time click count from Redis."""
-    try:
-        redis = get_redis()
-        if redis:
-            count = await redis.get(f"clicks:{short_code}")
-            if count:
-                return int(count)
-    except Exception:
-        pass
+async def get_real_time_clicks(short_code: str) -> dict:
+    """Get real-time total, today and this-week click counts from Redis."""
+    counts = await get_click_counts(short_code)
+    if counts:
+        return counts
 
     # Fallback to database
     short_url = await ShortURL.find_one({"short_code": short_code})
-    return short_url.clicks if short_url else 0
+    if not short_url:
+        return {"total": 0, "today": 0, "this_week": 0}
+
+    today_start = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today_start - timedelta(days=7)
+    _, daily = await load_rollups(str(short_url.id), week_start)
+
+    return {
+        "total": short_url.clicks,
+        "today": daily.get(today_start.date(), 0),
+        "this_week": sum(daily.values()),
+    }
 
 
 async def get_top_urls(limit: int = 10) -> list[dict]:
@@ -143,27 +140,55 @@ async def get_top_urls(limit: int = 10) -> list[dict]:
     ]
 
 
-async def get_browser_stats(short_code: str) -> list[dict]:
-    """Get browser breakdown for a URL."""
+def clicks_rollup_query(since: datetime | None = None) -> dict:
+    """Query for every link's all-time rollup, or their day rollups since a UTC midnight."""
+    if since is None:
+        return {"period": RollupPeriod.TOTAL.value}
+    return {"period": RollupPeriod.DAY.value, "bucket": {"$gte": since}}
+
+
+async def count_clicks(since: datetime | None = None) -> int:
+    """
+    Count platform-wide clicks, all time or since a UTC midnight.
+
+    Sums one rollup per link, or per link and day, rather than the click
+    logs, so the cost grows with links instead of clicks.
+    """
+    pipeline = [
+        {"$match": clicks_rollup_query(since)},
+        {"$group": {"_id": None, "clicks": {"$sum": "$clicks"}}},
+    ]
+    results = await ClickRollup.aggregate(pipeline).to_list()
+    return results[0]["clicks"] if results else 0
+
+
+async def get_total_rollup(short_code: str) -> ClickRollup | None:
+    """Get the all-time click rollup of a link by its short code."""
     short_url = await ShortURL.find_one({"short_code": short_code})
     if not short_url:
-        return []
+        return None
+    return await ClickRollup.find_one(
+        {"short_url_id": str(short_url.id), "period": RollupPeriod.TOTAL.value}
+    )
 
-    clicks = await ClickLog.find({"short_url_id": str(short_url.id)}).to_list()
-    browsers = [c.browser for c in clicks if c.browser]
-    browser_counts = Counter(browsers)
 
-    return [{"browser": browser, "count": count} for browser, count in browser_counts.most_common()]
+async def get_browser_stats(short_code: str) -> list[dict]:
+    """Get browser breakdown for a URL."""
+    total = await get_total_rollup(short_code)
+    if not total:
+        return []
+
+    return [
+        {"browser": browser, "count": count} for browser, count in rollup_counts(total.browsers)
+    ]
 
 
 async def get_os_stats(short_code: str) -> list[dict]:
     """Get OS breakdown for a URL."""
-    short_url = await ShortURL.find_one({"short_code": short_code})
-    if not short_url:
+    total = await get_total_rollup(short_code)
+    if not total:
         return []
 
-    clicks = await ClickLog.find({"short_url_id": str(short_url.id)}).to_list()
-    os_list = [c.os for c in clicks if c.os]
-    os_counts = Counter(os_list)
-
-    return [{"os": os_name, "count": count} for os_name, count in os_counts.most_common()]
+    return [
+        {"os": os_name, "count": count} for os_name, count in rollup_counts(total.operating_systems)
+    ]
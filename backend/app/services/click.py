@@ -1,8 +1,45 @@
-from datetime import UTC, datetime
+from collections import Counter
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
 
 from app.core.database import get_redis
 from app.models.click import ClickLog
-from app.models.url import ShortURL
+from app.services.click_counters import click_counters, write_click_counts
+from app.services.rollup import record_rollups
+
+# Day buckets cover "this week" (today plus the previous 7 days), hour buckets the last 48h
+CLICK_DAY_BUCKET_TTL = 9 * 86400
+CLICK_HOUR_BUCKET_TTL = 2 * 86400
+
+DUPLICATE_KEY = 11000
+
+# Bumps the total, calendar-day and hourly counters for one link atomically.
+# KEYS: total, day bucket, hour bucket. ARGV: increment, day TTL, hour TTL.
+RECORD_CLICKS_SCRIPT = """
+redis.call("INCRBY", KEYS[1], ARGV[1])
+redis.call("INCRBY", KEYS[2], ARGV[1])
+redis.call("EXPIRE", KEYS[2], ARGV[2])
+redis.call("INCRBY", KEYS[3], ARGV[1])
+redis.call("EXPIRE", KEYS[3], ARGV[3])
+return 1
+"""
+
+
+@dataclass(slots=True, frozen=True)
+class ClickEvent:
+    """A click captured on the redirect path, before user agent parsing."""
+
+    short_url_id: str
+    short_code: str
+    ip_address: str | None
+    user_agent: str | None
+    referrer: str | None
+    timestamp: datetime
+    weight: int = 1  # 1 in weight clicks was kept by sampling
+    stream_id: str | None = None  # Redis Stream entry ID, set by the stream worker
 
 
 def parse_user_agent(user_agent: str) -> dict:
@@ -48,46 +85,195 @@ def parse_user_agent(user_agent: str) -> dict:
     return result
 
 
-async def log_click(
-    short_url: ShortURL,
-    ip_address: str | None = None,
-    user_agent: str | None = None,
-    referrer: str | None = None,
-) -> ClickLog:
-    """Log a click event for analytics."""
-    # Parse user agent for device info
-    ua_info = parse_user_agent(user_agent or "")
-
-    click_log = ClickLog(
-        short_url_id=str(short_url.id),
-        ip_address=ip_address,
-        user_agent=user_agent,
-        referrer=referrer,
+def click_log_id(stream_id: str) -> ObjectId:
+    """
+    Derive a ClickLog _id from a Redis Stream entry ID.
+
+    A redelivered entry maps to the same _id, so storing it again is a
+    duplicate key error rather than a second click. The entry's millisecond
+    timestamp leads, so the ObjectId's generation time stays meaningful.
+    """
+    milliseconds, sequence = (int(part) for part in stream_id.split("-"))
+    seconds, millisecond = divmod(milliseconds, 1000)
+    return ObjectId(
+        seconds.to_bytes(4, "big") + millisecond.to_bytes(2, "big") + sequence.to_bytes(6, "big")
+    )
+
+
+def build_click_log(event: ClickEvent) -> ClickLog:
+    """Turn a raw click event into a ClickLog with parsed device info."""
+    ua_info = parse_user_agent(event.user_agent or "")
+
+    return ClickLog(
+        id=click_log_id(event.stream_id) if event.stream_id else None,
+        short_url_id=event.short_url_id,
+        ip_address=event.ip_address,
+        user_agent=event.user_agent,
+        referrer=event.referrer,
         device_type=ua_info["device_type"],
         browser=ua_info["browser"],
         os=ua_info["os"],
-        timestamp=datetime.now(UTC),
+        timestamp=event.timestamp,
+        weight=event.weight,
+        counted=event.stream_id is None,
     )
 
-    await click_log.insert()
 
-    # Update click count in the URL document
-    short_url.clicks += 1
-    short_url.updated_at = datetime.now(UTC)
-    await short_url.save()
+async def record_clicks(events: list[ClickEvent]) -> None:
+    """Persist a batch of click events and update their counters."""
+    if not events:
+        return
+
+    logs = [build_click_log(event) for event in events]
+    failed, error = await _insert_click_logs(logs)
+    events = [event for index, event in enumerate(events) if index not in failed]
+    logs = [log for index, log in enumerate(logs) if index not in failed]
+    if logs:
+        for short_url_id, count in _clicks_per_url(events).items():
+            click_counters.add(short_url_id, count)
+        await _update_click_stats(events, logs)
+    if error is not None:
+        raise error
+
+
+async def record_stream_clicks(events: list[ClickEvent]) -> None:
+    """
+    Persist click events read from the Redis Stream and count each one once.
+
+    Logs are stored uncounted under an _id derived from the entry ID, and
+    marked counted once their link counters, rollups and Redis buckets are
+    written. A redelivered entry whose log is stored but unmarked is counted
+    again, so a crash before the counters are written loses nothing; a crash
+    after the counters but before the mark counts that batch twice.
+    """
+    if not events:
+        return
+
+    logs = [build_click_log(event) for event in events]
+    failed, error = await _insert_click_logs(logs)
+    if error is not None:
+        # The stored logs are unmarked, so the redelivered batch counts them
+        raise error
+
+    uncounted = [index for index in range(len(logs)) if index not in failed]
+    if failed:
+        collection = ClickLog.get_motor_collection()
+        cursor = collection.find(
+            {"_id": {"$in": [logs[index].id for index in failed]}, "counted": False}, {"_id": 1}
+        )
+        unmarked = {doc["_id"] async for doc in cursor}
+        uncounted += [index for index in failed if logs[index].id in unmarked]
+    if not uncounted:
+        return
+
+    events = [events[index] for index in uncounted]
+    logs = [logs[index] for index in uncounted]
+    # Written directly rather than buffered, so a failure raises before the mark
+    await write_click_counts(_clicks_per_url(events))
+    await _update_click_stats(events, logs)
+    await ClickLog.get_motor_collection().update_many(
+        {"_id": {"$in": [log.id for log in logs]}}, {"$set": {"counted": True}}
+    )
+
+
+async def _insert_click_logs(logs: list[ClickLog]) -> tuple[set[int], BulkWriteError | None]:
+    """
+    Insert click logs unordered, so a redelivered click does not stop the rest.
+
+    Returns the indexes that were not stored and the error to raise if any
+    failed for a reason other than already being stored.
+    """
+    try:
+        await ClickLog.insert_many(logs, ordered=False)
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        failed = {write_error["index"] for write_error in write_errors}
+        if any(write_error["code"] != DUPLICATE_KEY for write_error in write_errors):
+            return failed, e
+        return failed, None
+    return set(), None
+
+
+def _clicks_per_url(events: list[ClickEvent]) -> Counter:
+    """Sum clicks per link, scaled by sampling weight."""
+    clicks_per_url = Counter()
+    for event in events:
+        clicks_per_url[event.short_url_id] += event.weight
+    return clicks_per_url
+
+
+async def _update_click_stats(events: list[ClickEvent], logs: list[ClickLog]) -> None:
+    """Add newly stored clicks to the rollups and Redis buckets."""
+    await record_rollups(logs)
 
     # Also increment in Redis for real-time analytics
     try:
         redis = get_redis()
         if redis:
-            await redis.incr(f"clicks:{short_url.short_code}")
-            await redis.incr(f"clicks:{short_url.short_code}:today")
-            # Set expiry for daily counter (24 hours)
-            await redis.expire(f"clicks:{short_url.short_code}:today", 86400)
+            await increment_click_buckets(redis, events)
     except Exception:
         pass  # Redis errors shouldn't break the main flow
 
-    return click_log
+
+def click_total_key(short_code: str) -> str:
+    return f"clicks:{short_code}"
+
+
+def click_day_key(short_code: str, moment: datetime) -> str:
+    return f"clicks:{short_code}:{moment.astimezone(UTC):%Y%m%d}"
+
+
+def click_hour_key(short_code: str, moment: datetime) -> str:
+    return f"clicks:{short_code}:{moment.astimezone(UTC):%Y%m%d%H}"
+
+
+async def increment_click_buckets(redis, events: list[ClickEvent]) -> None:
+    """Update total, day and hour counters for a batch in a single round trip."""
+    # Clicks in the same link and hour share one script call
+    buckets = Counter()
+    for event in events:
+        hour = event.timestamp.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+        buckets[(event.short_code, hour)] += event.weight
+    script = redis.register_script(RECORD_CLICKS_SCRIPT)
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for (short_code, hour), count in buckets.items():
+            await script(
+                keys=[
+                    click_total_key(short_code),
+                    click_day_key(short_code, hour),
+                    click_hour_key(short_code, hour),
+                ],
+                args=[count, CLICK_DAY_BUCKET_TTL, CLICK_HOUR_BUCKET_TTL],
+                client=pipe,
+            )
+        await pipe.execute()
+
+
+async def get_click_counts(short_code: str) -> dict | None:
+    """
+    Get total, today and this-week click counts from the Redis buckets.
+
+    Returns None if Redis is unavailable or has no total for the link.
+    """
+    try:
+        redis = get_redis()
+        if not redis:
+            return None
+
+        today = datetime.now(UTC)
+        keys = [click_total_key(short_code)] + [
+            click_day_key(short_code, today - timedelta(days=offset)) for offset in range(8)
+        ]
+        values = await redis.mget(keys)
+    except Exception:
+        return None
+
+    if values[0] is None:
+        return None
+
+    days = [int(value or 0) for value in values[1:]]
+    return {"total": int(values[0]), "today": days[0], "this_week": sum(days)}
 
 
 async def get_click_count(short_code: str) -> int:
@@ -95,7 +281,7 @@ async def get_click_count(short_code: str) -> int:
     try:
         redis = get_redis()
         if redis:
-            count = await redis.get(f"clicks:{short_code}")
+            count = await redis.get(click_total_key(short_code))
             if count:
                 return int(count)
     except Exception:
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from datetime import UTC, datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.models.url import ShortURL
+
+logger = logging.getLogger(__name__)
+
+
+async def write_click_counts(counts: dict[str, int]) -> None:
+    """Apply ShortURL.clicks increments as one unordered bulk write of $inc operations."""
+    now = datetime.now(UTC)
+    operations = [
+        UpdateOne(
+            {"_id": ObjectId(url_id)}, {"$inc": {"clicks": count}, "$set": {"updated_at": now}}
+        )
+        for url_id, count in counts.items()
+    ]
+    await ShortURL.get_motor_collection().bulk_write(operations, ordered=False)
+
+
+class ClickCounterBuffer:
+    """
+    Coalesces ShortURL.clicks increments in memory.
+
+    Increments are flushed every flush_interval seconds as a single unordered
+    bulk write of $inc operations, one per link, so a viral link costs one
+    write per interval instead of one per click.
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._pending: dict[str, int] = {}
+        self._flusher: asyncio.Task | None = None
+        self.flushes = 0
+        self.flushed_clicks = 0
+        self.failed_flushes = 0
+
+    def add(self, short_url_id: str, count: int = 1) -> None:
+        """Record clicks for a link, to be written on the next flush."""
+        self._pending[short_url_id] = self._pending.get(short_url_id, 0) + count
+
+    async def flush(self) -> int:
+        """Write all pending increments. Returns the number of clicks written."""
+        # Swap before awaiting so clicks added during the write land in the next flush
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            await write_click_counts(pending)
+        except Exception:
+            # Keep the increments for the next attempt
+            for url_id, count in pending.items():
+                self.add(url_id, count)
+            self.failed_flushes += 1
+            logger.exception("Failed to flush click counters for %d links", len(pending))
+            return 0
+
+        clicks = sum(pending.values())
+        self.flushes += 1
+        self.flushed_clicks += clicks
+        return clicks
+
+    async def start(self) -> None:
+        """Start flushing periodically."""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write whatever is still pending."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> dict:
+        """Return pending and flushed counters."""
+        return {
+            "pending_links": len(self._pending),
+            "pending_clicks": sum(self._pending.values()),
+            "flushes": self.flushes,
+            "flushed_clicks": self.flushed_clicks,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+click_counters = ClickCounterBuffer(flush_interval=settings.CLICK_COUNTER_FLUSH_INTERVAL_SECONDS)
+
+
+async def start_click_counters() -> None:
+    """Start the periodic click counter flush."""
+    await click_counters.start()
+
+
+async def stop_click_counters() -> None:
+    """Flush remaining click counters and stop."""
+    await click_counters.stop()
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import random
+from datetime import UTC, datetime
+
+from app.core.config import settings
+from app.core.database import get_redis
+from app.services.click import ClickEvent, record_clicks
+from app.services.link_cache import LinkRecord
+
+logger = logging.getLogger(__name__)
+
+
+class ClickIngestor:
+    """
+    Bounded in-process queue of click events with a background consumer.
+
+    The redirect path only enqueues; the consumer persists clicks in batches
+    of up to batch_size, or whatever arrived within flush_interval seconds.
+    When the queue is full new clicks are dropped and counted rather than
+    slowing redirects down.
+    """
+
+    def __init__(self, max_queue_size: int, batch_size: int, flush_interval: float):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue[ClickEvent | None] = asyncio.Queue(maxsize=max_queue_size)
+        self._consumer: asyncio.Task | None = None
+        self._running = False
+        self.accepted = 0
+        self.dropped = 0
+        self.persisted = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def submit(self, event: ClickEvent) -> bool:
+        """Enqueue a click without waiting. Returns False if it was dropped."""
+        if not self._running:
+            self.dropped += 1
+            return False
+
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+        self.accepted += 1
+        return True
+
+    async def start(self) -> None:
+        """Start the background consumer."""
+        if self._running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._running = True
+        self._consumer = asyncio.create_task(self._consume())
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """Stop accepting clicks and flush everything already queued."""
+        if not self._running:
+            return
+        self._running = False
+
+        # The sentinel queues behind every pending click, so they drain first
+        await self._queue.put(None)
+        try:
+            await asyncio.wait_for(self._consumer, timeout)
+        except TimeoutError:
+            logger.warning("Click queue did not drain in time, %d clicks lost", self._queue.qsize())
+        self._consumer = None
+
+    async def _consume(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            event = await self._queue.get()
+            if event is None:
+                break
+
+            batch = [event]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), remaining)
+                except TimeoutError:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[ClickEvent]) -> None:
+        try:
+            await record_clicks(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to persist %d clicks", len(batch))
+            return
+
+        self.persisted += len(batch)
+        self.batches += 1
+
+    def stats(self) -> dict:
+        """Return queue depth and throughput counters."""
+        return {
+            "running": self._running,
+            "queue_size": self._queue.qsize(),
+            "max_queue_size": self.max_queue_size,
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "persisted": self.persisted,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+click_ingestor = ClickIngestor(
+    max_queue_size=settings.CLICK_QUEUE_MAX_SIZE,
+    batch_size=settings.CLICK_BATCH_SIZE,
+    flush_interval=settings.CLICK_FLUSH_INTERVAL_SECONDS,
+)
+
+
+def encode_click_event(event: ClickEvent) -> dict[str, str]:
+    """Flatten a click event into Redis Stream fields."""
+    return {
+        "id": event.short_url_id,
+        "code": event.short_code,
+        "ip": event.ip_address or "",
+        "ua": event.user_agent or "",
+        "ref": event.referrer or "",
+        "ts": event.timestamp.isoformat(),
+        "w": str(event.weight),
+    }
+
+
+def decode_click_event(fields: dict[str, str], stream_id: str | None = None) -> ClickEvent:
+    """Rebuild a click event from Redis Stream fields."""
+    return ClickEvent(
+        short_url_id=fields["id"],
+        short_code=fields["code"],
+        ip_address=fields.get("ip") or None,
+        user_agent=fields.get("ua") or None,
+        referrer=fields.get("ref") or None,
+        timestamp=datetime.fromisoformat(fields["ts"]),
+        weight=int(fields.get("w") or 1),
+        stream_id=stream_id,
+    )
+
+
+async def enqueue_click(
+    short_url: LinkRecord,
+    ip_address: str | None = None,
+    user_agent: str | None = None,
+    referrer: str | None = None,
+) -> bool:
+    """
+    Hand a click off for persistence without waiting on MongoDB.
+
+    In stream mode the click is appended to a Redis Stream for the standalone
+    worker (python -m app.workers.clicks); otherwise, or if Redis is down, it
+    goes to this process's in-memory queue.
+
+    Links with a click_sample_rate of N keep 1 in N clicks, each weighted N.
+    """
+    sample_rate = short_url.click_sample_rate
+    if sample_rate > 1 and random.randrange(sample_rate):
+        return True
+
+    event = ClickEvent(
+        short_url_id=short_url.id,
+        short_code=short_url.short_code,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        referrer=referrer,
+        timestamp=datetime.now(UTC),
+        weight=sample_rate,
+    )
+
+    if settings.CLICK_INGEST_MODE == "stream":
+        try:
+            redis = get_redis()
+            if redis:
+                await redis.xadd(
+                    settings.CLICK_STREAM_KEY,
+                    encode_click_event(event),
+                    maxlen=settings.CLICK_STREAM_MAXLEN,
+                    approximate=True,
+                )
+                return True
+        except Exception:
+            logger.warning("Could not append click to stream, queueing in memory", exc_info=True)
+
+    return click_ingestor.submit(event)
+
+
+async def start_click_ingestor() -> None:
+    """Start the click ingestion consumer for this worker."""
+    await click_ingestor.start()
+
+
+async def stop_click_ingestor() -> None:
+    """Drain queued clicks and stop the consumer."""
+    await click_ingestor.stop(timeout=settings.CLICK_SHUTDOWN_TIMEOUT_SECONDS)
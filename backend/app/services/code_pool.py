@@ -0,0 +1,215 @@
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.database import get_redis
+from app.models.url import ShortURL
+from app.services.expiry import find_archived_codes
+from app.services.short_code import generate_short_code
+
+logger = logging.getLogger(__name__)
+
+CODE_POOL_KEY_PREFIX = "short-codes:pool:"
+
+
+def code_pool_key(length: int) -> str:
+    # One pool per length so changing SHORT_CODE_LENGTH never serves stale codes
+    return f"{CODE_POOL_KEY_PREFIX}{length}"
+
+
+async def find_taken_codes(codes: list[str]) -> set[str]:
+    """Return which of the given codes already belong to a link."""
+    query = {"short_code": {"$in": codes}}
+    projection = {"short_code": 1, "_id": 0}
+    taken = {
+        doc["short_code"] async for doc in ShortURL.get_motor_collection().find(query, projection)
+    }
+    return taken | await find_archived_codes(codes)
+
+
+class CodePool:
+    """
+    Shared pool of pre-generated, unused short codes in a Redis set.
+
+    A background task keeps the pool between low_watermark and target_size,
+    checking each generated batch against MongoDB with a single $in query.
+    create_short_url pops a code with SPOP, which is atomic across workers,
+    so the create path needs no existence check. When Redis is down or the
+    pool runs dry, pop() returns None and callers fall back to random codes.
+    """
+
+    def __init__(
+        self,
+        target_size: int,
+        low_watermark: int,
+        batch_size: int,
+        check_interval: float,
+        code_length: int,
+    ):
+        self.target_size = target_size
+        self.low_watermark = low_watermark
+        self.batch_size = batch_size
+        self.check_interval = check_interval
+        self.code_length = code_length
+        self._refiller: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.codes_added = 0
+        self.failed_refills = 0
+        self.last_size: int | None = None
+
+    @property
+    def key(self) -> str:
+        return code_pool_key(self.code_length)
+
+    async def pop(self) -> str | None:
+        """Take a reserved code from the pool, or None if none is available."""
+        try:
+            redis = get_redis()
+            if redis:
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.spop(self.key)
+                    pipe.scard(self.key)
+                    code, size = await pipe.execute()
+                self.last_size = size
+                if size < self.low_watermark:
+                    self._wakeup.set()
+                if code:
+                    self.hits += 1
+                    return code
+        except Exception:
+            logger.warning("Could not pop from the short code pool", exc_info=True)
+
+        self.misses += 1
+        return None
+
+    async def pop_many(self, count: int) -> list[str]:
+        """Take up to count reserved codes from the pool in one round trip."""
+        try:
+            redis = get_redis()
+            if redis:
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.spop(self.key, count)
+                    pipe.scard(self.key)
+                    codes, size = await pipe.execute()
+                codes = codes or []
+                self.last_size = size
+                if size < self.low_watermark:
+                    self._wakeup.set()
+                self.hits += len(codes)
+                self.misses += count - len(codes)
+                return codes
+        except Exception:
+            logger.warning("Could not pop from the short code pool", exc_info=True)
+
+        self.misses += count
+        return []
+
+    async def claim(self, *short_codes: str) -> None:
+        """Withdraw codes from the pool because they are being used directly (custom aliases)."""
+        try:
+            redis = get_redis()
+            codes = [code for code in short_codes if len(code) == self.code_length]
+            if redis and codes:
+                await redis.srem(self.key, *codes)
+        except Exception:
+            pass  # Redis errors shouldn't break the main flow
+
+    async def refill(self) -> int:
+        """Top the pool up to target_size if it is below the low watermark."""
+        redis = get_redis()
+        if not redis:
+            return 0
+
+        size = await redis.scard(self.key)
+        self.last_size = size
+        if size >= self.low_watermark:
+            return 0
+
+        added = 0
+        while size < self.target_size:
+            codes = list(
+                {
+                    generate_short_code(self.code_length)
+                    for _ in range(min(self.batch_size, self.target_size - size))
+                }
+            )
+            free = set(codes) - await find_taken_codes(codes)
+            batch_added = await redis.sadd(self.key, *free) if free else 0
+            if not batch_added:
+                # Every code collided; try again on the next pass
+                break
+            added += batch_added
+            size = await redis.scard(self.key)
+
+        self.last_size = size
+        self.refills += 1
+        self.codes_added += added
+        return added
+
+    async def start(self) -> None:
+        """Start the background refill task."""
+        if self._refiller is None:
+            self._refiller = asyncio.create_task(self._refill_periodically())
+
+    async def stop(self) -> None:
+        """Stop the background refill task."""
+        if self._refiller is not None:
+            self._refiller.cancel()
+            try:
+                await self._refiller
+            except asyncio.CancelledError:
+                pass
+            self._refiller = None
+
+    async def _refill_periodically(self) -> None:
+        while True:
+            try:
+                await self.refill()
+            except Exception:
+                self.failed_refills += 1
+                logger.exception("Short code pool refill failed")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.check_interval)
+            except TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        """Return pool size and hit/refill counters."""
+        lookups = self.hits + self.misses
+        return {
+            "running": self._refiller is not None,
+            "size": self.last_size,
+            "target_size": self.target_size,
+            "low_watermark": self.low_watermark,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "refills": self.refills,
+            "codes_added": self.codes_added,
+            "failed_refills": self.failed_refills,
+        }
+
+
+code_pool = CodePool(
+    target_size=settings.CODE_POOL_TARGET_SIZE,
+    low_watermark=settings.CODE_POOL_LOW_WATERMARK,
+    batch_size=settings.CODE_POOL_REFILL_BATCH_SIZE,
+    check_interval=settings.CODE_POOL_CHECK_INTERVAL_SECONDS,
+    code_length=settings.SHORT_CODE_LENGTH,
+)
+
+
+async def start_code_pool() -> None:
+    """Start refilling the short code pool, if enabled."""
+    # Counter codes never collide, so there is nothing to pre-check
+    if settings.CODE_POOL_ENABLED and settings.SHORT_CODE_STRATEGY == "random":
+        await code_pool.start()
+
+
+async def stop_code_pool() -> None:
+    """Stop refilling the short code pool."""
+    await code_pool.stop()
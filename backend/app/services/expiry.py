@@ -0,0 +1,216 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.dates import utc_now
+from app.core.lease import RedisLease
+from app.models.url import ShortURL
+from app.services.link_cache import invalidate_links
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "short_urls_archive"
+
+LEASE_KEY = "expiry-sweep:lease"
+
+# MongoDB duplicate key error code
+DUPLICATE_KEY = 11000
+
+
+def get_archive_collection():
+    """Raw Motor collection holding archived short URLs."""
+    return ShortURL.get_motor_collection().database[ARCHIVE_COLLECTION]
+
+
+async def is_archived_code(short_code: str) -> bool:
+    """Return True if a short code belongs to an archived link."""
+    if settings.EXPIRY_ARCHIVE_AFTER_DAYS <= 0:
+        return False
+    doc = await get_archive_collection().find_one({"short_code": short_code}, {"_id": 1})
+    return doc is not None
+
+
+async def find_archived_codes(short_codes: list[str]) -> set[str]:
+    """Return which of the given short codes belong to archived links."""
+    if settings.EXPIRY_ARCHIVE_AFTER_DAYS <= 0 or not short_codes:
+        return set()
+    cursor = get_archive_collection().find(
+        {"short_code": {"$in": short_codes}}, {"short_code": 1, "_id": 0}
+    )
+    return {doc["short_code"] async for doc in cursor}
+
+
+class ExpirySweeper:
+    """
+    Deactivates expired links in bulk on a fixed interval.
+
+    Each pass pages through active links whose expiration has passed (served
+    by the is_active/expiration index), flips each page inactive with a single
+    update_many and drops the links from every cache tier. When
+    archive_after_days is set, links that expired longer ago than that are
+    moved to the archive collection so the hot collection and its indexes
+    only hold live links.
+
+    Every API process starts a sweeper, but only the one holding a Redis
+    lease sweeps, so a pass is not repeated by each process in turn.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        batch_size: int,
+        archive_after_days: int = 0,
+        lease_seconds: float = 300.0,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archive_after_days = archive_after_days
+        self.lease = RedisLease(LEASE_KEY, lease_seconds)
+        self._sweeper: asyncio.Task | None = None
+        self.skipped_sweeps = 0
+        self.sweeps = 0
+        self.failed_sweeps = 0
+        self.deactivated = 0
+        self.archived = 0
+        self.last_sweep_at: datetime | None = None
+
+    async def deactivate_expired(self, now: datetime | None = None) -> int:
+        """Mark every active, expired link inactive. Returns how many were changed."""
+        now = now or utc_now()
+        collection = ShortURL.get_motor_collection()
+        deactivated = 0
+
+        while True:
+            docs = (
+                await collection.find(
+                    {"is_active": True, "expiration": {"$lte": now}}, {"short_code": 1}
+                )
+                .limit(self.batch_size)
+                .to_list(self.batch_size)
+            )
+            if not docs:
+                break
+
+            result = await collection.update_many(
+                {"_id": {"$in": [doc["_id"] for doc in docs]}, "is_active": True},
+                {"$set": {"is_active": False, "updated_at": now}},
+            )
+            deactivated += result.modified_count
+            await invalidate_links([doc["short_code"] for doc in docs])
+
+            if len(docs) < self.batch_size:
+                break
+
+        self.deactivated += deactivated
+        return deactivated
+
+    async def archive_expired(self, now: datetime | None = None) -> int:
+        """Move links that expired over archive_after_days ago to the archive collection."""
+        if self.archive_after_days <= 0:
+            return 0
+
+        cutoff = (now or utc_now()) - timedelta(days=self.archive_after_days)
+        collection = ShortURL.get_motor_collection()
+        archive = get_archive_collection()
+        archived = 0
+
+        while True:
+            docs = (
+                await collection.find({"is_active": False, "expiration": {"$lte": cutoff}})
+                .limit(self.batch_size)
+                .to_list(self.batch_size)
+            )
+            if not docs:
+                break
+
+            try:
+                await archive.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # Copies left behind by an interrupted pass are already archived
+                if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+                    raise
+            await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            archived += len(docs)
+
+            if len(docs) < self.batch_size:
+                break
+
+        self.archived += archived
+        return archived
+
+    async def sweep(self) -> None:
+        """Run one deactivate and archive pass, if this process holds the lease."""
+        if not await self.lease.acquire():
+            self.skipped_sweeps += 1
+            return
+
+        now = utc_now()
+        try:
+            await self.deactivate_expired(now)
+            await self.archive_expired(now)
+        except Exception:
+            self.failed_sweeps += 1
+            logger.exception("Expiry sweep failed")
+            return
+        self.sweeps += 1
+        self.last_sweep_at = now
+
+    async def start(self) -> None:
+        """Start sweeping periodically."""
+        if self.archive_after_days > 0:
+            try:
+                await get_archive_collection().create_index("short_code", unique=True)
+            except Exception:
+                logger.warning("Could not create archive index", exc_info=True)
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_periodically())
+
+    async def stop(self) -> None:
+        """Stop the periodic sweep and hand the lease on."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+            await self.lease.release()
+
+    async def _sweep_periodically(self) -> None:
+        while True:
+            await self.sweep()
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        """Return sweep counters."""
+        return {
+            "running": self._sweeper is not None,
+            "holds_lease": self.lease.held,
+            "skipped_sweeps": self.skipped_sweeps,
+            "sweeps": self.sweeps,
+            "failed_sweeps": self.failed_sweeps,
+            "deactivated": self.deactivated,
+            "archived": self.archived,
+            "last_sweep_at": self.last_sweep_at,
+        }
+
+
+expiry_sweeper = ExpirySweeper(
+    interval=settings.EXPIRY_SWEEP_INTERVAL_SECONDS,
+    batch_size=settings.EXPIRY_SWEEP_BATCH_SIZE,
+    archive_after_days=settings.EXPIRY_ARCHIVE_AFTER_DAYS,
+    lease_seconds=settings.EXPIRY_SWEEP_LEASE_SECONDS,
+)
+
+
+async def start_expiry_sweeper() -> None:
+    """Start the background expiry sweep."""
+    await expiry_sweeper.start()
+
+
+async def stop_expiry_sweeper() -> None:
+    """Stop the background expiry sweep."""
+    await expiry_sweeper.stop()
@@ -0,0 +1,488 @@
+import asyncio
+import logging
+import math
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from app.core.bloom import BloomFilter
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_redis
+from app.core.dates import as_utc, has_expired, utc_now
+from app.models.url import RedirectPolicy, ShortURL
+
+logger = logging.getLogger(__name__)
+
+LINK_KEY_PREFIX = "link:"
+LINK_VERSION_PREFIX = "link-version:"
+INVALIDATION_CHANNEL = "links:invalidate"
+CREATED_CHANNEL = "links:created"
+
+# Filter reloads requested this soon after the previous one back off exponentially
+FILTER_RELOAD_BACKOFF_WINDOW = 300
+FILTER_RELOAD_MAX_BACKOFF = 6
+
+# Writes the record only if no invalidation ran since its version was read
+STORE_IF_CURRENT_SCRIPT = """
+if (redis.call("GET", KEYS[2]) or "") ~= ARGV[1] then
+    return 0
+end
+redis.call("DEL", KEYS[1])
+redis.call("HSET", KEYS[1], unpack(ARGV, 3))
+redis.call("EXPIRE", KEYS[1], ARGV[2])
+return 1
+"""
+
+
+# Fields fetched by the lean redirect lookup
+LINK_RECORD_PROJECTION = {
+    "short_code": 1,
+    "original_url": 1,
+    "is_active": 1,
+    "expiration": 1,
+    "redirect_policy": 1,
+    "redirect_max_age": 1,
+    "click_sample_rate": 1,
+}
+
+
+@dataclass(slots=True, frozen=True)
+class LinkRecord:
+    """The subset of a ShortURL that the redirect path needs."""
+
+    id: str
+    short_code: str
+    original_url: str
+    is_active: bool
+    expiration: datetime | None = None
+    redirect_policy: str = RedirectPolicy.TEMPORARY.value
+    redirect_max_age: int | None = None
+    click_sample_rate: int = 1
+
+    @property
+    def is_expired(self) -> bool:
+        return has_expired(self.expiration)
+
+    @property
+    def redirect_status(self) -> int:
+        return 301 if self.redirect_policy == RedirectPolicy.PERMANENT.value else 302
+
+    @property
+    def cache_control(self) -> str:
+        """Cache-Control for the redirect; temporary links must never be cached."""
+        if self.redirect_policy == RedirectPolicy.TEMPORARY.value:
+            return "no-store"
+        max_age = self.redirect_max_age or settings.REDIRECT_CACHE_MAX_AGE_SECONDS
+        return f"public, max-age={max_age}"
+
+    @classmethod
+    def from_document(cls, short_url: ShortURL) -> "LinkRecord":
+        return cls(
+            id=str(short_url.id),
+            short_code=short_url.short_code,
+            original_url=short_url.original_url,
+            is_active=short_url.is_active,
+            expiration=short_url.expiration,
+            redirect_policy=RedirectPolicy(short_url.redirect_policy).value,
+            redirect_max_age=short_url.redirect_max_age,
+            click_sample_rate=short_url.click_sample_rate,
+        )
+
+    @classmethod
+    def from_mongo(cls, doc: dict) -> "LinkRecord":
+        """Build a record from a raw short_urls document (see LINK_RECORD_PROJECTION)."""
+        return cls(
+            id=str(doc["_id"]),
+            short_code=doc["short_code"],
+            original_url=doc["original_url"],
+            is_active=doc.get("is_active", True),
+            expiration=as_utc(doc.get("expiration")),
+            redirect_policy=doc.get("redirect_policy") or RedirectPolicy.TEMPORARY.value,
+            redirect_max_age=doc.get("redirect_max_age"),
+            click_sample_rate=doc.get("click_sample_rate") or 1,
+        )
+
+    def to_redis_hash(self) -> dict[str, str]:
+        return {
+            "id": self.id,
+            "short_code": self.short_code,
+            "original_url": self.original_url,
+            "is_active": "1" if self.is_active else "0",
+            "expiration": self.expiration.isoformat() if self.expiration else "",
+            "redirect_policy": self.redirect_policy,
+            "redirect_max_age": str(self.redirect_max_age or ""),
+            "click_sample_rate": str(self.click_sample_rate),
+        }
+
+    @classmethod
+    def from_redis_hash(cls, data: dict[str, str]) -> "LinkRecord":
+        return cls(
+            id=data["id"],
+            short_code=data["short_code"],
+            original_url=data["original_url"],
+            is_active=data.get("is_active") == "1",
+            expiration=(
+                as_utc(datetime.fromisoformat(data["expiration"]))
+                if data.get("expiration")
+                else None
+            ),
+            redirect_policy=data.get("redirect_policy") or RedirectPolicy.TEMPORARY.value,
+            redirect_max_age=(
+                int(data["redirect_max_age"]) if data.get("redirect_max_age") else None
+            ),
+            click_sample_rate=int(data.get("click_sample_rate") or 1),
+        )
+
+
+# Per-process cache of short code -> LinkRecord
+link_cache = TTLCache(maxsize=settings.LINK_CACHE_MAX_SIZE, ttl=settings.LINK_CACHE_TTL_SECONDS)
+
+# Short codes recently confirmed missing from MongoDB
+missing_codes = TTLCache(
+    maxsize=settings.LINK_CACHE_MAX_SIZE, ttl=settings.MISSING_CODE_CACHE_TTL_SECONDS
+)
+
+# Existence filter over every short code. Only trusted while this worker is
+# subscribed to CREATED_CHANNEL, otherwise codes created elsewhere would 404,
+# and for CODE_FILTER_MAX_AGE_SECONDS after loading, which bounds how long a
+# lost creation announcement can hide a code.
+code_filter: BloomFilter | None = None
+code_filter_rejections = 0
+_filter_loaded_at = 0.0  # time.monotonic() when code_filter was built
+_filter_loading = False
+_subscribed = False
+_filter_generation = 0  # Bumped on every subscribe and disconnect
+_codes_added_while_loading: list[str] = []
+_filter_reload_backoff = 0
+_last_filter_reload: float | None = None
+
+_invalidation_listener: asyncio.Task | None = None
+_filter_loader: asyncio.Task | None = None
+
+
+async def get_shared_link(short_code: str) -> tuple[LinkRecord | None, str | None]:
+    """
+    Read a link record from the Redis cache shared by all workers.
+
+    Also returns the link's invalidation version, which a lookup that falls
+    through to MongoDB hands back to store_shared_link.
+    """
+    try:
+        redis = get_redis()
+        if redis:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hgetall(f"{LINK_KEY_PREFIX}{short_code}")
+                pipe.get(f"{LINK_VERSION_PREFIX}{short_code}")
+                data, version = await pipe.execute()
+            return (LinkRecord.from_redis_hash(data) if data else None), version
+    except Exception:
+        pass  # Fall through to the database
+
+    return None, None
+
+
+def cache_ttl(record: LinkRecord, ttl: float) -> float:
+    """
+    Cap a cache TTL at the link's expiration time.
+
+    Entries for links that are about to expire evict themselves when the link
+    expires, so the next lookup sees the expired state. Links that have
+    already expired keep the full TTL because that state does not change.
+    """
+    if record.expiration is None:
+        return ttl
+    remaining = (record.expiration - utc_now()).total_seconds()
+    return min(ttl, remaining) if remaining > 0 else ttl
+
+
+async def store_shared_link(record: LinkRecord, version: str | None = None) -> bool:
+    """
+    Write a link record to the shared Redis cache.
+
+    version is the invalidation version get_shared_link returned before the
+    record was read from MongoDB. If the link was invalidated since, the
+    record may be stale and is not stored. Returns False in that case only,
+    so callers know not to cache the record locally either.
+    """
+    try:
+        redis = get_redis()
+        if redis:
+            fields = [item for pair in record.to_redis_hash().items() for item in pair]
+            ttl = math.ceil(cache_ttl(record, settings.LINK_REDIS_TTL_SECONDS))
+            script = redis.register_script(STORE_IF_CURRENT_SCRIPT)
+            stored = await script(
+                keys=[
+                    f"{LINK_KEY_PREFIX}{record.short_code}",
+                    f"{LINK_VERSION_PREFIX}{record.short_code}",
+                ],
+                args=[version or "", ttl, *fields],
+            )
+            return bool(stored)
+    except Exception:
+        pass  # Redis errors shouldn't break the main flow
+
+    return True
+
+
+def _invalidate_shared(pipe, short_code: str) -> None:
+    """Queue the Redis commands that drop a link and bump its version."""
+    version_key = f"{LINK_VERSION_PREFIX}{short_code}"
+    pipe.delete(f"{LINK_KEY_PREFIX}{short_code}")
+    pipe.incr(version_key)
+    # Only lookups already in flight compare against the version
+    pipe.expire(version_key, settings.LINK_REDIS_TTL_SECONDS)
+    pipe.publish(INVALIDATION_CHANNEL, short_code)
+
+
+async def invalidate_link(short_code: str) -> None:
+    """Drop a short code from every cache tier and tell the other workers."""
+    link_cache.invalidate(short_code)
+
+    try:
+        redis = get_redis()
+        if redis:
+            async with redis.pipeline(transaction=True) as pipe:
+                _invalidate_shared(pipe, short_code)
+                await pipe.execute()
+    except Exception:
+        # Other workers still converge once their local TTL runs out
+        logger.warning("Could not publish invalidation for %s", short_code, exc_info=True)
+
+
+async def invalidate_links(short_codes: list[str]) -> None:
+    """Invalidate many short codes with a single Redis round trip."""
+    if not short_codes:
+        return
+    for short_code in short_codes:
+        link_cache.invalidate(short_code)
+
+    try:
+        redis = get_redis()
+        if redis:
+            async with redis.pipeline(transaction=True) as pipe:
+                for short_code in short_codes:
+                    _invalidate_shared(pipe, short_code)
+                await pipe.execute()
+    except Exception:
+        logger.warning(
+            "Could not publish invalidation for %d links", len(short_codes), exc_info=True
+        )
+
+
+def short_code_may_exist(short_code: str) -> bool:
+    """Return False only when a short code is known not to exist."""
+    global code_filter_rejections
+    if missing_codes.get(short_code):
+        return False
+    if code_filter is not None and short_code not in code_filter:
+        if code_filter_age() < settings.CODE_FILTER_MAX_AGE_SECONDS:
+            code_filter_rejections += 1
+            return False
+        # The code may have been created while an announcement was lost
+        _schedule_filter_load()
+    return True
+
+
+def remember_missing(short_code: str) -> None:
+    """Record a confirmed database miss so repeats skip the query."""
+    missing_codes.set(short_code, True)
+
+
+def remember_code(short_code: str) -> None:
+    """Record that a short code now exists."""
+    missing_codes.invalidate(short_code)
+    if _filter_loading:
+        _codes_added_while_loading.append(short_code)
+    if code_filter is not None:
+        code_filter.add(short_code)
+        if code_filter.count > code_filter.capacity:
+            # False positive rate degrades past capacity, so resize
+            _schedule_filter_load()
+
+
+async def announce_new_code(short_code: str) -> None:
+    """Record a newly created short code here and on every other worker."""
+    remember_code(short_code)
+
+    try:
+        redis = get_redis()
+        if redis:
+            await redis.publish(CREATED_CHANNEL, short_code)
+    except Exception:
+        logger.warning("Could not publish creation of %s", short_code, exc_info=True)
+
+
+async def announce_new_codes(short_codes: list[str]) -> None:
+    """Announce many newly created short codes with a single Redis round trip."""
+    if not short_codes:
+        return
+    for short_code in short_codes:
+        remember_code(short_code)
+
+    try:
+        redis = get_redis()
+        if redis:
+            async with redis.pipeline(transaction=False) as pipe:
+                for short_code in short_codes:
+                    pipe.publish(CREATED_CHANNEL, short_code)
+                await pipe.execute()
+    except Exception:
+        logger.warning("Could not publish creation of %d links", len(short_codes), exc_info=True)
+
+
+def code_filter_capacity(count: int) -> int:
+    """Size the filter for the current code count plus headroom for new codes."""
+    return max(
+        math.ceil(count * (1 + settings.CODE_FILTER_HEADROOM)), settings.CODE_FILTER_CAPACITY
+    )
+
+
+def code_filter_age() -> float:
+    """Seconds since the existence filter was built."""
+    return time.monotonic() - _filter_loaded_at
+
+
+async def scan_code_filter() -> BloomFilter:
+    """Build a filter from every short code in MongoDB."""
+    collection = ShortURL.get_motor_collection()
+    count = await collection.estimated_document_count()
+    new_filter = BloomFilter(
+        capacity=code_filter_capacity(count), error_rate=settings.CODE_FILTER_ERROR_RATE
+    )
+    async for doc in collection.find({}, {"short_code": 1, "_id": 0}, batch_size=10000):
+        new_filter.add(doc["short_code"])
+    return new_filter
+
+
+async def load_code_filter(delay: float = 0) -> None:
+    """
+    Build the existence filter from every short code in MongoDB.
+
+    Waits delay seconds first, so workers that all resubscribe at once do
+    not all scan the collection at once. A load that fails, or that overlaps
+    a disconnect or resubscribe and so may miss codes announced meanwhile,
+    is retried after a backed-off delay.
+    """
+    global code_filter, _filter_loaded_at, _filter_loading
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(delay)
+        if not _subscribed:
+            return  # Subscribing again schedules a fresh load
+
+        generation = _filter_generation
+        _filter_loading = True
+        try:
+            new_filter = await scan_code_filter()
+            for short_code in _codes_added_while_loading:
+                new_filter.add(short_code)
+        except Exception:
+            logger.warning("Could not load short code filter", exc_info=True)
+            new_filter = None
+        finally:
+            _codes_added_while_loading.clear()
+            _filter_loading = False
+
+        if new_filter is not None and generation == _filter_generation:
+            code_filter = new_filter
+            _filter_loaded_at = time.monotonic()
+            return
+        delay = filter_reload_delay(loop.time())
+
+
+def filter_reload_delay(now: float) -> float:
+    """
+    Pick a random delay before the next filter reload.
+
+    Delays are spread over CODE_FILTER_RELOAD_JITTER_SECONDS, and the spread
+    doubles for every reload requested within FILTER_RELOAD_BACKOFF_WINDOW
+    of the previous one, e.g. while Redis keeps dropping the subscription.
+    """
+    global _filter_reload_backoff, _last_filter_reload
+    if _last_filter_reload is not None and now - _last_filter_reload < FILTER_RELOAD_BACKOFF_WINDOW:
+        _filter_reload_backoff = min(_filter_reload_backoff + 1, FILTER_RELOAD_MAX_BACKOFF)
+    else:
+        _filter_reload_backoff = 0
+    _last_filter_reload = now
+    return random.uniform(0, settings.CODE_FILTER_RELOAD_JITTER_SECONDS) * 2**_filter_reload_backoff
+
+
+def _schedule_filter_load() -> None:
+    global _filter_loader
+    # A load already under way redoes itself if the subscription changes
+    if settings.CODE_FILTER_ENABLED and (_filter_loader is None or _filter_loader.done()):
+        delay = filter_reload_delay(asyncio.get_running_loop().time())
+        _filter_loader = asyncio.create_task(load_code_filter(delay))
+
+
+def _set_subscribed(subscribed: bool) -> None:
+    """Record a subscription change, so filter loads spanning it are redone."""
+    global _subscribed, _filter_generation, code_filter
+    _subscribed = subscribed
+    _filter_generation += 1
+    if not subscribed:
+        code_filter = None
+
+
+def code_filter_stats() -> dict:
+    """Return existence filter and negative cache counters."""
+    return {
+        "ready": code_filter is not None,
+        "rejections": code_filter_rejections,
+        "reload_backoff": _filter_reload_backoff,
+        "age_seconds": round(code_filter_age(), 1) if code_filter is not None else None,
+        **(code_filter.stats() if code_filter is not None else {}),
+        "missing_codes": missing_codes.stats(),
+    }
+
+
+async def listen_for_invalidations() -> None:
+    """Apply link invalidations and creations published by other workers."""
+    while True:
+        redis = get_redis()
+        if not redis:
+            return
+
+        try:
+            async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL, CREATED_CHANNEL)
+                _set_subscribed(True)
+                # Anything published while we were not subscribed is lost
+                link_cache.clear()
+                missing_codes.clear()
+                _schedule_filter_load()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    if message["channel"] == CREATED_CHANNEL:
+                        remember_code(message["data"])
+                    else:
+                        link_cache.invalidate(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Link invalidation listener disconnected, retrying", exc_info=True)
+            _set_subscribed(False)
+            await asyncio.sleep(1)
+
+
+async def start_invalidation_listener() -> None:
+    """Start the background pub/sub listener for this worker."""
+    global _invalidation_listener
+    _invalidation_listener = asyncio.create_task(listen_for_invalidations())
+
+
+async def stop_invalidation_listener() -> None:
+    """Stop the background pub/sub listener."""
+    global _invalidation_listener
+    for task in (_invalidation_listener, _filter_loader):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    _invalidation_listener = None
+    _set_subscribed(False)
@@ -0,0 +1,292 @@
+import asyncio
+import codecs
+import logging
+from collections.abc import AsyncIterable
+from html.parser import HTMLParser
+
+import aiohttp
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_redis
+from app.core.http import get_http_session
+from app.core.normalize import url_hash
+from app.schemas.url import URLPreview
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_KEY_PREFIX = "preview:"
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+PREVIEW_PROPERTIES = ("og:title", "og:description", "og:image")
+PREVIEW_CHUNK_SIZE = 16 * 1024
+
+
+class PreviewFetchError(Exception):
+    """The destination could not be fetched for a preview."""
+
+
+class HeadMetadataParser(HTMLParser):
+    """
+    Incremental parser collecting the preview tags of an HTML <head>.
+
+    Fed chunk by chunk as the body arrives; done turns True at </head> or
+    the first <body> tag, after which nothing else is needed. Like the
+    previous BeautifulSoup lookups, the first matching tag wins.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta: dict[str, str] = {}
+        self.title: str | None = None
+        self.done = False
+        self._title_parts: list[str] | None = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag == "meta":
+            attrs = dict(attrs)
+            key = attrs.get("property")
+            if key not in PREVIEW_PROPERTIES:
+                key = "description" if attrs.get("name") == "description" else None
+            if key:
+                self.meta.setdefault(key, attrs.get("content") or "")
+        elif tag == "title" and self.title is None:
+            self._title_parts = []
+        elif tag == "body":
+            self.done = True
+
+    def handle_data(self, data: str) -> None:
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "title" and self._title_parts is not None:
+            self.title = "".join(self._title_parts) or None
+            self._title_parts = None
+        elif tag == "head":
+            self.done = True
+
+    def preview(self, url: str) -> URLPreview:
+        """Build a preview from the tags seen so far, Open Graph first."""
+        preview = URLPreview(url=url)
+        if "og:title" in self.meta:
+            preview.title = self.meta["og:title"][:200]
+        elif self.title:
+            preview.title = self.title[:200]
+
+        description = self.meta.get("og:description", self.meta.get("description"))
+        if description is not None:
+            preview.description = description[:500]
+
+        if "og:image" in self.meta:
+            preview.image = self.meta["og:image"]
+        return preview
+
+
+async def extract_head_metadata(
+    url: str, chunks: AsyncIterable[bytes], encoding: str, max_bytes: int
+) -> URLPreview:
+    """
+    Parse preview metadata from a streamed HTML body.
+
+    Stops reading at the end of <head> or after max_bytes, whichever comes
+    first, so the size of the page body never matters.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    parser = HeadMetadataParser()
+    remaining = max_bytes
+    async for chunk in chunks:
+        chunk = chunk[:remaining]
+        remaining -= len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if parser.done or remaining <= 0:
+            break
+    return parser.preview(url)
+
+
+async def _scrape(session: aiohttp.ClientSession, url: str) -> URLPreview:
+    async with session.get(url, allow_redirects=True) as response:
+        if response.status != 200:
+            raise PreviewFetchError(f"{url} returned {response.status}")
+        if response.content_type not in HTML_CONTENT_TYPES:
+            raise PreviewFetchError(f"{url} is {response.content_type}, not HTML")
+        return await extract_head_metadata(
+            url,
+            response.content.iter_chunked(PREVIEW_CHUNK_SIZE),
+            response.charset or "utf-8",
+            settings.PREVIEW_MAX_BYTES,
+        )
+
+
+async def scrape_url_preview(url: str) -> URLPreview:
+    """Fetch Open Graph metadata from a URL, raising PreviewFetchError on failure."""
+    try:
+        session = get_http_session()
+        if session is not None:
+            return await _scrape(session, url)
+        # Outside the app lifespan (scripts, tests) fall back to a one-off session
+        timeout = aiohttp.ClientTimeout(total=settings.PREVIEW_FETCH_TIMEOUT_SECONDS)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            return await _scrape(session, url)
+    except PreviewFetchError:
+        raise
+    except Exception as e:
+        raise PreviewFetchError(f"Could not fetch {url}") from e
+
+
+# Cached marker for a URL whose last fetch failed (stored as "" in Redis)
+FETCH_FAILED = ""
+
+
+class PreviewCache:
+    """
+    Preview metadata cached per normalized URL in a local and a Redis tier.
+
+    Lookups try the in-process TTL cache, then Redis, then the destination.
+    Failed fetches are cached too, for negative_ttl seconds, so a dead host
+    is not crawled again on every request. Concurrent misses for the same
+    URL in this process share a single in-flight fetch.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local = TTLCache(maxsize=max_size, ttl=ttl)
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self.redis_hits = 0
+        self.fetches = 0
+        self.failures = 0
+        self.shared_fetches = 0
+
+    async def get(self, url: str) -> URLPreview:
+        """Return the preview for a URL, raising PreviewFetchError if it cannot be fetched."""
+        key = url_hash(url)
+        cached = self.local.get(key)
+        if cached is None:
+            cached = await self._load_once(key, url)
+        if cached == FETCH_FAILED:
+            raise PreviewFetchError(f"{url} could not be fetched recently")
+        # Spelling variants share an entry; answer with the URL that was asked for
+        return cached.model_copy(update={"url": url})
+
+    async def _load_once(self, key: str, url: str) -> URLPreview | str:
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            self.shared_fetches += 1
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if flight.cancelled():
+                    raise PreviewFetchError(f"Fetch of {url} was abandoned") from None
+                raise
+
+        flight = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting; don't log an unretrieved exception then
+        flight.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._in_flight[key] = flight
+        try:
+            cached = await self._load(key, url)
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(cached)
+            return cached
+        finally:
+            del self._in_flight[key]
+
+    async def refresh(self, url: str) -> URLPreview:
+        """Fetch a URL's preview again, replacing whatever both tiers have cached."""
+        key = url_hash(url)
+        cached = await self._fetch(key, url)
+        self.local.set(key, cached, ttl=self.negative_ttl if cached == FETCH_FAILED else None)
+        if cached == FETCH_FAILED:
+            raise PreviewFetchError(f"Could not fetch {url}")
+        return cached.model_copy(update={"url": url})
+
+    async def _load(self, key: str, url: str) -> URLPreview | str:
+        cached = await self._get_shared(key)
+        if cached is not None:
+            self.redis_hits += 1
+        else:
+            cached = await self._fetch(key, url)
+
+        self.local.set(key, cached, ttl=self.negative_ttl if cached == FETCH_FAILED else None)
+        return cached
+
+    async def _fetch(self, key: str, url: str) -> URLPreview | str:
+        self.fetches += 1
+        try:
+            cached = await scrape_url_preview(url)
+        except PreviewFetchError:
+            self.failures += 1
+            cached = FETCH_FAILED
+        await self._store_shared(key, cached)
+        return cached
+
+    async def _get_shared(self, key: str) -> URLPreview | str | None:
+        try:
+            redis = get_redis()
+            if redis:
+                data = await redis.get(f"{PREVIEW_KEY_PREFIX}{key}")
+                if data is not None:
+                    return data and URLPreview.model_validate_json(data)
+        except Exception:
+            pass  # Redis errors shouldn't break the main flow
+        return None
+
+    async def _store_shared(self, key: str, cached: URLPreview | str) -> None:
+        try:
+            redis = get_redis()
+            if redis:
+                if cached == FETCH_FAILED:
+                    await redis.set(f"{PREVIEW_KEY_PREFIX}{key}", "", ex=int(self.negative_ttl))
+                else:
+                    await redis.set(
+                        f"{PREVIEW_KEY_PREFIX}{key}", cached.model_dump_json(), ex=int(self.ttl)
+                    )
+        except Exception:
+            logger.warning("Could not store preview for %s in Redis", key, exc_info=True)
+
+    def stats(self) -> dict:
+        """Return tier hit rates and fetch counters."""
+        return {
+            "local": self.local.stats(),
+            "redis_hits": self.redis_hits,
+            "fetches": self.fetches,
+            "failures": self.failures,
+            "shared_fetches": self.shared_fetches,
+            "in_flight": len(self._in_flight),
+            "negative_ttl_seconds": self.negative_ttl,
+        }
+
+
+preview_cache = PreviewCache(
+    max_size=settings.PREVIEW_CACHE_MAX_SIZE,
+    ttl=settings.PREVIEW_CACHE_TTL_SECONDS,
+    negative_ttl=settings.PREVIEW_CACHE_NEGATIVE_TTL_SECONDS,
+)
+
+
+async def cached_url_preview(url: str) -> URLPreview:
+    """Fetch Open Graph metadata through the preview cache, raising PreviewFetchError."""
+    return await preview_cache.get(url)
+
+
+async def refresh_url_preview(url: str) -> URLPreview:
+    """Re-fetch Open Graph metadata and overwrite the cached copy, raising PreviewFetchError."""
+    return await preview_cache.refresh(url)
+
+
+async def fetch_url_preview(url: str) -> URLPreview:
+    """Fetch Open Graph metadata from a URL for preview."""
+    try:
+        return await cached_url_preview(url)
+    except Exception:
+        return URLPreview(url=url)  # Return an empty preview on error
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from pymongo import DESCENDING, UpdateMany
+
+from app.core.config import settings
+from app.core.dates import utc_now
+from app.core.lease import RedisLease
+from app.core.normalize import url_hash
+from app.models.url import PreviewStatus, ShortURL
+from app.schemas.url import URLPreview
+from app.services.preview import PreviewFetchError, refresh_url_preview
+
+logger = logging.getLogger(__name__)
+
+# A link still pending this long after creation lost its preview job (e.g. a restart)
+PENDING_GRACE = timedelta(minutes=15)
+
+LEASE_KEY = "preview-refresh:lease"
+
+
+class HostLimiter:
+    """
+    Per-host politeness limits for outbound fetches.
+
+    At most concurrency requests are in flight to one host, and request
+    starts to the same host are spaced at least interval seconds apart.
+    """
+
+    def __init__(self, concurrency: int, interval: float):
+        self.concurrency = concurrency
+        self.interval = interval
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._next_start: dict[str, float] = {}
+        self.delays = 0
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.concurrency))
+        async with semaphore:
+            now = asyncio.get_running_loop().time()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.interval
+            if start > now:
+                self.delays += 1
+                await asyncio.sleep(start - now)
+            yield
+
+    def reset(self) -> None:
+        """Forget per-host state between passes."""
+        self._semaphores.clear()
+        self._next_start.clear()
+
+
+class PreviewRefresher:
+    """
+    Re-crawls stale link previews in the background, most-clicked first.
+
+    Each pass takes up to batch_size active links whose preview was fetched
+    over stale_after_days ago (or never, for links that lost their job),
+    fetches each distinct destination once under a global and a per-host
+    limit, bypassing and overwriting the preview cache, and writes the
+    results with a single unordered bulk_write.
+
+    Every API process starts a refresher, but only the one holding a Redis
+    lease runs passes, so batches are crawled once and the per-host limits
+    hold across the deployment. The others skip their passes and take over
+    when the lease lapses. Without Redis every process refreshes.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        batch_size: int,
+        stale_after_days: int,
+        concurrency: int,
+        per_host_concurrency: int,
+        per_host_interval: float,
+        lease_seconds: float = 300.0,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stale_after_days = stale_after_days
+        self.concurrency = concurrency
+        self.hosts = HostLimiter(per_host_concurrency, per_host_interval)
+        self.lease = RedisLease(LEASE_KEY, lease_seconds)
+        self._refresher: asyncio.Task | None = None
+        self.skipped_passes = 0
+        self.passes = 0
+        self.failed_passes = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.fetched_urls = 0
+        self.queue_depth = 0
+        self.last_pass_at: datetime | None = None
+        self.last_pass_seconds: float | None = None
+        self.last_pass_links = 0
+
+    def stale_query(self, now: datetime) -> dict:
+        """
+        Query for active links whose preview is due for a refresh.
+
+        Each $or branch is matched by range on the
+        (is_active, preview_status, preview_fetched_at, created_at) index, so
+        a pass only reads stale links. Links created with previews off have a
+        null status and are never matched.
+        """
+        statuses = [status.value for status in PreviewStatus]
+        return {
+            "$or": [
+                {
+                    "is_active": True,
+                    "preview_status": {"$in": statuses},
+                    "preview_fetched_at": {"$lt": now - timedelta(days=self.stale_after_days)},
+                },
+                # Never fetched, e.g. the preview job was lost in a restart
+                {
+                    "is_active": True,
+                    "preview_status": {"$in": statuses},
+                    "preview_fetched_at": None,
+                    "created_at": {"$lt": now - PENDING_GRACE},
+                },
+            ]
+        }
+
+    async def find_stale(self, now: datetime) -> list[dict]:
+        """Return the next batch of stale links, most-clicked first."""
+        return (
+            await ShortURL.get_motor_collection()
+            .find(self.stale_query(now), {"original_url": 1})
+            .sort("clicks", DESCENDING)
+            .limit(self.batch_size)
+            .to_list(self.batch_size)
+        )
+
+    async def refresh(self, now: datetime | None = None) -> int:
+        """Refresh one batch of stale previews. Returns how many links were updated."""
+        now = now or utc_now()
+        docs = await self.find_stale(now)
+        if not docs:
+            return 0
+
+        # Many links often share a destination; crawl it once
+        destinations: dict[str, tuple[str, list]] = {}
+        for doc in docs:
+            url = doc["original_url"]
+            destinations.setdefault(url_hash(url), (url, []))[1].append(doc["_id"])
+
+        self.queue_depth = len(destinations)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(url: str) -> URLPreview | None:
+            # Wait out per-host spacing before taking one of the global slots
+            async with self.hosts.slot(urlsplit(url).hostname or ""), semaphore:
+                try:
+                    # The cached preview is the stale one being replaced
+                    return await refresh_url_preview(url)
+                except PreviewFetchError:
+                    return None
+                finally:
+                    self.queue_depth -= 1
+                    self.fetched_urls += 1
+
+        previews = await asyncio.gather(*(fetch(url) for url, _ in destinations.values()))
+        self.hosts.reset()
+
+        operations = []
+        for (_, ids), preview in zip(destinations.values(), previews, strict=True):
+            if preview is None:
+                self.failed += len(ids)
+                # Keep the last good preview; only links that never had one become failed
+                operations.append(
+                    UpdateMany({"_id": {"$in": ids}}, {"$set": {"preview_fetched_at": now}})
+                )
+                operations.append(
+                    UpdateMany(
+                        {"_id": {"$in": ids}, "preview_status": {"$ne": PreviewStatus.DONE.value}},
+                        {"$set": {"preview_status": PreviewStatus.FAILED.value}},
+                    )
+                )
+            else:
+                self.refreshed += len(ids)
+                operations.append(
+                    UpdateMany(
+                        {"_id": {"$in": ids}},
+                        {
+                            "$set": {
+                                "preview_title": preview.title,
+                                "preview_description": preview.description,
+                                "preview_image": preview.image,
+                                "preview_status": PreviewStatus.DONE.value,
+                                "preview_fetched_at": now,
+                            }
+                        },
+                    )
+                )
+        await ShortURL.get_motor_collection().bulk_write(operations, ordered=False)
+        return len(docs)
+
+    async def run_pass(self) -> None:
+        """Refresh one batch and record timing, if this process holds the lease."""
+        if not await self.lease.acquire():
+            self.skipped_passes += 1
+            return
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            links = await self.refresh()
+        except Exception:
+            self.failed_passes += 1
+            logger.exception("Preview refresh failed")
+            return
+        finally:
+            self.queue_depth = 0
+        self.passes += 1
+        self.last_pass_at = utc_now()
+        self.last_pass_seconds = round(loop.time() - started, 3)
+        self.last_pass_links = links
+
+    async def start(self) -> None:
+        """Start refreshing periodically, unless disabled."""
+        if self.stale_after_days > 0 and self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        """Stop the periodic refresh and hand the lease on."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+            await self.lease.release()
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await self.run_pass()
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        """Return progress, queue depth and throughput counters."""
+        seconds = self.last_pass_seconds
+        return {
+            "running": self._refresher is not None,
+            "holds_lease": self.lease.held,
+            "skipped_passes": self.skipped_passes,
+            "passes": self.passes,
+            "failed_passes": self.failed_passes,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "fetched_urls": self.fetched_urls,
+            "queue_depth": self.queue_depth,
+            "host_delays": self.hosts.delays,
+            "last_pass_at": self.last_pass_at,
+            "last_pass_seconds": seconds,
+            "last_pass_links_per_second": (
+                round(self.last_pass_links / seconds, 1) if seconds else None
+            ),
+        }
+
+
+preview_refresher = PreviewRefresher(
+    interval=settings.PREVIEW_REFRESH_INTERVAL_SECONDS,
+    batch_size=settings.PREVIEW_REFRESH_BATCH_SIZE,
+    stale_after_days=settings.PREVIEW_REFRESH_AFTER_DAYS,
+    concurrency=settings.PREVIEW_REFRESH_CONCURRENCY,
+    per_host_concurrency=settings.PREVIEW_REFRESH_PER_HOST_CONCURRENCY,
+    per_host_interval=settings.PREVIEW_REFRESH_PER_HOST_INTERVAL_SECONDS,
+    lease_seconds=settings.PREVIEW_REFRESH_LEASE_SECONDS,
+)
+
+
+async def start_preview_refresher() -> None:
+    """Start the background preview refresh."""
+    await preview_refresher.start()
+
+
+async def stop_preview_refresher() -> None:
+    """Stop the background preview refresh."""
+    await preview_refresher.stop()
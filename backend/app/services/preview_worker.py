@@ -0,0 +1,152 @@
+import asyncio
+import logging
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.dates import utc_now
+from app.models.url import PreviewStatus, ShortURL
+from app.services.preview import PreviewFetchError, cached_url_preview
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewWorker:
+    """
+    Bounded in-process queue of preview jobs with a fixed pool of fetchers.
+
+    Creating a link only enqueues its ID and URL; concurrency fetcher tasks
+    take jobs off the queue, scrape the destination and patch the preview
+    fields and preview_status of that one document with a targeted $set.
+    Jobs that do not fit in the queue, and jobs still queued at shutdown,
+    are not retried here and leave the link marked failed or pending.
+    """
+
+    def __init__(self, max_queue_size: int, concurrency: int):
+        self.max_queue_size = max_queue_size
+        self.concurrency = concurrency
+        self._queue: asyncio.Queue[tuple[ObjectId, str]] = asyncio.Queue(maxsize=max_queue_size)
+        self._fetchers: list[asyncio.Task] = []
+        self.accepted = 0
+        self.dropped = 0
+        self.done = 0
+        self.failed = 0
+        self.in_flight = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._fetchers)
+
+    def submit(self, short_url_id: ObjectId, url: str) -> bool:
+        """Queue a preview fetch without waiting. Returns False if it was dropped."""
+        if not self.running:
+            self.dropped += 1
+            return False
+
+        try:
+            self._queue.put_nowait((short_url_id, url))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+        self.accepted += 1
+        return True
+
+    async def start(self) -> None:
+        """Start the fetcher tasks."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._fetchers = [asyncio.create_task(self._fetch_jobs()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Stop the fetcher tasks, abandoning queued jobs."""
+        if not self.running:
+            return
+        for fetcher in self._fetchers:
+            fetcher.cancel()
+        await asyncio.gather(*self._fetchers, return_exceptions=True)
+        if self._queue.qsize():
+            logger.info("%d preview jobs left pending at shutdown", self._queue.qsize())
+        self._fetchers = []
+
+    async def _fetch_jobs(self) -> None:
+        while True:
+            short_url_id, url = await self._queue.get()
+            self.in_flight += 1
+            try:
+                await self.process(short_url_id, url)
+            except Exception:
+                logger.exception("Preview job for %s failed", url)
+            finally:
+                self.in_flight -= 1
+
+    async def process(self, short_url_id: ObjectId, url: str) -> None:
+        """Fetch one preview and store the result on its link."""
+        try:
+            preview = await cached_url_preview(url)
+        except PreviewFetchError:
+            self.failed += 1
+            update = {"preview_status": PreviewStatus.FAILED.value, "preview_fetched_at": utc_now()}
+        else:
+            self.done += 1
+            update = {
+                "preview_title": preview.title,
+                "preview_description": preview.description,
+                "preview_image": preview.image,
+                "preview_status": PreviewStatus.DONE.value,
+                "preview_fetched_at": utc_now(),
+            }
+        await ShortURL.get_motor_collection().update_one({"_id": short_url_id}, {"$set": update})
+
+    def stats(self) -> dict:
+        """Return queue depth and job counters."""
+        return {
+            "running": self.running,
+            "queue_size": self._queue.qsize(),
+            "max_queue_size": self.max_queue_size,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "done": self.done,
+            "failed": self.failed,
+        }
+
+
+preview_worker = PreviewWorker(
+    max_queue_size=settings.PREVIEW_QUEUE_MAX_SIZE,
+    concurrency=settings.PREVIEW_WORKER_CONCURRENCY,
+)
+
+
+async def queue_previews(short_urls: list[ShortURL]) -> None:
+    """
+    Queue preview fetches for freshly inserted links marked pending.
+
+    Links the worker cannot take are marked failed in one update, so clients
+    never wait on a preview that is not coming.
+    """
+    rejected = [
+        short_url
+        for short_url in short_urls
+        if not preview_worker.submit(short_url.id, short_url.original_url)
+    ]
+    if not rejected:
+        return
+    for short_url in rejected:
+        short_url.preview_status = PreviewStatus.FAILED
+    await ShortURL.get_motor_collection().update_many(
+        {"_id": {"$in": [short_url.id for short_url in rejected]}},
+        {"$set": {"preview_status": PreviewStatus.FAILED.value}},
+    )
+
+
+async def start_preview_worker() -> None:
+    """Start the background preview fetchers."""
+    await preview_worker.start()
+
+
+async def stop_preview_worker() -> None:
+    """Stop the background preview fetchers."""
+    await preview_worker.stop()
@@ -0,0 +1,208 @@
+import logging
+from collections import Counter
+from datetime import UTC, datetime, timedelta
+from urllib.parse import unquote, urlsplit
+
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.core.dates import as_utc, utc_now
+from app.models.click import ClickLog, ClickRollup, RollupPeriod
+
+logger = logging.getLogger(__name__)
+
+# Rollup counter -> (ClickLog field it counts, label for clicks without a value).
+# Without a label, clicks lacking the value are left out of that counter.
+DIMENSIONS = {
+    "referrers": ("referrer", "Direct"),
+    "countries": ("country", "Unknown"),
+    "devices": ("device_type", "Unknown"),
+    "browsers": ("browser", None),
+    "operating_systems": ("os", None),
+}
+
+# Counter that clicks fold into once a dimension holds its maximum number of keys
+OTHER = "Other"
+
+
+def rollup_key(value: str) -> str:
+    """Escape a dimension value so it can be used as a MongoDB field name."""
+    return value.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def rollup_counts(counts: dict[str, int], limit: int | None = None) -> list[tuple[str, int]]:
+    """Unescape a rollup counter and rank it, largest first."""
+    ranked = sorted(((unquote(key), count) for key, count in counts.items()), key=_by_count)
+    return ranked[:limit] if limit else ranked
+
+
+def _by_count(item: tuple[str, int]) -> tuple[int, str]:
+    return -item[1], item[0]
+
+
+def referrer_host(referrer: str | None) -> str | None:
+    """Reduce a referrer to its host, keeping the number of distinct keys bounded."""
+    if not referrer:
+        return None
+    return urlsplit(referrer).hostname or referrer
+
+
+class RollupBatch:
+    """
+    Coalesces the rollup increments for a batch of click logs.
+
+    Every click bumps the counters of its hour, its UTC day and the link's
+    all-time rollup. Clicks sharing a link and bucket are summed first, so
+    updates() returns one upsert per touched rollup document. Hour rollups
+    older than hour_retention are not written at all.
+
+    Referrers and countries come from the client, so each dimension of a
+    rollup document keeps at most max_keys counters; clicks for values that
+    no longer fit are counted under OTHER instead.
+    """
+
+    def __init__(self, hour_retention: timedelta, max_keys: int):
+        self.hour_retention = hour_retention
+        self.max_keys = max_keys
+        self._oldest_hour = utc_now() - hour_retention
+        self._increments: dict[tuple[str, RollupPeriod, datetime | None], Counter] = {}
+
+    def __len__(self) -> int:
+        return len(self._increments)
+
+    def add(self, click: ClickLog) -> None:
+        """Count one click log in its hour, day and total rollups."""
+        hour = as_utc(click.timestamp).astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+        increments = Counter({"clicks": click.weight})
+        for counter, (field, missing) in DIMENSIONS.items():
+            value = getattr(click, field)
+            if counter == "referrers":
+                value = referrer_host(value)
+            value = value or missing
+            if value:
+                increments[f"{counter}.{rollup_key(value)}"] += click.weight
+
+        buckets = [(RollupPeriod.DAY, hour.replace(hour=0)), (RollupPeriod.TOTAL, None)]
+        if hour >= self._oldest_hour:
+            buckets.append((RollupPeriod.HOUR, hour))
+        for period, bucket in buckets:
+            self._increments.setdefault((click.short_url_id, period, bucket), Counter()).update(
+                increments
+            )
+
+    def increments(self) -> list[tuple[dict, Counter]]:
+        """Return each rollup document's filter and the counters to add to it."""
+        return [
+            ({"short_url_id": short_url_id, "period": period.value, "bucket": bucket}, increments)
+            for (short_url_id, period, bucket), increments in self._increments.items()
+        ]
+
+    def updates(self) -> list[tuple[dict, list[dict]]]:
+        """Return the (filter, update pipeline) pair of each rollup document's upsert."""
+        updates = []
+        for query, increments in self.increments():
+            fields = {"clicks": _incremented("clicks", increments["clicks"])}
+            for counter in DIMENSIONS:
+                prefix = f"{counter}."
+                counts = {
+                    key.removeprefix(prefix): count
+                    for key, count in increments.items()
+                    if key.startswith(prefix)
+                }
+                if counts:
+                    fields.update(self._capped_fields(counter, counts))
+            if query["period"] == RollupPeriod.HOUR.value:
+                fields["expires_at"] = {
+                    "$ifNull": ["$expires_at", query["bucket"] + self.hour_retention]
+                }
+            updates.append((query, [{"$set": fields}]))
+        return updates
+
+    def _capped_fields(self, counter: str, counts: dict[str, int]) -> dict:
+        """
+        Build the $set expressions adding counts to one dimension of a document.
+
+        A key the document already has is always incremented. A new key is
+        added only if the document would stay within max_keys even with every
+        key of this update new plus OTHER, so concurrent upserts cannot
+        overshoot; anything else goes to OTHER.
+        """
+        overflow: list = [counts.pop(OTHER, 0)]
+        stored = {"$size": {"$objectToArray": {"$ifNull": [f"${counter}", {}]}}}
+        has_room = {"$lte": [{"$add": [stored, len(counts) + 1]}, self.max_keys]}
+        fields = {}
+        for key, count in counts.items():
+            path = f"{counter}.{key}"
+            fits = {"$or": [{"$gt": [{"$ifNull": [f"${path}", 0]}, 0]}, has_room]}
+            fields[path] = {"$cond": [fits, _incremented(path, count), "$$REMOVE"]}
+            overflow.append({"$cond": [fits, 0, count]})
+
+        other = f"{counter}.{OTHER}"
+        fields[other] = {
+            "$let": {
+                "vars": {"count": {"$add": [{"$ifNull": [f"${other}", 0]}, *overflow]}},
+                "in": {"$cond": [{"$eq": ["$$count", 0]}, "$$REMOVE", "$$count"]},
+            }
+        }
+        return fields
+
+    def operations(self) -> list[UpdateOne]:
+        """Build one upsert per rollup document."""
+        return [UpdateOne(query, update, upsert=True) for query, update in self.updates()]
+
+
+def _incremented(path: str, count: int) -> dict:
+    """Expression for a counter field raised by count, starting from zero."""
+    return {"$add": [{"$ifNull": [f"${path}", 0]}, count]}
+
+
+def new_rollup_batch() -> RollupBatch:
+    return RollupBatch(
+        timedelta(days=settings.CLICK_ROLLUP_HOUR_RETENTION_DAYS),
+        max_keys=settings.CLICK_ROLLUP_MAX_KEYS,
+    )
+
+
+async def write_rollups(batch: RollupBatch) -> None:
+    """Apply a batch of rollup increments in a single unordered bulk write."""
+    if batch:
+        await ClickRollup.get_motor_collection().bulk_write(batch.operations(), ordered=False)
+
+
+async def record_rollups(clicks: list[ClickLog]) -> None:
+    """
+    Add freshly stored click logs to their rollups.
+
+    A failed write is logged rather than raised: the click logs are already
+    stored, and rebuild_rollups can recount them.
+    """
+    batch = new_rollup_batch()
+    for click in clicks:
+        batch.add(click)
+    try:
+        await write_rollups(batch)
+    except Exception:
+        logger.exception("Failed to update click rollups for %d clicks", len(clicks))
+
+
+async def rebuild_rollups(short_url_id: str | None = None, batch_size: int = 5000) -> int:
+    """
+    Recount rollups from the raw click logs of one link, or of every link.
+
+    Existing rollups in scope are deleted first and the logs replayed in
+    batches of batch_size. Clicks ingested during the rebuild may be counted
+    twice, so run it with click ingestion paused. Returns the logs replayed.
+    """
+    query = {"short_url_id": short_url_id} if short_url_id else {}
+    await ClickRollup.get_motor_collection().delete_many(query)
+
+    batch = new_rollup_batch()
+    replayed = 0
+    async for click in ClickLog.find(query):
+        batch.add(click)
+        replayed += 1
+        if replayed % batch_size == 0:
+            await write_rollups(batch)
+            batch = new_rollup_batch()
+    await write_rollups(batch)
+    return replayed
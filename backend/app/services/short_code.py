@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import secrets
+import string
+
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.models.url import ShortURL
+
+# Base62 character set for URL-safe short codes
+BASE62_CHARS = string.digits + string.ascii_lowercase + string.ascii_uppercase
+
+COUNTERS_COLLECTION = "counters"
+FEISTEL_ROUNDS = 4
+
+
+def generate_short_code(length: int = None) -> str:
+    """Generate a random base62 short code."""
+    if length is None:
+        length = settings.SHORT_CODE_LENGTH
+    return "".join(secrets.choice(BASE62_CHARS) for _ in range(length))
+
+
+def encode_base62(value: int, length: int) -> str:
+    """Encode a non-negative integer as a fixed-length base62 string."""
+    chars = []
+    for _ in range(length):
+        value, remainder = divmod(value, 62)
+        chars.append(BASE62_CHARS[remainder])
+    if value:
+        raise ValueError(f"Value does not fit in {length} base62 characters")
+    return "".join(reversed(chars))
+
+
+def decode_base62(code: str) -> int:
+    """Decode a base62 string back to its integer value."""
+    value = 0
+    for char in code:
+        value = value * 62 + BASE62_CHARS.index(char)
+    return value
+
+
+def _feistel_round(value: int, round_index: int, key: bytes, mask: int) -> int:
+    digest = hashlib.blake2b(
+        value.to_bytes(8, "little") + bytes([round_index]), key=key, digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little") & mask
+
+
+def _feistel(value: int, half_bits: int, key: bytes, inverse: bool) -> int:
+    mask = (1 << half_bits) - 1
+    left, right = value >> half_bits, value & mask
+    rounds = range(FEISTEL_ROUNDS - 1, -1, -1) if inverse else range(FEISTEL_ROUNDS)
+    for round_index in rounds:
+        if inverse:
+            left, right = right ^ _feistel_round(left, round_index, key, mask), left
+        else:
+            left, right = right, left ^ _feistel_round(right, round_index, key, mask)
+    return (left << half_bits) | right
+
+
+def permute_id(value: int, space: int, key: bytes, inverse: bool = False) -> int:
+    """
+    Map an ID to another ID in [0, space) with a keyed, reversible permutation.
+
+    A balanced Feistel network permutes the smallest even-width bit domain
+    covering space; results outside it are fed back in (cycle walking), so
+    the output is a bijection on [0, space). inverse=True undoes it.
+    """
+    if not 0 <= value < space:
+        raise ValueError("ID outside the permutation space")
+    half_bits = ((space - 1).bit_length() + 1) // 2
+    while True:
+        value = _feistel(value, half_bits, key, inverse)
+        if value < space:
+            return value
+
+
+class CounterCodeGenerator:
+    """
+    Collision-free short codes from a monotonically allocated counter.
+
+    IDs are leased from a MongoDB counter document in blocks of block_size,
+    so a worker touches the database once per block and workers never hand
+    out the same ID. Each ID goes through a keyed permutation, so
+    consecutive codes do not look sequential, and is then base62-encoded to
+    exactly `length` characters.
+    """
+
+    def __init__(self, length: int, block_size: int, key: str):
+        self.length = length
+        self.block_size = block_size
+        self.space = 62**length
+        self._key = hashlib.blake2b(key.encode(), digest_size=32).digest()
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+        self.leases = 0
+        self.issued = 0
+
+    @property
+    def counter_id(self) -> str:
+        return f"short_code:{self.length}"
+
+    async def _lease_block(self) -> None:
+        counters = ShortURL.get_motor_collection().database[COUNTERS_COLLECTION]
+        doc = await counters.find_one_and_update(
+            {"_id": self.counter_id},
+            {"$inc": {"next": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._end = doc["next"]
+        self._next = self._end - self.block_size
+        self.leases += 1
+
+    async def next_code(self) -> str:
+        """Return the next unused short code."""
+        async with self._lock:
+            if self._next >= self._end:
+                await self._lease_block()
+            value = self._next
+            self._next += 1
+
+        if value >= self.space:
+            raise ValueError("Short code space exhausted, increase SHORT_CODE_LENGTH")
+        self.issued += 1
+        return encode_base62(permute_id(value, self.space, self._key), self.length)
+
+    def decode(self, short_code: str) -> int:
+        """Recover the counter ID behind a generated code."""
+        return permute_id(decode_base62(short_code), self.space, self._key, inverse=True)
+
+    def stats(self) -> dict:
+        """Return lease and issue counters."""
+        return {
+            "length": self.length,
+            "block_size": self.block_size,
+            "leases": self.leases,
+            "issued": self.issued,
+            "remaining_in_block": max(self._end - self._next, 0),
+        }
+
+
+counter_codes = CounterCodeGenerator(
+    length=settings.SHORT_CODE_LENGTH,
+    block_size=settings.SHORT_CODE_COUNTER_BLOCK_SIZE,
+    key=settings.SHORT_CODE_PERMUTATION_KEY,
+)
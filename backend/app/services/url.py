@@ -1,41 +1,116 @@
 import re
-import secrets
-import string
 from datetime import UTC, datetime, timedelta
 
-import aiohttp
-from bs4 import BeautifulSoup
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from app.core.config import settings
-from app.models.click import ClickLog
-from app.models.url import ShortURL
+from app.core.normalize import url_hash
+from app.models.url import PreviewStatus, ShortURL
 from app.models.user import User
-from app.schemas.url import URLCreate, URLPreview, URLStats
+from app.schemas.url import URLCreate
+from app.services.code_pool import code_pool
+from app.services.expiry import find_archived_codes, is_archived_code
+from app.services.link_cache import (
+    LINK_RECORD_PROJECTION,
+    LinkRecord,
+    announce_new_code,
+    announce_new_codes,
+    cache_ttl,
+    get_shared_link,
+    invalidate_link,
+    link_cache,
+    remember_missing,
+    short_code_may_exist,
+    store_shared_link,
+)
+from app.services.preview_worker import queue_previews
+from app.services.short_code import counter_codes, generate_short_code
+
+
+async def next_short_code(max_attempts: int = 10) -> str:
+    """
+    Pick a short code for a new link without querying the links collection.
+
+    With SHORT_CODE_STRATEGY=counter the code comes from a leased ID block
+    and cannot collide. Otherwise a pre-checked code is taken from the shared
+    pool when one is available, falling back to a random code. Random codes
+    are only checked against the archive; create_short_url relies on the
+    unique index and retries on the rare duplicate.
+    """
+    if settings.SHORT_CODE_STRATEGY == "counter":
+        return await counter_codes.next_code()
+
+    if settings.CODE_POOL_ENABLED:
+        code = await code_pool.pop()
+        if code:
+            return code
 
-# Base62 character set for URL-safe short codes
-BASE62_CHARS = string.digits + string.ascii_lowercase + string.ascii_uppercase
+    for _ in range(max_attempts):
+        code = generate_short_code()
+        if not await is_archived_code(code):
+            return code
+    raise ValueError("Could not generate unique short code after max attempts")
 
 
-def generate_short_code(length: int = None) -> str:
-    """Generate a random base62 short code."""
-    if length is None:
-        length = settings.SHORT_CODE_LENGTH
-    return "".join(secrets.choice(BASE62_CHARS) for _ in range(length))
+async def next_short_codes(count: int) -> list[str]:
+    """
+    Pick count short codes for new links with as few round trips as possible.
 
+    Bulk counterpart of next_short_code: pooled codes come out with a single
+    SPOP and random fallback codes are checked against the archive with a
+    single $in query.
+    """
+    if count <= 0:
+        return []
+    if settings.SHORT_CODE_STRATEGY == "counter":
+        return [await counter_codes.next_code() for _ in range(count)]
 
-async def is_short_code_available(short_code: str) -> bool:
-    """Check if a short code is available (not already in use)."""
-    existing = await ShortURL.find_one({"short_code": short_code})
-    return existing is None
+    codes = await code_pool.pop_many(count) if settings.CODE_POOL_ENABLED else []
+    while len(codes) < count:
+        batch = list({generate_short_code() for _ in range(count - len(codes))} - set(codes))
+        codes.extend(set(batch) - await find_archived_codes(batch))
+    return codes
 
 
-async def generate_unique_short_code(max_attempts: int = 10) -> str:
-    """Generate a unique short code with collision detection."""
-    for _ in range(max_attempts):
-        code = generate_short_code()
-        if await is_short_code_available(code):
-            return code
-    raise ValueError("Could not generate unique short code after max attempts")
+def is_short_code_conflict(error: dict | DuplicateKeyError) -> bool:
+    """Check whether a duplicate key error came from the short_code unique index."""
+    details = error if isinstance(error, dict) else error.details or {}
+    if details.get("code", 11000) != 11000:
+        return False
+    key_pattern = details.get("keyPattern") or {}
+    return "short_code" in key_pattern or "short_code" in str(details.get("errmsg", error))
+
+
+class CreateMetrics:
+    """
+    Counters for the optimistic insert in create_short_url.
+
+    collisions counts generated codes rejected by the unique index and
+    retries the inserts attempted again with a fresh code.
+    """
+
+    def __init__(self):
+        self.inserts = 0
+        self.collisions = 0
+        self.retries = 0
+        self.alias_conflicts = 0
+        self.exhausted = 0
+
+    def stats(self) -> dict:
+        """Return insert, collision and retry counters."""
+        return {
+            "inserts": self.inserts,
+            "collisions": self.collisions,
+            "retries": self.retries,
+            "alias_conflicts": self.alias_conflicts,
+            "exhausted": self.exhausted,
+            "collision_rate": round(self.collisions / self.inserts, 4) if self.inserts else None,
+        }
+
+
+create_metrics = CreateMetrics()
 
 
 def is_valid_custom_alias(alias: str) -> bool:
@@ -46,91 +121,259 @@ def is_valid_custom_alias(alias: str) -> bool:
     return bool(re.match(pattern, alias)) and 4 <= len(alias) <= 20
 
 
-async def fetch_url_preview(url: str) -> URLPreview:
-    """Fetch Open Graph metadata from a URL for preview."""
-    preview = URLPreview(url=url)
-
-    try:
-        timeout = aiohttp.ClientTimeout(total=5)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url, allow_redirects=True) as response:
-                if response.status != 200:
-                    return preview
+def build_short_url(
+    url_data: URLCreate, user: User, short_code: str, fetch_preview: bool = False
+) -> ShortURL:
+    """Build an unsaved link document from a create request."""
+    # Calculate expiration date if provided
+    expiration = None
+    if url_data.expiration_days:
+        expiration = datetime.now(UTC) + timedelta(days=url_data.expiration_days)
 
-                html = await response.text()
-                soup = BeautifulSoup(html, "html.parser")
+    return ShortURL(
+        original_url=url_data.original_url,
+        url_hash=url_hash(url_data.original_url),
+        short_code=short_code,
+        user=user,
+        custom_alias=url_data.custom_alias,
+        expiration=expiration,
+        preview_status=PreviewStatus.PENDING if fetch_preview else None,
+        redirect_policy=url_data.redirect_policy,
+        redirect_max_age=url_data.redirect_max_age,
+        click_sample_rate=url_data.click_sample_rate,
+        created_at=datetime.now(UTC),
+    )
 
-                # Try Open Graph tags first
-                og_title = soup.find("meta", property="og:title")
-                og_desc = soup.find("meta", property="og:description")
-                og_image = soup.find("meta", property="og:image")
 
-                if og_title:
-                    preview.title = og_title.get("content", "")[:200]
-                elif soup.title:
-                    preview.title = soup.title.string[:200] if soup.title.string else None
+def reusable_link_query(user: User, url_hashes: list[str]) -> dict:
+    """Query for a user's live links to any of the given destinations."""
+    return {
+        "user.$id": user.id,
+        "url_hash": {"$in": url_hashes},
+        "is_active": True,
+        "$or": [{"expiration": None}, {"expiration": {"$gt": datetime.now(UTC)}}],
+    }
 
-                if og_desc:
-                    preview.description = og_desc.get("content", "")[:500]
-                else:
-                    meta_desc = soup.find("meta", attrs={"name": "description"})
-                    if meta_desc:
-                        preview.description = meta_desc.get("content", "")[:500]
 
-                if og_image:
-                    preview.image = og_image.get("content", "")
+async def find_reusable_link(url_data: URLCreate, user: User) -> ShortURL | None:
+    """Find the user's existing live link to the same normalized destination."""
+    return await ShortURL.find_one(reusable_link_query(user, [url_hash(url_data.original_url)]))
 
-    except Exception:
-        pass  # Return partial preview on error
 
-    return preview
+async def create_short_url(url_data: URLCreate, user: User, fetch_preview: bool = True) -> ShortURL:
+    """
+    Create a new shortened URL.
 
+    With reuse_existing (and no custom alias) the user's existing link to the
+    same normalized URL is returned instead, settings unchanged.
+    """
+    if url_data.reuse_existing and not url_data.custom_alias:
+        existing = await find_reusable_link(url_data, user)
+        if existing is not None:
+            return existing
 
-async def create_short_url(url_data: URLCreate, user: User, fetch_preview: bool = True) -> ShortURL:
-    """Create a new shortened URL."""
     # Use custom alias or generate a unique code
     if url_data.custom_alias:
         if not is_valid_custom_alias(url_data.custom_alias):
             raise ValueError("Invalid custom alias format")
-        if not await is_short_code_available(url_data.custom_alias):
+        # Live links are caught by the unique index on insert, archived ones are not
+        if await is_archived_code(url_data.custom_alias):
             raise ValueError("Custom alias is already taken")
         short_code = url_data.custom_alias
+        if settings.CODE_POOL_ENABLED:
+            await code_pool.claim(short_code)
     else:
-        short_code = await generate_unique_short_code()
+        short_code = await next_short_code()
 
-    # Calculate expiration date if provided
-    expiration = None
-    if url_data.expiration_days:
-        expiration = datetime.now(UTC) + timedelta(days=url_data.expiration_days)
+    short_url = build_short_url(url_data, user, short_code, fetch_preview)
+    await insert_short_url(short_url, is_custom_alias=bool(url_data.custom_alias))
+    await announce_new_code(short_url.short_code)
+    # Preview metadata is fetched in the background and patched in later
+    if fetch_preview:
+        await queue_previews([short_url])
+    return short_url
 
-    # Fetch URL preview metadata
-    preview_title = None
-    preview_description = None
-    preview_image = None
 
-    if fetch_preview:
-        try:
-            preview = await fetch_url_preview(url_data.original_url)
-            preview_title = preview.title
-            preview_description = preview.description
-            preview_image = preview.image
-        except Exception:
-            pass  # Continue without preview
-
-    short_url = ShortURL(
-        original_url=url_data.original_url,
-        short_code=short_code,
-        user=user,
-        custom_alias=url_data.custom_alias,
-        expiration=expiration,
-        preview_title=preview_title,
-        preview_description=preview_description,
-        preview_image=preview_image,
-        created_at=datetime.now(UTC),
+def validation_error_message(error: ValidationError) -> str:
+    """Flatten a ValidationError into one line, e.g. "original_url: Field required"."""
+    return "; ".join(
+        f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}" if detail["loc"] else detail["msg"]
+        for detail in error.errors()
     )
 
-    await short_url.insert()
-    return short_url
+
+async def create_short_urls(
+    items: list[URLCreate | dict], user: User, fetch_previews: bool = False, max_attempts: int = 5
+) -> list[ShortURL | str]:
+    """
+    Create many shortened URLs at once.
+
+    Returns one entry per item, in order: the inserted (or, with
+    reuse_existing, the existing) link, or an error message when that item
+    could not be created. reuse_existing items with the same destination
+    share one link even if it is created by this call. Raw dict items are
+    validated here, one at a time, so an invalid item gets its own error
+    instead of failing the batch.
+    Codes are allocated in bulk and the links written with unordered
+    insert_many, so one bad item does not stop the rest; generated codes
+    that hit the unique index are replaced and only those items are written
+    again. With fetch_previews every new link is queued for the background
+    preview worker.
+    """
+    results: list[ShortURL | str | None] = [None] * len(items)
+    valid: dict[int, URLCreate] = {}
+    for index, item in enumerate(items):
+        try:
+            valid[index] = item if isinstance(item, URLCreate) else URLCreate.model_validate(item)
+        except ValidationError as e:
+            results[index] = validation_error_message(e)
+
+    created = await _create_valid_short_urls(
+        list(valid.values()), user, fetch_previews, max_attempts
+    )
+    for index, result in zip(valid, created, strict=True):
+        results[index] = result
+    return results
+
+
+async def _create_valid_short_urls(
+    items: list[URLCreate], user: User, fetch_previews: bool, max_attempts: int
+) -> list[ShortURL | str]:
+    results: list[ShortURL | str | None] = [None] * len(items)
+
+    aliases = [item.custom_alias for item in items if item.custom_alias]
+    archived = await find_archived_codes(aliases)
+    seen_aliases = set()
+    for index, item in enumerate(items):
+        alias = item.custom_alias
+        if not alias:
+            continue
+        if not is_valid_custom_alias(alias):
+            results[index] = "Invalid custom alias format"
+        elif alias in archived or alias in seen_aliases:
+            create_metrics.alias_conflicts += 1
+            results[index] = "Custom alias is already taken"
+        seen_aliases.add(alias)
+    if settings.CODE_POOL_ENABLED and seen_aliases:
+        await code_pool.claim(*seen_aliases)
+
+    reuse = {
+        index: url_hash(item.original_url)
+        for index, item in enumerate(items)
+        if item.reuse_existing and not item.custom_alias
+    }
+    existing = {}
+    if reuse:
+        existing = {
+            short_url.url_hash: short_url
+            async for short_url in ShortURL.find(
+                reusable_link_query(user, list(set(reuse.values())))
+            )
+        }
+    # Later items reusing a destination new to this chunk share the first item's link
+    copies: dict[int, int] = {}
+    first_for_hash: dict[str, int] = {}
+    for index, hashed in reuse.items():
+        if hashed in existing:
+            results[index] = existing[hashed]
+        elif hashed in first_for_hash:
+            copies[index] = first_for_hash[hashed]
+        else:
+            first_for_hash[hashed] = index
+
+    generated = [
+        i
+        for i, item in enumerate(items)
+        if results[i] is None and i not in copies and not item.custom_alias
+    ]
+    codes = iter(await next_short_codes(len(generated)))
+    pending = {}
+    for index, item in enumerate(items):
+        if results[index] is None and index not in copies:
+            short_code = item.custom_alias or next(codes)
+            short_url = build_short_url(item, user, short_code, fetch_previews)
+            # Assign IDs up front so every document is known after a partial failure
+            short_url.id = ObjectId()
+            pending[index] = short_url
+
+    for attempt in range(max_attempts):
+        if not pending:
+            break
+        if attempt:
+            create_metrics.retries += len(pending)
+        create_metrics.inserts += len(pending)
+
+        batch = list(pending.items())
+        try:
+            await ShortURL.insert_many([short_url for _, short_url in batch], ordered=False)
+            errors = []
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+
+        failed = {}
+        for error in errors:
+            index, short_url = batch[error["index"]]
+            if not is_short_code_conflict(error):
+                results[index] = "Could not create short URL"
+            elif items[index].custom_alias:
+                create_metrics.alias_conflicts += 1
+                results[index] = "Custom alias is already taken"
+            else:
+                create_metrics.collisions += 1
+                failed[index] = short_url
+
+        inserted = []
+        for index, short_url in batch:
+            if index not in failed and results[index] is None:
+                results[index] = short_url
+                inserted.append(short_url)
+        await announce_new_codes([short_url.short_code for short_url in inserted])
+        if fetch_previews:
+            await queue_previews(inserted)
+
+        for short_url, short_code in zip(
+            failed.values(), await next_short_codes(len(failed)), strict=True
+        ):
+            short_url.short_code = short_code
+        pending = failed
+
+    for index in pending:
+        create_metrics.exhausted += 1
+        results[index] = "Could not generate unique short code after max attempts"
+    for index, first in copies.items():
+        results[index] = results[first]
+    return results
+
+
+async def insert_short_url(
+    short_url: ShortURL, is_custom_alias: bool = False, max_attempts: int = 5
+) -> None:
+    """
+    Insert a new link, letting the short_code unique index detect collisions.
+
+    A taken custom alias is reported to the caller; a taken generated code is
+    replaced with a fresh one and the insert retried. This is one round trip
+    in the common case and cannot race the way check-then-insert does.
+    """
+    for attempt in range(max_attempts):
+        if attempt:
+            create_metrics.retries += 1
+        create_metrics.inserts += 1
+        try:
+            await short_url.insert()
+            return
+        except DuplicateKeyError as e:
+            if not is_short_code_conflict(e):
+                raise
+            if is_custom_alias:
+                create_metrics.alias_conflicts += 1
+                raise ValueError("Custom alias is already taken") from e
+            create_metrics.collisions += 1
+            short_url.id = None
+            short_url.short_code = await next_short_code()
+
+    create_metrics.exhausted += 1
+    raise ValueError("Could not generate unique short code after max attempts")
 
 
 async def get_short_url_by_code(short_code: str) -> ShortURL | None:
@@ -138,10 +381,52 @@ async def get_short_url_by_code(short_code: str) -> ShortURL | None:
     return await ShortURL.find_one({"short_code": short_code})
 
 
+async def find_link_record(short_code: str) -> LinkRecord | None:
+    """
+    Fetch only the redirect fields for a short code.
+
+    Queries the collection through Motor with a projection, skipping Beanie
+    model validation, link resolution and state snapshots.
+    """
+    doc = await ShortURL.get_motor_collection().find_one(
+        {"short_code": short_code}, LINK_RECORD_PROJECTION
+    )
+    return LinkRecord.from_mongo(doc) if doc else None
+
+
+async def resolve_short_code(short_code: str) -> LinkRecord | None:
+    """
+    Resolve a short code for redirecting.
+
+    Reads through the local cache, then the shared Redis cache, then MongoDB.
+    Codes the existence filter rules out never leave the process.
+    """
+    record = link_cache.get(short_code)
+    if record is not None:
+        return record
+
+    if not short_code_may_exist(short_code):
+        return None
+
+    record, version = await get_shared_link(short_code)
+    if record is None:
+        record = await find_link_record(short_code)
+        if record is None:
+            remember_missing(short_code)
+            return None
+        if not await store_shared_link(record, version):
+            # Invalidated while we read it, so the record may already be stale
+            return record
+
+    link_cache.set(short_code, record, ttl=cache_ttl(record, settings.LINK_CACHE_TTL_SECONDS))
+    return record
+
+
 async def get_user_urls(user: User, skip: int = 0, limit: int = 100) -> list[ShortURL]:
-    """Get all URLs created by a user."""
+    """Get all URLs created by a user, newest first."""
     return (
         await ShortURL.find({"user.$id": user.id, "is_active": True})
+        .sort(-ShortURL.created_at)
         .skip(skip)
         .limit(limit)
         .to_list()
@@ -161,71 +446,5 @@ async def delete_short_url(short_code: str, user: User) -> bool:
     short_url.is_active = False
     short_url.updated_at = datetime.now(UTC)
     await short_url.save()
+    await invalidate_link(short_code)
     return True
-
-
-async def get_url_stats(short_url: ShortURL) -> URLStats:
-    """Get detailed statistics for a shortened URL."""
-    url_id = str(short_url.id)
-    # Use timezone-naive UTC to match ClickLog.timestamp format
-    now = datetime.utcnow()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = today_start - timedelta(days=7)
-
-    # Get all clicks for this URL
-    all_clicks = await ClickLog.find({"short_url_id": url_id}).to_list()
-
-    # Calculate basic stats
-    total_clicks = len(all_clicks)
-    clicks_today = sum(1 for c in all_clicks if c.timestamp >= today_start)
-    clicks_this_week = sum(1 for c in all_clicks if c.timestamp >= week_start)
-
-    # Aggregate referrers
-    referrer_counts: dict[str, int] = {}
-    for click in all_clicks:
-        ref = click.referrer or "Direct"
-        referrer_counts[ref] = referrer_counts.get(ref, 0) + 1
-    top_referrers = [
-        {"referrer": k, "count": v}
-        for k, v in sorted(referrer_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    ]
-
-    # Aggregate by country
-    country_counts: dict[str, int] = {}
-    for click in all_clicks:
-        country = click.country or "Unknown"
-        country_counts[country] = country_counts.get(country, 0) + 1
-    clicks_by_country = [
-        {"country": k, "count": v}
-        for k, v in sorted(country_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    ]
-
-    # Aggregate by device
-    device_counts: dict[str, int] = {}
-    for click in all_clicks:
-        device = click.device_type or "Unknown"
-        device_counts[device] = device_counts.get(device, 0) + 1
-    clicks_by_device = [
-        {"device": k, "count": v}
-        for k, v in sorted(device_counts.items(), key=lambda x: x[1], reverse=True)
-    ]
-
-    # Clicks over time (last 7 days)
-    clicks_over_time = []
-    for i in range(7):
-        day = today_start - timedelta(days=6 - i)
-        day_end = day + timedelta(days=1)
-        day_clicks = sum(1 for c in all_clicks if day <= c.timestamp < day_end)
-        clicks_over_time.append({"date": day.strftime("%b %d"), "count": day_clicks})
-
-    return URLStats(
-        short_code=short_url.short_code,
-        original_url=short_url.original_url,
-        total_clicks=total_clicks,
-        clicks_today=clicks_today,
-        clicks_this_week=clicks_this_week,
-        top_referrers=top_referrers,
-        clicks_by_country=clicks_by_country,
-        clicks_by_device=clicks_by_device,
-        clicks_over_time=clicks_over_time,
-    )
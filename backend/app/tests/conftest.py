@@ -0,0 +1,19 @@
+"""Shared test fixtures."""
+
+import pytest
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.database import document_models
+
+
+@pytest.fixture
+async def mongo(request):
+    """Initialize Beanie for every document model against an in-memory MongoDB."""
+    client = AsyncMongoMockClient()
+    await init_beanie(
+        database=client["test"],
+        document_models=document_models(),
+        skip_indexes=request.node.get_closest_marker("skip_indexes") is not None,
+    )
+    yield client
@@ -0,0 +1,199 @@
+"""Tests for click rollups and link statistics."""
+
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+from app.core.dates import as_utc
+from app.models.click import ClickLog, ClickRollup, RollupPeriod
+from app.models.url import ShortURL
+from app.services.analytics import count_clicks, get_url_stats
+from app.services.rollup import RollupBatch, rebuild_rollups, rollup_counts, rollup_key
+
+LINK_ID = "607f1f77bcf86cd799439022"
+
+
+def make_link() -> ShortURL:
+    return ShortURL.model_construct(
+        id=ObjectId(LINK_ID), short_code="abc123x", original_url="https://example.com"
+    )
+
+
+def click(**fields) -> ClickLog:
+    return ClickLog.model_construct(short_url_id=LINK_ID, **fields)
+
+
+async def apply_updates(batch: RollupBatch) -> None:
+    # mongomock's bulk_write does not accept current pymongo UpdateOne operations
+    collection = ClickRollup.get_motor_collection()
+    for query, update in batch.updates():
+        await collection.update_one(query, update, upsert=True)
+
+
+class TestRollupBatch:
+    """Tests for coalescing click logs into rollup increments."""
+
+    @pytest.mark.asyncio
+    async def test_clicks_in_one_hour_share_their_rollups(self, mongo):
+        """Test that a batch writes one upsert per hour, day and total rollup."""
+        now = datetime.now(UTC).replace(minute=30)
+        batch = RollupBatch(hour_retention=timedelta(days=14), max_keys=100)
+        batch.add(click(referrer="https://www.google.com/search?q=a", timestamp=now, weight=4))
+        batch.add(click(device_type="mobile", browser="Safari", timestamp=now))
+
+        assert {query["period"] for query, _ in batch.updates()} == {"hour", "day", "total"}
+        await apply_updates(batch)
+        await apply_updates(batch)
+
+        rollups = {rollup.period: rollup for rollup in await ClickRollup.find_all().to_list()}
+        total = rollups[RollupPeriod.TOTAL]
+        assert total.clicks == 10
+        assert total.referrers == {"www%2Egoogle%2Ecom": 8, "Direct": 2}
+        assert total.countries == {"Unknown": 10}
+        assert total.devices == {"Unknown": 8, "mobile": 2}
+        assert total.browsers == {"Safari": 2}
+        assert total.operating_systems == {}
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        assert as_utc(rollups[RollupPeriod.HOUR].expires_at) == hour + timedelta(days=14)
+        assert rollups[RollupPeriod.DAY].expires_at is None
+
+    @pytest.mark.asyncio
+    async def test_new_keys_past_the_cap_fold_into_other(self, mongo):
+        """Test that a full dimension keeps counting its keys and sends new ones to Other."""
+        now = datetime.now(UTC)
+        for hosts in (["a.com", "b.com"], ["a.com", "c.com", "d.com"], ["e.com", "Other"]):
+            batch = RollupBatch(hour_retention=timedelta(days=14), max_keys=4)
+            for host in hosts:
+                batch.add(click(referrer=f"https://{host}/", timestamp=now))
+            await apply_updates(batch)
+
+        total = await ClickRollup.find_one({"period": "total"})
+        assert total.referrers == {"a%2Ecom": 2, "b%2Ecom": 1, "Other": 4}
+        assert total.clicks == 7
+
+    def test_old_clicks_skip_hour_rollups(self):
+        """Test that clicks past the hour retention only reach day and total rollups."""
+        batch = RollupBatch(hour_retention=timedelta(days=14), max_keys=100)
+        batch.add(click(timestamp=datetime.now(UTC) - timedelta(days=30)))
+        assert {query["period"] for query, _ in batch.updates()} == {"day", "total"}
+
+    def test_keys_round_trip(self):
+        """Test that escaped counter keys decode back to the original values."""
+        counts = {rollup_key(value): 1 for value in ["a.b", "$x", "50%.off"]}
+        assert all("." not in key and "$" not in key for key in counts)
+        assert {value for value, _ in rollup_counts(counts)} == {"a.b", "$x", "50%.off"}
+
+    @pytest.mark.asyncio
+    async def test_rebuild_replays_click_logs(self, mongo):
+        """Test that the backfill clears a link's rollups and recounts them in batches."""
+        await ClickLog.insert_many([click(weight=2) for _ in range(3)])
+        collection = MagicMock()
+        collection.delete_many = AsyncMock()
+        totals = []
+
+        async def write_rollups(batch):
+            totals.extend(
+                increments["clicks"]
+                for query, increments in batch.increments()
+                if query["period"] == "total"
+            )
+
+        with (
+            patch.object(ClickRollup, "get_motor_collection", return_value=collection),
+            patch("app.services.rollup.write_rollups", side_effect=write_rollups),
+        ):
+            assert await rebuild_rollups(LINK_ID, batch_size=2) == 3
+
+        collection.delete_many.assert_awaited_once_with({"short_url_id": LINK_ID})
+        # One write per batch of two logs
+        assert totals == [4, 2]
+
+
+class TestURLStats:
+    """Tests for stats read from rollups."""
+
+    @pytest.mark.asyncio
+    async def test_stats_come_from_rollups(self, mongo):
+        """Test that stats are built from the total and day rollups, zero-filling days."""
+        today = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+        await ClickRollup.insert_many(
+            [
+                ClickRollup(
+                    short_url_id=LINK_ID,
+                    period=RollupPeriod.TOTAL,
+                    clicks=12,
+                    referrers={"Direct": 3, "google%2Ecom": 9},
+                    countries={"Unknown": 12},
+                    devices={"desktop": 12},
+                ),
+                ClickRollup(short_url_id=LINK_ID, period=RollupPeriod.DAY, bucket=today, clicks=5),
+                ClickRollup(
+                    short_url_id=LINK_ID,
+                    period=RollupPeriod.DAY,
+                    bucket=today - timedelta(days=2),
+                    clicks=4,
+                ),
+                ClickRollup(
+                    short_url_id=LINK_ID,
+                    period=RollupPeriod.DAY,
+                    bucket=today - timedelta(days=40),
+                    clicks=3,
+                ),
+            ]
+        )
+
+        with patch.object(ClickLog, "find") as mock_find:
+            stats = await get_url_stats(make_link(), days=7, date_format="%Y-%m-%d")
+
+        mock_find.assert_not_called()
+        assert (stats.total_clicks, stats.clicks_today, stats.clicks_this_week) == (12, 5, 9)
+        assert stats.top_referrers == [
+            {"referrer": "google.com", "count": 9},
+            {"referrer": "Direct", "count": 3},
+        ]
+        assert [day["count"] for day in stats.clicks_over_time] == [0, 0, 0, 0, 4, 0, 5]
+        assert stats.clicks_over_time[-1]["date"] == today.strftime("%Y-%m-%d")
+
+    @pytest.mark.asyncio
+    async def test_link_without_clicks(self, mongo):
+        """Test that a link nobody clicked gets zero totals and an empty series."""
+        stats = await get_url_stats(make_link())
+
+        assert stats.total_clicks == 0
+        assert stats.top_referrers == []
+        assert [day["count"] for day in stats.clicks_over_time] == [0] * 7
+
+
+class TestCountClicks:
+    """Tests for platform-wide click counts."""
+
+    @pytest.mark.asyncio
+    async def test_counts_come_from_rollups(self, mongo):
+        """Test that totals sum the all-time rollups and recent counts the day rollups."""
+        today = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+        await ClickRollup.insert_many(
+            [
+                ClickRollup(short_url_id=LINK_ID, period=RollupPeriod.TOTAL, clicks=40),
+                ClickRollup(short_url_id="other", period=RollupPeriod.TOTAL, clicks=2),
+                ClickRollup(short_url_id=LINK_ID, period=RollupPeriod.DAY, bucket=today, clicks=5),
+                ClickRollup(short_url_id="other", period=RollupPeriod.DAY, bucket=today, clicks=1),
+                ClickRollup(
+                    short_url_id=LINK_ID,
+                    period=RollupPeriod.DAY,
+                    bucket=today - timedelta(days=3),
+                    clicks=7,
+                ),
+                ClickRollup(
+                    short_url_id=LINK_ID,
+                    period=RollupPeriod.HOUR,
+                    bucket=today,
+                    clicks=5,
+                ),
+            ]
+        )
+
+        assert await count_clicks() == 42
+        assert await count_clicks(today) == 6
+        assert await count_clicks(today - timedelta(days=7)) == 13
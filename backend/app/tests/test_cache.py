@@ -0,0 +1,352 @@
+"""Tests for the in-process and shared link caches."""
+
+import time
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+from fakeredis import FakeAsyncRedis
+
+from app.core.bloom import BloomFilter
+from app.core.cache import TTLCache
+from app.models.url import ShortURL
+from app.services import link_cache as link_cache_module
+from app.services.link_cache import (
+    INVALIDATION_CHANNEL,
+    LINK_RECORD_PROJECTION,
+    LinkRecord,
+    code_filter_capacity,
+    filter_reload_delay,
+    invalidate_link,
+    link_cache,
+    load_code_filter,
+    missing_codes,
+    remember_code,
+    short_code_may_exist,
+)
+from app.services.url import delete_short_url, find_link_record, resolve_short_code
+
+
+@pytest.fixture
+def mock_short_url():
+    """Create a mock short URL for testing."""
+    url = MagicMock(spec=ShortURL)
+    url.id = "607f1f77bcf86cd799439022"
+    url.original_url = "https://example.com/destination"
+    url.short_code = "abc123x"
+    url.is_active = True
+    url.expiration = None
+    url.redirect_policy = "temporary"
+    url.redirect_max_age = None
+    url.click_sample_rate = 1
+    url.user = MagicMock()
+    url.user.ref = MagicMock()
+    url.user.ref.id = "507f1f77bcf86cd799439011"
+    return url
+
+
+@pytest.fixture(autouse=True)
+def clear_link_cache():
+    """Start every test with empty link caches and no existence filter."""
+    link_cache.clear()
+    missing_codes.clear()
+    link_cache_module.code_filter = None
+    yield
+    link_cache.clear()
+    missing_codes.clear()
+    link_cache_module._set_subscribed(False)
+
+
+class TestTTLCache:
+    """Tests for the bounded TTL/LRU cache."""
+
+    def test_get_and_set(self):
+        """Test storing and reading back a value."""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.evictions == 1
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after their TTL."""
+        cache = TTLCache(maxsize=10, ttl=60)
+        with patch("app.core.cache.time.monotonic", return_value=1000.0):
+            cache.set("a", 1)
+        with patch("app.core.cache.time.monotonic", return_value=1061.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_invalidate(self):
+        """Test dropping a single entry."""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", 1)
+        assert cache.invalidate("a") is True
+        assert cache.invalidate("a") is False
+        assert cache.get("a") is None
+
+
+class TestBloomFilter:
+    """Tests for the short code existence filter."""
+
+    def test_no_false_negatives(self):
+        """Test that every added key is reported as present."""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        codes = [f"code{i}" for i in range(1000)]
+        for code in codes:
+            bloom.add(code)
+
+        assert all(code in bloom for code in codes)
+        assert bloom.count == 1000
+
+    def test_false_positive_rate(self):
+        """Test that unknown keys are mostly rejected."""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"code{i}")
+
+        false_positives = sum(1 for i in range(10000) if f"other{i}" in bloom)
+        assert false_positives < 300
+
+    @pytest.mark.asyncio
+    async def test_load_spanning_a_reconnect_is_redone(self):
+        """Test that a scan overlapping a disconnect is discarded and run again."""
+        scans = []
+
+        async def scan():
+            scans.append(len(scans))
+            if len(scans) == 1:
+                # The listener drops and resubscribes while the first scan runs
+                link_cache_module._set_subscribed(False)
+                link_cache_module._set_subscribed(True)
+            bloom = BloomFilter(capacity=100)
+            bloom.add(f"scan{len(scans)}")
+            return bloom
+
+        link_cache_module._set_subscribed(True)
+        with (
+            patch("app.services.link_cache.scan_code_filter", side_effect=scan),
+            patch("app.services.link_cache.filter_reload_delay", return_value=0),
+        ):
+            await load_code_filter()
+
+        assert scans == [0, 1]
+        assert "scan2" in link_cache_module.code_filter
+        assert "scan1" not in link_cache_module.code_filter
+
+    @pytest.mark.asyncio
+    async def test_load_finishing_unsubscribed_is_dropped(self):
+        """Test that a filter built while not subscribed is never trusted."""
+        link_cache_module._set_subscribed(False)
+        with patch("app.services.link_cache.scan_code_filter", new_callable=AsyncMock) as scan:
+            await load_code_filter()
+
+        scan.assert_not_called()
+        assert link_cache_module.code_filter is None
+
+    def test_capacity_leaves_headroom(self):
+        """Test that the filter is sized for the current codes plus headroom, not double."""
+        with patch("app.services.link_cache.settings.CODE_FILTER_CAPACITY", 1000):
+            assert code_filter_capacity(100) == 1000
+            assert code_filter_capacity(4000) == 5000
+
+    def test_reload_delays_are_jittered_and_back_off(self):
+        """Test that reloads requested in quick succession wait longer each time."""
+        link_cache_module._last_filter_reload = None
+        with (
+            patch("app.services.link_cache.settings.CODE_FILTER_RELOAD_JITTER_SECONDS", 10),
+            patch("app.services.link_cache.random.uniform", side_effect=lambda low, high: high),
+        ):
+            delays = [filter_reload_delay(now) for now in (0, 5, 10, 15)]
+            # A reload long after the last one starts over
+            delays.append(filter_reload_delay(1000))
+
+        assert delays == [10, 20, 40, 80, 10]
+
+
+class TestResolveShortCode:
+    """Tests for cached short code resolution."""
+
+    @pytest.mark.asyncio
+    async def test_resolve_caches_record(self, mock_short_url):
+        """Test that a second lookup is served from the cache."""
+        with patch("app.services.url.find_link_record", new_callable=AsyncMock) as mock_get:
+            mock_get.return_value = LinkRecord.from_document(mock_short_url)
+
+            first = await resolve_short_code("abc123x")
+            second = await resolve_short_code("abc123x")
+
+            assert isinstance(first, LinkRecord)
+            assert first.original_url == "https://example.com/destination"
+            assert second is first
+            mock_get.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_find_link_record_uses_projection(self):
+        """Test that the lean lookup fetches only the redirect fields."""
+        doc = {
+            "_id": ObjectId("607f1f77bcf86cd799439022"),
+            "short_code": "abc123x",
+            "original_url": "https://example.com/destination",
+            "is_active": True,
+            "expiration": None,
+        }
+        collection = MagicMock()
+        collection.find_one = AsyncMock(return_value=doc)
+
+        with patch("app.services.url.ShortURL.get_motor_collection", return_value=collection):
+            record = await find_link_record("abc123x")
+
+        assert record == LinkRecord(
+            id="607f1f77bcf86cd799439022",
+            short_code="abc123x",
+            original_url="https://example.com/destination",
+            is_active=True,
+        )
+        assert collection.find_one.call_args.args[1] == LINK_RECORD_PROJECTION
+
+    @pytest.mark.asyncio
+    async def test_resolve_from_shared_cache(self, mock_short_url):
+        """Test that a Redis hit skips the database."""
+        record = LinkRecord.from_document(mock_short_url)
+        redis = FakeAsyncRedis(decode_responses=True)
+        await redis.hset("link:abc123x", mapping=record.to_redis_hash())
+
+        with patch("app.services.link_cache.get_redis", return_value=redis):
+            with patch("app.services.url.find_link_record", new_callable=AsyncMock) as mock_get:
+                resolved = await resolve_short_code("abc123x")
+
+                assert resolved == record
+                mock_get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_resolve_not_found(self):
+        """Test that a confirmed miss is negatively cached."""
+        with patch("app.services.url.find_link_record", new_callable=AsyncMock) as mock_get:
+            mock_get.return_value = None
+
+            assert await resolve_short_code("missing") is None
+            assert await resolve_short_code("missing") is None
+            mock_get.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_resolve_skips_db_for_filtered_code(self):
+        """Test that codes absent from the existence filter never reach MongoDB."""
+        link_cache_module.code_filter = BloomFilter(capacity=100)
+        link_cache_module._filter_loaded_at = time.monotonic()
+        remember_code("abc123x")
+
+        with patch("app.services.url.find_link_record", new_callable=AsyncMock) as mock_get:
+            assert await resolve_short_code("zzzzzzz") is None
+            mock_get.assert_not_called()
+
+        assert short_code_may_exist("abc123x") is True
+
+    @pytest.mark.asyncio
+    async def test_old_filter_misses_fall_through(self):
+        """Test that a filter past its max age no longer rejects codes and is reloaded."""
+        link_cache_module.code_filter = BloomFilter(capacity=100)
+        link_cache_module._filter_loaded_at = time.monotonic() - 3600
+
+        with (
+            patch("app.services.link_cache.settings.CODE_FILTER_MAX_AGE_SECONDS", 600),
+            patch("app.services.link_cache._schedule_filter_load") as mock_schedule,
+        ):
+            # A code whose creation announcement was lost still resolves
+            assert short_code_may_exist("lostcode") is True
+
+        mock_schedule.assert_called_once()
+
+    def test_remember_code_clears_negative_cache(self):
+        """Test that creating a code overrides an earlier miss."""
+        missing_codes.set("newcode", True)
+        assert short_code_may_exist("newcode") is False
+
+        remember_code("newcode")
+        assert short_code_may_exist("newcode") is True
+
+    @pytest.mark.asyncio
+    async def test_delete_invalidates_cache(self, mock_short_url):
+        """Test that soft deleting a URL drops its cache entry."""
+        link_cache.set("abc123x", LinkRecord.from_document(mock_short_url))
+        owner = MagicMock()
+        owner.id = "507f1f77bcf86cd799439011"
+        owner.is_admin = False
+
+        with patch("app.services.url.get_short_url_by_code", new_callable=AsyncMock) as mock_get:
+            mock_get.return_value = mock_short_url
+            mock_short_url.save = AsyncMock()
+
+            assert await delete_short_url("abc123x", owner) is True
+
+        assert link_cache.get("abc123x") is None
+
+
+class TestSharedLinkCache:
+    """Tests for the Redis-backed link cache tier."""
+
+    def test_redis_hash_round_trip(self, mock_short_url):
+        """Test that records survive serialization to a Redis hash."""
+        mock_short_url.expiration = datetime(2030, 1, 1, tzinfo=UTC)
+        record = LinkRecord.from_document(mock_short_url)
+
+        assert LinkRecord.from_redis_hash(record.to_redis_hash()) == record
+
+    @pytest.mark.asyncio
+    async def test_invalidate_publishes(self, mock_short_url):
+        """Test that invalidation clears Redis and notifies other workers."""
+        record = LinkRecord.from_document(mock_short_url)
+        link_cache.set("abc123x", record)
+        redis = FakeAsyncRedis(decode_responses=True)
+        await redis.hset("link:abc123x", mapping=record.to_redis_hash())
+
+        with patch("app.services.link_cache.get_redis", return_value=redis):
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                await invalidate_link("abc123x")
+                messages = [await pubsub.get_message(timeout=1) for _ in range(2)]
+
+        assert link_cache.get("abc123x") is None
+        assert await redis.exists("link:abc123x") == 0
+        assert messages[1]["data"] == "abc123x"
+
+    @pytest.mark.asyncio
+    async def test_lookup_racing_a_delete_does_not_cache(self, mock_short_url):
+        """Test that a record read before an invalidation is not written back to Redis."""
+        record = LinkRecord.from_document(mock_short_url)
+        redis = FakeAsyncRedis(decode_responses=True)
+
+        async def read_then_delete(short_code):
+            # The link is deleted after this lookup read it from MongoDB
+            await invalidate_link(short_code)
+            return record
+
+        with patch("app.services.link_cache.get_redis", return_value=redis):
+            with patch("app.services.url.find_link_record", side_effect=read_then_delete):
+                assert await resolve_short_code("abc123x") == record
+
+            assert await redis.exists("link:abc123x") == 0
+            assert link_cache.get("abc123x") is None
+
+            # Lookups that start after the invalidation cache normally again
+            with patch("app.services.url.find_link_record", new_callable=AsyncMock) as mock_get:
+                mock_get.return_value = record
+                await resolve_short_code("abc123x")
+
+            assert await redis.hgetall("link:abc123x") == record.to_redis_hash()
+            assert link_cache.get("abc123x") == record
@@ -0,0 +1,385 @@
+"""Tests for click ingestion and counter updates."""
+
+import asyncio
+from dataclasses import replace
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.click import ClickLog
+from app.services.click import (
+    ClickEvent,
+    build_click_log,
+    click_log_id,
+    get_click_counts,
+    increment_click_buckets,
+    record_clicks,
+    record_stream_clicks,
+)
+from app.services.click_counters import ClickCounterBuffer
+from app.services.click_ingest import (
+    ClickIngestor,
+    decode_click_event,
+    encode_click_event,
+    enqueue_click,
+)
+from app.services.link_cache import LinkRecord
+from app.workers.clicks import process_entries
+
+
+def make_event(short_code: str = "abc123x", user_agent: str | None = None) -> ClickEvent:
+    """Create a click event for testing."""
+    return ClickEvent(
+        short_url_id="607f1f77bcf86cd799439022",
+        short_code=short_code,
+        ip_address="192.168.1.1",
+        user_agent=user_agent,
+        referrer="https://google.com",
+        timestamp=datetime.now(UTC),
+    )
+
+
+class TestRecordClicks:
+    """Tests for batch click persistence."""
+
+    def test_build_click_log_parses_user_agent(self):
+        """Test that device info is filled in from the user agent."""
+        event = make_event(user_agent="Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Firefox/120.0")
+
+        with patch("app.services.click.ClickLog") as mock_click_log:
+            build_click_log(event)
+
+        fields = mock_click_log.call_args.kwargs
+        assert fields["short_url_id"] == event.short_url_id
+        assert fields["browser"] == "Firefox"
+        assert fields["os"] == "Linux"
+
+    @pytest.mark.asyncio
+    async def test_record_clicks_inserts_batch(self):
+        """Test that a batch is written with a single insert_many."""
+        events = [make_event() for _ in range(3)]
+        with patch("app.services.click.ClickLog") as mock_click_log:
+            mock_click_log.insert_many = AsyncMock()
+            with (
+                patch("app.services.click.click_counters") as mock_counters,
+                patch("app.services.click.record_rollups", new_callable=AsyncMock) as mock_rollups,
+            ):
+                await record_clicks(events)
+
+        mock_click_log.insert_many.assert_called_once()
+        assert len(mock_click_log.insert_many.call_args.args[0]) == 3
+        # The stored logs are added to their rollups in the same batch
+        mock_rollups.assert_awaited_once_with(mock_click_log.insert_many.call_args.args[0])
+        # One increment for the link, carrying all three clicks
+        mock_counters.add.assert_called_once_with("607f1f77bcf86cd799439022", 3)
+
+    @pytest.mark.asyncio
+    async def test_sampled_clicks_scale_counters(self):
+        """Test that a sampled click counts for its weight."""
+        event = replace(make_event(), weight=10)
+        with patch("app.services.click.ClickLog") as mock_click_log:
+            mock_click_log.insert_many = AsyncMock()
+            with (
+                patch("app.services.click.click_counters") as mock_counters,
+                patch("app.services.click.record_rollups", new_callable=AsyncMock),
+            ):
+                await record_clicks([event, make_event()])
+
+        mock_counters.add.assert_called_once_with("607f1f77bcf86cd799439022", 11)
+        assert mock_click_log.call_args_list[0].kwargs["weight"] == 10
+
+    def test_click_log_id_follows_stream_id(self):
+        """Test that stream entries map to stable, time-ordered ObjectIds."""
+        first = click_log_id("1700000000123-0")
+
+        assert click_log_id("1700000000123-0") == first
+        assert first < click_log_id("1700000000123-1") < click_log_id("1700000000124-0")
+        assert first.generation_time == datetime.fromtimestamp(1700000000, UTC)
+
+    @pytest.mark.asyncio
+    async def test_redelivered_clicks_are_stored_once(self, mongo):
+        """Test that a batch delivered twice only stores and counts new clicks."""
+        first = [replace(make_event(), stream_id=f"1700000000000-{n}") for n in range(2)]
+        redelivered = [*first, replace(make_event(), stream_id="1700000000001-0")]
+
+        with (
+            patch("app.services.click.write_click_counts", new_callable=AsyncMock) as mock_write,
+            patch("app.services.click.record_rollups", new_callable=AsyncMock) as mock_rollups,
+        ):
+            await record_stream_clicks(first)
+            await record_stream_clicks(redelivered)
+
+        assert await ClickLog.find({"counted": True}).count() == 3
+        assert [call.args[0] for call in mock_write.call_args_list] == [
+            {"607f1f77bcf86cd799439022": 2},
+            {"607f1f77bcf86cd799439022": 1},
+        ]
+        assert len(mock_rollups.call_args.args[0]) == 1
+
+    @pytest.mark.asyncio
+    async def test_redelivery_counts_clicks_left_uncounted(self, mongo):
+        """Test that clicks stored before a counter failure are counted on redelivery."""
+        events = [replace(make_event(), stream_id=f"1700000000000-{n}") for n in range(2)]
+
+        with (
+            patch(
+                "app.services.click.write_click_counts",
+                new_callable=AsyncMock,
+                side_effect=[RuntimeError("mongo down"), None],
+            ) as mock_write,
+            patch("app.services.click.record_rollups", new_callable=AsyncMock) as mock_rollups,
+        ):
+            with pytest.raises(RuntimeError):
+                await record_stream_clicks(events)
+            assert await ClickLog.find({"counted": False}).count() == 2
+            mock_rollups.assert_not_called()
+
+            await record_stream_clicks(events)
+
+        assert mock_write.call_args.args[0] == {"607f1f77bcf86cd799439022": 2}
+        assert len(mock_rollups.call_args.args[0]) == 2
+        assert await ClickLog.find({"counted": True}).count() == 2
+
+    @pytest.mark.asyncio
+    async def test_enqueue_samples_one_in_n(self):
+        """Test that sampled links keep 1 in N clicks, weighted N."""
+        link = LinkRecord(
+            id="607f1f77bcf86cd799439022",
+            short_code="abc123x",
+            original_url="https://example.com",
+            is_active=True,
+            click_sample_rate=10,
+        )
+        with patch("app.services.click_ingest.click_ingestor") as mock_ingestor:
+            with patch("app.services.click_ingest.random.randrange", side_effect=[3, 0]):
+                await enqueue_click(link)
+                await enqueue_click(link)
+
+        mock_ingestor.submit.assert_called_once()
+        assert mock_ingestor.submit.call_args.args[0].weight == 10
+
+
+class TestRedisClickBuckets:
+    """Tests for day/hour bucketed click counters in Redis."""
+
+    @pytest.mark.asyncio
+    async def test_one_script_call_per_link_hour(self):
+        """Test that a batch becomes one pipelined script call per link and hour."""
+        events = [make_event() for _ in range(3)] + [make_event(short_code="other12")]
+        script = AsyncMock()
+        pipe = MagicMock()
+        pipe.execute = AsyncMock()
+        redis = MagicMock()
+        redis.register_script.return_value = script
+        redis.pipeline.return_value.__aenter__ = AsyncMock(return_value=pipe)
+        redis.pipeline.return_value.__aexit__ = AsyncMock(return_value=False)
+
+        await increment_click_buckets(redis, events)
+
+        assert script.call_count == 2
+        keys = script.call_args_list[0].kwargs["keys"]
+        day = events[0].timestamp.strftime("%Y%m%d")
+        assert keys == ["clicks:abc123x", f"clicks:abc123x:{day}", keys[2]]
+        assert keys[2].startswith(f"clicks:abc123x:{day}")
+        assert script.call_args_list[0].kwargs["args"][0] == 3
+        pipe.execute.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_get_click_counts_sums_day_buckets(self):
+        """Test that today and this week are read from the day buckets."""
+        redis = MagicMock()
+        redis.mget = AsyncMock(return_value=["42", "5", None, "3", None, None, None, None, "1"])
+
+        with patch("app.services.click.get_redis", return_value=redis):
+            counts = await get_click_counts("abc123x")
+
+        assert counts == {"total": 42, "today": 5, "this_week": 9}
+        assert len(redis.mget.call_args.args[0]) == 9
+
+    @pytest.mark.asyncio
+    async def test_get_click_counts_without_redis(self):
+        """Test that missing Redis data signals a database fallback."""
+        with patch("app.services.click.get_redis", return_value=None):
+            assert await get_click_counts("abc123x") is None
+
+
+class TestClickIngestor:
+    """Tests for the in-process click queue."""
+
+    @pytest.mark.asyncio
+    async def test_submit_requires_running(self):
+        """Test that clicks are dropped when the consumer is not running."""
+        ingestor = ClickIngestor(max_queue_size=10, batch_size=5, flush_interval=0.01)
+        assert ingestor.submit(make_event()) is False
+        assert ingestor.dropped == 1
+
+    @pytest.mark.asyncio
+    async def test_batches_and_drains_on_stop(self):
+        """Test that queued clicks are flushed in batches and drained on shutdown."""
+        ingestor = ClickIngestor(max_queue_size=100, batch_size=4, flush_interval=5)
+
+        with patch(
+            "app.services.click_ingest.record_clicks", new_callable=AsyncMock
+        ) as mock_record:
+            await ingestor.start()
+            for _ in range(10):
+                assert ingestor.submit(make_event()) is True
+            await ingestor.stop(timeout=1)
+
+        batch_sizes = [len(call.args[0]) for call in mock_record.call_args_list]
+        assert sum(batch_sizes) == 10
+        assert max(batch_sizes) <= 4
+        assert ingestor.persisted == 10
+        assert ingestor.running is False
+
+    @pytest.mark.asyncio
+    async def test_flushes_partial_batch_after_interval(self):
+        """Test that a partial batch is flushed once the interval passes."""
+        ingestor = ClickIngestor(max_queue_size=100, batch_size=100, flush_interval=0.01)
+
+        with patch(
+            "app.services.click_ingest.record_clicks", new_callable=AsyncMock
+        ) as mock_record:
+            await ingestor.start()
+            ingestor.submit(make_event())
+            await asyncio.sleep(0.05)
+
+            mock_record.assert_called_once()
+            await ingestor.stop(timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_drops_when_full(self):
+        """Test backpressure: a full queue drops clicks instead of blocking."""
+        ingestor = ClickIngestor(max_queue_size=2, batch_size=10, flush_interval=5)
+
+        with patch("app.services.click_ingest.record_clicks", new_callable=AsyncMock):
+            await ingestor.start()
+            results = [ingestor.submit(make_event()) for _ in range(5)]
+            await ingestor.stop(timeout=1)
+
+        assert results.count(True) == 2
+        assert ingestor.dropped == 3
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_counted(self):
+        """Test that a failing write is counted and does not kill the consumer."""
+        ingestor = ClickIngestor(max_queue_size=10, batch_size=1, flush_interval=5)
+
+        with patch(
+            "app.services.click_ingest.record_clicks",
+            new_callable=AsyncMock,
+            side_effect=[RuntimeError("mongo down"), None],
+        ):
+            await ingestor.start()
+            ingestor.submit(make_event())
+            ingestor.submit(make_event())
+            await ingestor.stop(timeout=1)
+
+        assert ingestor.failed == 1
+        assert ingestor.persisted == 1
+
+
+class TestClickCounterBuffer:
+    """Tests for coalesced click counter writes."""
+
+    @pytest.mark.asyncio
+    async def test_flush_coalesces_increments(self):
+        """Test that many clicks become one $inc per link."""
+        buffer = ClickCounterBuffer(flush_interval=60)
+        buffer.add("607f1f77bcf86cd799439022")
+        buffer.add("607f1f77bcf86cd799439022", 4)
+        buffer.add("607f1f77bcf86cd799439033")
+        collection = MagicMock()
+        collection.bulk_write = AsyncMock()
+
+        with patch(
+            "app.services.click_counters.ShortURL.get_motor_collection", return_value=collection
+        ):
+            assert await buffer.flush() == 6
+
+        operations = collection.bulk_write.call_args.args[0]
+        assert len(operations) == 2
+        assert operations[0]._doc["$inc"] == {"clicks": 5}
+        assert collection.bulk_write.call_args.kwargs["ordered"] is False
+        assert buffer.stats()["pending_clicks"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_increments(self):
+        """Test that increments survive a failed write."""
+        buffer = ClickCounterBuffer(flush_interval=60)
+        buffer.add("607f1f77bcf86cd799439022", 2)
+        collection = MagicMock()
+        collection.bulk_write = AsyncMock(side_effect=RuntimeError("mongo down"))
+
+        with patch(
+            "app.services.click_counters.ShortURL.get_motor_collection", return_value=collection
+        ):
+            assert await buffer.flush() == 0
+
+        assert buffer.stats()["pending_clicks"] == 2
+        assert buffer.failed_flushes == 1
+
+
+class TestClickStream:
+    """Tests for Redis Stream click ingestion."""
+
+    def test_event_round_trip(self):
+        """Test that events survive encoding to stream fields."""
+        event = make_event(user_agent="Mozilla/5.0")
+        assert decode_click_event(encode_click_event(event)) == event
+
+    @pytest.mark.asyncio
+    async def test_enqueue_appends_to_stream(self):
+        """Test that stream mode writes clicks to Redis instead of memory."""
+        link = LinkRecord(
+            id="607f1f77bcf86cd799439022",
+            short_code="abc123x",
+            original_url="https://example.com",
+            is_active=True,
+        )
+        redis = MagicMock()
+        redis.xadd = AsyncMock()
+
+        with patch("app.services.click_ingest.settings.CLICK_INGEST_MODE", "stream"):
+            with patch("app.services.click_ingest.get_redis", return_value=redis):
+                assert await enqueue_click(link, referrer="https://google.com") is True
+
+        fields = redis.xadd.call_args.args[1]
+        assert fields["code"] == "abc123x"
+        assert fields["ref"] == "https://google.com"
+
+    @pytest.mark.asyncio
+    async def test_worker_persists_then_acks(self):
+        """Test that the worker acknowledges entries only after storing them."""
+        entries = [
+            ("1-0", encode_click_event(make_event())),
+            ("2-0", {"code": "malformed"}),
+        ]
+        redis = MagicMock()
+        redis.xack = AsyncMock()
+
+        with patch(
+            "app.workers.clicks.record_stream_clicks", new_callable=AsyncMock
+        ) as mock_record:
+            assert await process_entries(redis, entries) == 1
+
+        assert mock_record.call_args.args[0][0].stream_id == "1-0"
+        assert len(mock_record.call_args.args[0]) == 1
+        assert redis.xack.call_args.args[2:] == ("1-0", "2-0")
+
+    @pytest.mark.asyncio
+    async def test_worker_does_not_ack_failed_batch(self):
+        """Test that a failed write leaves entries pending for redelivery."""
+        redis = MagicMock()
+        redis.xack = AsyncMock()
+
+        with patch(
+            "app.workers.clicks.record_stream_clicks",
+            new_callable=AsyncMock,
+            side_effect=RuntimeError("mongo down"),
+        ):
+            with pytest.raises(RuntimeError):
+                await process_entries(redis, [("1-0", encode_click_event(make_event()))])
+
+        redis.xack.assert_not_called()
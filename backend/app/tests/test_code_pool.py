@@ -0,0 +1,115 @@
+"""Tests for the pre-generated short code pool."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.services.code_pool import CodePool
+from app.services.url import next_short_code
+
+
+@pytest.fixture
+def redis():
+    """Create an in-memory Redis and route the pool to it."""
+    client = FakeAsyncRedis(decode_responses=True)
+    with patch("app.services.code_pool.get_redis", return_value=client):
+        yield client
+
+
+def make_pool(target_size: int = 50, low_watermark: int = 10) -> CodePool:
+    return CodePool(
+        target_size=target_size,
+        low_watermark=low_watermark,
+        batch_size=20,
+        check_interval=60,
+        code_length=7,
+    )
+
+
+class TestCodePool:
+    """Tests for pool refill, pop and fallback."""
+
+    @pytest.mark.asyncio
+    async def test_refill_skips_taken_codes(self, redis):
+        """Test that refill fills to the target with codes not in MongoDB."""
+        pool = make_pool()
+        taken = set()
+
+        async def find_taken(codes):
+            # The first code of every multi-code batch is already in use
+            if len(codes) == 1:
+                return set()
+            taken.add(codes[0])
+            return {codes[0]}
+
+        with patch("app.services.code_pool.find_taken_codes", side_effect=find_taken):
+            await pool.refill()
+
+        members = await redis.smembers(pool.key)
+        assert len(members) == 50
+        assert not members & taken
+        assert all(len(code) == 7 for code in members)
+
+    @pytest.mark.asyncio
+    async def test_refill_stops_when_every_code_collides(self, redis):
+        """Test that a fully colliding batch ends the pass instead of spinning."""
+        pool = make_pool()
+
+        async def all_taken(codes):
+            return set(codes)
+
+        with patch("app.services.code_pool.find_taken_codes", side_effect=all_taken):
+            assert await pool.refill() == 0
+
+    @pytest.mark.asyncio
+    async def test_refill_waits_for_low_watermark(self, redis):
+        """Test that a pool above the low watermark is left alone."""
+        pool = make_pool()
+        await redis.sadd(pool.key, *[f"code{i:03d}" for i in range(20)])
+
+        with patch("app.services.code_pool.find_taken_codes", new_callable=AsyncMock) as mock_find:
+            assert await pool.refill() == 0
+        mock_find.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_pop_hands_out_each_code_once(self, redis):
+        """Test that popped codes are unique and removed from the pool."""
+        pool = make_pool(low_watermark=1)
+        await redis.sadd(pool.key, "aaaaaaa", "bbbbbbb")
+
+        codes = {await pool.pop(), await pool.pop()}
+        assert codes == {"aaaaaaa", "bbbbbbb"}
+        assert await pool.pop() is None
+        assert pool.stats()["hits"] == 2
+        assert pool.stats()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_claim_removes_custom_alias(self, redis):
+        """Test that a code used as a custom alias leaves the pool."""
+        pool = make_pool()
+        await redis.sadd(pool.key, "myalias")
+
+        await pool.claim("myalias")
+        assert await redis.scard(pool.key) == 0
+
+    @pytest.mark.asyncio
+    async def test_generate_falls_back_when_pool_empty(self):
+        """Test that an empty pool falls back to random codes."""
+        with patch("app.services.url.code_pool.pop", new_callable=AsyncMock) as mock_pop:
+            mock_pop.return_value = None
+            code = await next_short_code()
+
+        assert len(code) == 7
+
+    @pytest.mark.asyncio
+    async def test_generate_uses_pool_without_check(self):
+        """Test that pooled codes are used as they are."""
+        with patch("app.services.url.code_pool.pop", new_callable=AsyncMock) as mock_pop:
+            with patch(
+                "app.services.url.is_archived_code", new_callable=AsyncMock
+            ) as mock_archived:
+                mock_pop.return_value = "pooled1"
+                assert await next_short_code() == "pooled1"
+
+        mock_archived.assert_not_called()
@@ -0,0 +1,132 @@
+"""Tests for link expiry: datetime handling, cache deadlines and the sweeper."""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.core.dates import as_utc, has_expired
+from app.models.url import ShortURL
+from app.services.expiry import ExpirySweeper, get_archive_collection
+from app.services.link_cache import LinkRecord, cache_ttl
+
+
+async def insert_link(short_code: str, expiration: datetime | None, is_active: bool = True):
+    collection = ShortURL.get_motor_collection()
+    await collection.insert_one(
+        {
+            "short_code": short_code,
+            "original_url": "https://example.com",
+            "is_active": is_active,
+            # Stored naive, the way MongoDB returns datetimes
+            "expiration": expiration.replace(tzinfo=None) if expiration else None,
+        }
+    )
+
+
+class TestExpiryDates:
+    """Tests for naive/aware datetime handling."""
+
+    def test_naive_datetimes_are_utc(self):
+        """Test that naive values from MongoDB compare with aware ones."""
+        naive = datetime(2024, 1, 1, 12, 0)
+        assert as_utc(naive) == datetime(2024, 1, 1, 12, 0, tzinfo=UTC)
+        assert has_expired(naive)
+        assert not has_expired(None)
+
+    def test_record_from_mongo_is_aware(self):
+        """Test that the lean lookup record can be checked for expiry."""
+        record = LinkRecord.from_mongo(
+            {
+                "_id": "607f1f77bcf86cd799439022",
+                "short_code": "abc123x",
+                "original_url": "https://example.com",
+                "expiration": datetime.utcnow() + timedelta(hours=1),
+            }
+        )
+        assert record.expiration.tzinfo is not None
+        assert not record.is_expired
+
+    def test_cache_ttl_capped_at_expiration(self):
+        """Test that cache entries do not outlive the link's expiration."""
+        record = LinkRecord(
+            id="1",
+            short_code="abc123x",
+            original_url="https://example.com",
+            is_active=True,
+            expiration=datetime.now(UTC) + timedelta(seconds=5),
+        )
+        assert cache_ttl(record, 3600) <= 5
+        assert cache_ttl(LinkRecord("1", "abc123x", "https://example.com", True), 3600) == 3600
+
+
+class TestExpirySweeper:
+    """Tests for the bulk expiry sweeper."""
+
+    @pytest.mark.asyncio
+    async def test_deactivates_expired_links(self, mongo):
+        """Test that only expired active links are deactivated and invalidated."""
+        now = datetime.now(UTC)
+        await insert_link("expired1", now - timedelta(days=1))
+        await insert_link("expired2", now - timedelta(minutes=1))
+        await insert_link("future", now + timedelta(days=1))
+        await insert_link("forever", None)
+
+        sweeper = ExpirySweeper(interval=60, batch_size=1)
+        with patch("app.services.expiry.invalidate_links", new_callable=AsyncMock) as mock_inv:
+            assert await sweeper.deactivate_expired(now) == 2
+
+        collection = ShortURL.get_motor_collection()
+        active = {doc["short_code"] async for doc in collection.find({"is_active": True})}
+        assert active == {"future", "forever"}
+        invalidated = [code for call in mock_inv.call_args_list for code in call.args[0]]
+        assert sorted(invalidated) == ["expired1", "expired2"]
+
+    @pytest.mark.asyncio
+    async def test_archives_long_dead_links(self, mongo):
+        """Test that links expired past the archive window move collections."""
+        now = datetime.now(UTC)
+        await insert_link("ancient", now - timedelta(days=90), is_active=False)
+        await insert_link("recent", now - timedelta(days=1), is_active=False)
+
+        sweeper = ExpirySweeper(interval=60, batch_size=100, archive_after_days=30)
+        assert await sweeper.archive_expired(now) == 1
+
+        remaining = await ShortURL.get_motor_collection().distinct("short_code")
+        archived = await get_archive_collection().distinct("short_code")
+        assert remaining == ["recent"]
+        assert archived == ["ancient"]
+
+    @pytest.mark.asyncio
+    async def test_archive_disabled_by_default(self, mongo):
+        """Test that nothing is archived unless configured."""
+        await insert_link("ancient", datetime.now(UTC) - timedelta(days=900), is_active=False)
+
+        sweeper = ExpirySweeper(interval=60, batch_size=100)
+        assert await sweeper.archive_expired() == 0
+
+    @pytest.mark.asyncio
+    async def test_only_the_lease_holder_sweeps(self, mongo):
+        """Test that one process sweeps and another takes over once it stops."""
+        redis = FakeAsyncRedis(decode_responses=True)
+        sweeper = ExpirySweeper(interval=60, batch_size=100)
+        other = ExpirySweeper(interval=60, batch_size=100)
+
+        with patch("app.core.lease.get_redis", return_value=redis):
+            with patch.object(
+                ExpirySweeper, "deactivate_expired", new_callable=AsyncMock
+            ) as deactivate:
+                await sweeper.sweep()
+                await other.sweep()
+                await sweeper.sweep()
+                assert deactivate.await_count == 2
+                assert other.stats()["skipped_sweeps"] == 1
+
+                sweeper._sweeper = asyncio.create_task(asyncio.sleep(60))
+                await sweeper.stop()
+                await other.sweep()
+
+        assert deactivate.await_count == 3
+        assert other.stats()["holds_lease"] is True
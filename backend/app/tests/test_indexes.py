@@ -0,0 +1,96 @@
+"""Tests for declared index management and query plan reports."""
+
+import pytest
+
+from app.core.indexes import IndexManager, declared_indexes, index_key, summarize_plan
+from app.models.click import ClickLog, ClickRollup
+from app.models.url import ShortURL
+from app.models.user import User
+
+MODELS = [User, ShortURL, ClickLog, ClickRollup]
+
+# The manager under test creates the indexes itself
+pytestmark = pytest.mark.skip_indexes
+
+
+class TestIndexManager:
+    """Tests for creating the declared indexes."""
+
+    @pytest.mark.asyncio
+    async def test_declared_indexes(self, mongo):
+        """Test that Indexed() fields and Settings.indexes are both picked up."""
+        keys = {index_key(index) for index in declared_indexes(ShortURL)}
+        assert (("short_code", 1),) in keys
+        assert (("user.$id", 1), ("is_active", 1), ("created_at", -1)) in keys
+
+        keys = {index_key(index) for index in declared_indexes(ClickLog)}
+        assert keys == {(("short_url_id", 1), ("timestamp", 1))}
+
+    @pytest.mark.asyncio
+    async def test_unique_indexes_first_then_idempotent(self, mongo):
+        """Test that unique indexes can go first and a second run creates nothing."""
+        manager = IndexManager(enabled=True)
+        unique = await manager.ensure(MODELS, unique=True)
+        assert set(unique) == {
+            "users.email_1",
+            "short_urls.short_code_1",
+            "click_rollups.short_url_id_1_period_1_bucket_1",
+        }
+
+        rest = await manager.ensure(MODELS)
+        assert "click_logs.short_url_id_1_timestamp_1" in rest
+        assert not set(unique) & set(rest)
+        assert await manager.ensure(MODELS) == []
+        assert manager.stats()["failed"] == []
+
+    @pytest.mark.asyncio
+    async def test_disabled_manager_creates_nothing(self, mongo):
+        """Test that startup leaves indexes alone when disabled."""
+        manager = IndexManager(enabled=False)
+        await manager.start(MODELS)
+        info = await ShortURL.get_motor_collection().index_information()
+        assert set(info) <= {"_id_"}
+        assert manager.stats()["building"] is False
+
+
+class TestQueryPlans:
+    """Tests for summarizing explain() output."""
+
+    def test_index_scan(self):
+        """Test that an index-backed plan reports its index and scan counts."""
+        explanation = {
+            "queryPlanner": {
+                "winningPlan": {
+                    "queryPlan": {
+                        "stage": "FETCH",
+                        "inputStage": {"stage": "IXSCAN", "indexName": "short_code_1"},
+                    }
+                }
+            },
+            "executionStats": {"nReturned": 1, "totalKeysExamined": 1, "totalDocsExamined": 1},
+        }
+        plan = summarize_plan(explanation)
+        assert plan["stages"] == ["FETCH", "IXSCAN"]
+        assert plan["indexes"] == ["short_code_1"]
+        assert plan["collection_scan"] is False
+        assert plan["docs_examined"] == 1
+
+    def test_collection_scan(self):
+        """Test that a collection scan under an $or branch is flagged."""
+        explanation = {
+            "queryPlanner": {
+                "winningPlan": {
+                    "stage": "SUBPLAN",
+                    "inputStage": {
+                        "stage": "OR",
+                        "inputStages": [
+                            {"stage": "IXSCAN", "indexName": "timestamp_1"},
+                            {"stage": "COLLSCAN"},
+                        ],
+                    },
+                }
+            }
+        }
+        plan = summarize_plan(explanation)
+        assert plan["collection_scan"] is True
+        assert plan["returned"] is None
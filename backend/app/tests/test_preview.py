@@ -0,0 +1,390 @@
+"""Tests for link preview fetching."""
+
+import asyncio
+from datetime import timedelta
+from itertools import pairwise
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fakeredis import FakeAsyncRedis
+
+from app.benchmarks.preview_parse import beautifulsoup_preview, build_page
+from app.core.dates import utc_now
+from app.core.http import close_http_session, http_pool_stats, open_http_session
+from app.core.normalize import url_hash
+from app.models.url import PreviewStatus, ShortURL
+from app.models.user import User
+from app.schemas.url import URLCreate, URLPreview
+from app.services.preview import (
+    PreviewCache,
+    PreviewFetchError,
+    extract_head_metadata,
+    fetch_url_preview,
+    scrape_url_preview,
+)
+from app.services.preview_refresh import HostLimiter, PreviewRefresher
+from app.services.preview_worker import PreviewWorker, queue_previews
+from app.services.url import create_short_url
+
+
+@pytest.fixture
+async def owner(mongo):
+    """Add a user to the in-memory MongoDB."""
+    user = User(email="owner@example.com", hashed_password="x")
+    await user.insert()
+    with patch("app.services.url.announce_new_code", new_callable=AsyncMock):
+        yield user
+
+
+async def scrape(url: str) -> URLPreview:
+    if "broken" in url:
+        raise PreviewFetchError(url)
+    return URLPreview(url=url, title="Example", description="An example", image="/og.png")
+
+
+class TestPreviewWorker:
+    """Tests for deferred preview fetching."""
+
+    @pytest.mark.asyncio
+    async def test_create_returns_before_preview_is_fetched(self, owner):
+        """Test that create only queues the preview and the worker patches it in."""
+        worker = PreviewWorker(max_queue_size=10, concurrency=2)
+        with patch("app.services.preview_worker.preview_worker", worker):
+            with patch("app.services.preview_worker.cached_url_preview", side_effect=scrape):
+                await worker.start()
+                ok = await create_short_url(URLCreate(original_url="https://example.com"), owner)
+                broken = await create_short_url(URLCreate(original_url="https://broken.io"), owner)
+                assert ok.preview_status == PreviewStatus.PENDING
+                assert ok.preview_title is None
+
+                while worker.stats()["queue_size"] or worker.stats()["in_flight"]:
+                    await asyncio.sleep(0.01)
+                await worker.stop()
+
+        ok = await ShortURL.get(ok.id)
+        assert ok.preview_status == PreviewStatus.DONE
+        assert (ok.preview_title, ok.preview_image) == ("Example", "/og.png")
+        broken = await ShortURL.get(broken.id)
+        assert broken.preview_status == PreviewStatus.FAILED
+        assert worker.stats()["done"] == worker.stats()["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_jobs_the_worker_cannot_take_are_failed(self, owner):
+        """Test that a stopped or full worker never leaves links pending forever."""
+        worker = PreviewWorker(max_queue_size=10, concurrency=1)
+        with patch("app.services.preview_worker.preview_worker", worker):
+            short_url = await create_short_url(URLCreate(original_url="https://example.com"), owner)
+            assert short_url.preview_status == PreviewStatus.FAILED
+
+            stored = await ShortURL.get(short_url.id)
+            assert stored.preview_status == PreviewStatus.FAILED
+        assert worker.stats()["dropped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_no_status_without_preview(self, owner):
+        """Test that links created without a preview have no preview status."""
+        with patch("app.services.url.queue_previews", wraps=queue_previews) as mock_queue:
+            short_url = await create_short_url(
+                URLCreate(original_url="https://example.com"), owner, fetch_preview=False
+            )
+        assert short_url.preview_status is None
+        mock_queue.assert_not_called()
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+class TestHeadMetadataExtraction:
+    """Tests for the streaming head-only HTML parser."""
+
+    @pytest.mark.asyncio
+    async def test_matches_beautifulsoup(self):
+        """Test that the streaming parser finds what the tree parser found."""
+        body = build_page(50_000)
+        chunks = [body[i : i + 1000] for i in range(0, len(body), 1000)]
+        preview = await extract_head_metadata("https://x.io", stream(*chunks), "utf-8", 10**6)
+        assert preview == beautifulsoup_preview("https://x.io", body)
+        assert preview.title == "Open Graph & friends"
+
+    @pytest.mark.asyncio
+    async def test_stops_reading_after_head(self):
+        """Test that the body is never pulled once </head> has been parsed."""
+
+        async def chunks():
+            yield b"<html><head><title>Split "
+            yield b"title</title><meta name='description' content='d'></head>"
+            raise AssertionError("read past </head>")
+
+        preview = await extract_head_metadata("https://x.io", chunks(), "utf-8", 10**6)
+        assert (preview.title, preview.description) == ("Split title", "d")
+
+    @pytest.mark.asyncio
+    async def test_stops_at_byte_cap(self):
+        """Test that a page without </head> is cut off at max_bytes."""
+        pulled = 0
+
+        async def chunks():
+            nonlocal pulled
+            yield b"<html><head><title>Endless</title>"
+            while True:
+                pulled += 1
+                yield b"<meta name='x' content='padding'>" * 100
+
+        preview = await extract_head_metadata("https://x.io", chunks(), "utf-8", 20_000)
+        assert preview.title == "Endless"
+        assert pulled <= 20_000 // 3300 + 1
+
+    @pytest.mark.asyncio
+    async def test_decodes_declared_charset(self):
+        """Test that the response charset is used, split multi-byte characters included."""
+        body = "<title>Café Zürich</title></head>".encode()
+        chunks = [body[:10], body[10:], b""]
+        preview = await extract_head_metadata("https://x.io", stream(*chunks), "utf-8", 10**6)
+        assert preview.title == "Café Zürich"
+
+        latin = "<title>Café</title></head>".encode("latin-1")
+        preview = await extract_head_metadata("https://x.io", stream(latin), "latin-1", 10**6)
+        assert preview.title == "Café"
+
+
+class TestSharedHTTPSession:
+    """Tests for the pooled outbound HTTP session."""
+
+    @pytest.fixture
+    async def site(self):
+        """Serve a small page and an image from a local server."""
+
+        async def page(request):
+            html = '<html><head><meta property="og:title" content="Pooled"></head></html>'
+            return web.Response(text=html, content_type="text/html")
+
+        async def image(request):
+            return web.Response(body=b"\x89PNG", content_type="image/png")
+
+        app = web.Application()
+        app.router.add_get("/page", page)
+        app.router.add_get("/image.png", image)
+        server = TestServer(app)
+        await server.start_server()
+        yield server
+        await server.close()
+
+    @pytest.mark.asyncio
+    async def test_connections_are_reused(self, site):
+        """Test that repeated previews share one keep-alive connection."""
+        await open_http_session()
+        try:
+            for _ in range(3):
+                preview = await scrape_url_preview(str(site.make_url("/page")))
+                assert preview.title == "Pooled"
+            with pytest.raises(PreviewFetchError):
+                await scrape_url_preview(str(site.make_url("/missing")))
+            assert (await fetch_url_preview(str(site.make_url("/missing")))).title is None
+            with pytest.raises(PreviewFetchError, match="not HTML"):
+                await scrape_url_preview(str(site.make_url("/image.png")))
+
+            stats = http_pool_stats()
+            assert stats["open"] is True
+            assert stats["connections_created"] == 1
+            assert stats["connections_reused"] >= 3
+            assert stats["limit_per_host"] == 4
+        finally:
+            await close_http_session()
+        assert http_pool_stats()["open"] is False
+
+
+class TestPreviewCache:
+    """Tests for the two-tier preview cache."""
+
+    @pytest.fixture
+    def redis(self):
+        """Route the preview cache to an in-memory Redis."""
+        client = FakeAsyncRedis(decode_responses=True)
+        with patch("app.services.preview.get_redis", return_value=client):
+            yield client
+
+    @pytest.fixture
+    def slow_scrape(self):
+        """Patch the scraper with a slow fake that counts calls."""
+
+        async def fake(url: str) -> URLPreview:
+            await asyncio.sleep(0.01)
+            return await scrape(url)
+
+        with patch("app.services.preview.scrape_url_preview", side_effect=fake) as mock_scrape:
+            yield mock_scrape
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_fetch(self, redis, slow_scrape):
+        """Test that simultaneous requests for one URL trigger a single fetch."""
+        cache = PreviewCache(max_size=100, ttl=60, negative_ttl=10)
+        urls = ["https://example.com/a", "https://EXAMPLE.com/a/"] * 5
+        previews = await asyncio.gather(*(cache.get(url) for url in urls))
+
+        assert slow_scrape.call_count == 1
+        assert {preview.title for preview in previews} == {"Example"}
+        assert previews[1].url == "https://EXAMPLE.com/a/"
+        assert cache.stats()["shared_fetches"] == 9
+
+        await cache.get("https://example.com/a")
+        assert slow_scrape.call_count == 1
+        assert cache.stats()["local"]["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failures_are_cached(self, redis, slow_scrape):
+        """Test that a failed fetch is not retried until the negative TTL passes."""
+        cache = PreviewCache(max_size=100, ttl=60, negative_ttl=10)
+        for _ in range(3):
+            with pytest.raises(PreviewFetchError):
+                await cache.get("https://broken.io")
+
+        assert slow_scrape.call_count == 1
+        assert 0 < await redis.ttl(f"preview:{url_hash('https://broken.io')}") <= 10
+
+    @pytest.mark.asyncio
+    async def test_redis_tier_is_shared_between_workers(self, redis, slow_scrape):
+        """Test that another worker's cache is filled from Redis, not the network."""
+        await PreviewCache(max_size=100, ttl=60, negative_ttl=10).get("https://example.com")
+        other_worker = PreviewCache(max_size=100, ttl=60, negative_ttl=10)
+        preview = await other_worker.get("https://example.com")
+
+        assert preview.title == "Example"
+        assert slow_scrape.call_count == 1
+        assert other_worker.stats()["redis_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_refresh_replaces_cached_preview(self, redis, slow_scrape):
+        """Test that a refresh fetches again and overwrites both cache tiers."""
+        cache = PreviewCache(max_size=100, ttl=60, negative_ttl=10)
+        await cache.get("https://example.com")
+        slow_scrape.side_effect = lambda url: URLPreview(url=url, title="Updated")
+
+        assert (await cache.refresh("https://example.com")).title == "Updated"
+        assert (await cache.get("https://example.com")).title == "Updated"
+        other_worker = PreviewCache(max_size=100, ttl=60, negative_ttl=10)
+        assert (await other_worker.get("https://example.com")).title == "Updated"
+        assert slow_scrape.call_count == 2
+
+
+class TestPreviewRefresher:
+    """Tests for the scheduled preview refresh."""
+
+    @pytest.fixture
+    def refresher(self):
+        return PreviewRefresher(
+            interval=60,
+            batch_size=2,
+            stale_after_days=30,
+            concurrency=4,
+            per_host_concurrency=2,
+            per_host_interval=0,
+        )
+
+    async def add_link(self, owner, url: str, clicks: int, **fields) -> ShortURL:
+        short_url = ShortURL(
+            original_url=url,
+            short_code=f"code{clicks}",
+            user=owner,
+            clicks=clicks,
+            created_at=utc_now() - timedelta(days=90),
+            **fields,
+        )
+        return await short_url.insert()
+
+    @pytest.mark.asyncio
+    async def test_refreshes_most_clicked_stale_links_first(self, owner, refresher):
+        """Test that a pass takes the hottest stale links and fetches shared URLs once."""
+        old = utc_now() - timedelta(days=60)
+        stale = {"preview_status": PreviewStatus.DONE, "preview_fetched_at": old}
+        hot = await self.add_link(owner, "https://example.com/a", 50, **stale)
+        twin = await self.add_link(owner, "https://EXAMPLE.com/a/", 40, **stale)
+        cold = await self.add_link(owner, "https://example.com/b", 1, **stale)
+        await self.add_link(owner, "https://example.com/c", 99, preview_fetched_at=utc_now())
+        await self.add_link(owner, "https://example.com/d", 98)  # previews never requested
+
+        with patch("app.services.preview_refresh.refresh_url_preview", side_effect=scrape) as fetch:
+            assert await refresher.refresh() == 2
+
+        fetch.assert_awaited_once()
+        for short_url in (hot, twin):
+            stored = await ShortURL.get(short_url.id)
+            assert stored.preview_title == "Example"
+            assert stored.preview_fetched_at > old
+        assert (await ShortURL.get(cold.id)).preview_title is None
+        assert refresher.stats()["refreshed"] == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_refresh_keeps_previous_preview(self, owner, refresher):
+        """Test that a failed re-crawl keeps the last good preview and backs off."""
+        old = utc_now() - timedelta(days=60)
+        done = await self.add_link(
+            owner,
+            "https://broken.io/a",
+            2,
+            preview_title="Kept",
+            preview_status=PreviewStatus.DONE,
+            preview_fetched_at=old,
+        )
+        pending = await self.add_link(
+            owner, "https://broken.io/b", 1, preview_status=PreviewStatus.PENDING
+        )
+
+        with patch("app.services.preview_refresh.refresh_url_preview", side_effect=scrape):
+            await refresher.run_pass()
+            assert await refresher.refresh() == 0
+
+        done = await ShortURL.get(done.id)
+        assert (done.preview_title, done.preview_status) == ("Kept", PreviewStatus.DONE)
+        assert done.preview_fetched_at > old
+        assert (await ShortURL.get(pending.id)).preview_status == PreviewStatus.FAILED
+        assert refresher.stats()["failed"] == 2
+
+    @pytest.mark.asyncio
+    async def test_only_the_lease_holder_refreshes(self, refresher):
+        """Test that one process runs the passes and another takes over once it stops."""
+        redis = FakeAsyncRedis(decode_responses=True)
+        other = PreviewRefresher(
+            interval=60,
+            batch_size=2,
+            stale_after_days=30,
+            concurrency=4,
+            per_host_concurrency=2,
+            per_host_interval=0,
+        )
+
+        with patch("app.core.lease.get_redis", return_value=redis):
+            with patch.object(PreviewRefresher, "refresh", new_callable=AsyncMock) as refresh:
+                refresh.return_value = 0
+                await refresher.run_pass()
+                await other.run_pass()
+                await refresher.run_pass()
+                assert refresh.await_count == 2
+                assert other.stats()["skipped_passes"] == 1
+
+                refresher._refresher = asyncio.create_task(asyncio.sleep(60))
+                await refresher.stop()
+                await other.run_pass()
+
+        assert refresh.await_count == 3
+        assert other.stats()["holds_lease"] is True
+
+    @pytest.mark.asyncio
+    async def test_host_limiter_spaces_requests(self):
+        """Test that requests to one host are spaced while other hosts go straight through."""
+        limiter = HostLimiter(concurrency=2, interval=0.05)
+        loop = asyncio.get_running_loop()
+        starts: dict[str, list[float]] = {}
+
+        async def request(host: str) -> None:
+            async with limiter.slot(host):
+                starts.setdefault(host, []).append(loop.time())
+
+        await asyncio.gather(*(request(host) for host in ["a.io"] * 3 + ["b.io"]))
+
+        gaps = [later - earlier for earlier, later in pairwise(starts["a.io"])]
+        assert all(gap >= 0.04 for gap in gaps)
+        assert limiter.delays == 2
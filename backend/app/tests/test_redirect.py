@@ -1,5 +1,6 @@
 """Tests for redirect service and click tracking."""
 
+from dataclasses import replace
 from datetime import UTC, datetime, timedelta
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -9,6 +10,7 @@ from httpx import ASGITransport, AsyncClient
 from app.main import app
 from app.models.url import ShortURL
 from app.services.click import parse_user_agent
+from app.services.link_cache import LinkRecord
 
 
 @pytest.fixture
@@ -25,9 +27,23 @@ def mock_short_url():
     url.preview_title = "Example Site"
     url.preview_description = "Example description"
     url.preview_image = "https://example.com/image.png"
+    url.redirect_policy = "temporary"
+    url.redirect_max_age = None
+    url.click_sample_rate = 1
     return url
 
 
+@pytest.fixture
+def link_record(mock_short_url):
+    """Create the cached redirect record for the mock short URL."""
+    return LinkRecord(
+        id=mock_short_url.id,
+        short_code=mock_short_url.short_code,
+        original_url=mock_short_url.original_url,
+        is_active=True,
+    )
+
+
 class TestUserAgentParsing:
     """Tests for user agent parsing."""
 
@@ -101,12 +117,12 @@ class TestRedirectEndpoint:
     """Tests for redirect endpoint."""
 
     @pytest.mark.asyncio
-    async def test_redirect_success(self, mock_short_url):
+    async def test_redirect_success(self, link_record):
         """Test successful redirect."""
-        with patch("app.api.redirect.get_short_url_by_code", new_callable=AsyncMock) as mock_get:
-            with patch("app.api.redirect.log_click", new_callable=AsyncMock) as mock_log:
-                mock_get.return_value = mock_short_url
-                mock_log.return_value = MagicMock()
+        with patch("app.api.redirect.resolve_short_code", new_callable=AsyncMock) as mock_get:
+            with patch("app.api.redirect.enqueue_click", new_callable=AsyncMock) as mock_log:
+                mock_get.return_value = link_record
+                mock_log.return_value = True
 
                 transport = ASGITransport(app=app)
                 async with AsyncClient(
@@ -116,11 +132,30 @@ class TestRedirectEndpoint:
 
                 assert response.status_code == 302
                 assert response.headers["location"] == "https://example.com/destination"
+                assert response.headers["cache-control"] == "no-store"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("policy,expected_status", [("cached", 302), ("permanent", 301)])
+    async def test_redirect_cacheable_policies(self, link_record, policy, expected_status):
+        """Test that cacheable policies set the status and max-age."""
+        record = replace(link_record, redirect_policy=policy, redirect_max_age=600)
+        with patch("app.api.redirect.resolve_short_code", new_callable=AsyncMock) as mock_get:
+            with patch("app.api.redirect.enqueue_click", new_callable=AsyncMock):
+                mock_get.return_value = record
+
+                transport = ASGITransport(app=app)
+                async with AsyncClient(
+                    transport=transport, base_url="http://test", follow_redirects=False
+                ) as client:
+                    response = await client.get("/abc123x")
+
+                assert response.status_code == expected_status
+                assert response.headers["cache-control"] == "public, max-age=600"
 
     @pytest.mark.asyncio
     async def test_redirect_not_found(self):
         """Test redirect with non-existent short code."""
-        with patch("app.api.redirect.get_short_url_by_code", new_callable=AsyncMock) as mock_get:
+        with patch("app.api.redirect.resolve_short_code", new_callable=AsyncMock) as mock_get:
             mock_get.return_value = None
 
             transport = ASGITransport(app=app)
@@ -130,12 +165,12 @@ class TestRedirectEndpoint:
             assert response.status_code == 404
 
     @pytest.mark.asyncio
-    async def test_redirect_inactive_url(self, mock_short_url):
+    async def test_redirect_inactive_url(self, link_record):
         """Test redirect with inactive URL."""
-        mock_short_url.is_active = False
+        link_record = replace(link_record, is_active=False)
 
-        with patch("app.api.redirect.get_short_url_by_code", new_callable=AsyncMock) as mock_get:
-            mock_get.return_value = mock_short_url
+        with patch("app.api.redirect.resolve_short_code", new_callable=AsyncMock) as mock_get:
+            mock_get.return_value = link_record
 
             transport = ASGITransport(app=app)
             async with AsyncClient(transport=transport, base_url="http://test") as client:
@@ -144,12 +179,12 @@ class TestRedirectEndpoint:
             assert response.status_code == 410  # Gone
 
     @pytest.mark.asyncio
-    async def test_redirect_expired_url(self, mock_short_url):
+    async def test_redirect_expired_url(self, link_record):
         """Test redirect with expired URL."""
-        mock_short_url.expiration = datetime.now(UTC) - timedelta(days=1)
+        link_record = replace(link_record, expiration=datetime.now(UTC) - timedelta(days=1))
 
-        with patch("app.api.redirect.get_short_url_by_code", new_callable=AsyncMock) as mock_get:
-            mock_get.return_value = mock_short_url
+        with patch("app.api.redirect.resolve_short_code", new_callable=AsyncMock) as mock_get:
+            mock_get.return_value = link_record
 
             transport = ASGITransport(app=app)
             async with AsyncClient(transport=transport, base_url="http://test") as client:
@@ -158,12 +193,29 @@ class TestRedirectEndpoint:
             assert response.status_code == 410  # Gone
 
     @pytest.mark.asyncio
-    async def test_redirect_with_click_logging(self, mock_short_url):
+    async def test_redirect_swept_expired_url(self, link_record):
+        """Test that links deactivated by the expiry sweeper still report expiry."""
+        link_record = replace(
+            link_record, is_active=False, expiration=datetime.now(UTC) - timedelta(days=1)
+        )
+
+        with patch("app.api.redirect.resolve_short_code", new_callable=AsyncMock) as mock_get:
+            mock_get.return_value = link_record
+
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get("/abc123x")
+
+            assert response.status_code == 410
+            assert response.json()["detail"] == "URL has expired"
+
+    @pytest.mark.asyncio
+    async def test_redirect_with_click_logging(self, link_record):
         """Test that clicks are logged during redirect."""
-        with patch("app.api.redirect.get_short_url_by_code", new_callable=AsyncMock) as mock_get:
-            with patch("app.api.redirect.log_click", new_callable=AsyncMock) as mock_log:
-                mock_get.return_value = mock_short_url
-                mock_log.return_value = MagicMock()
+        with patch("app.api.redirect.resolve_short_code", new_callable=AsyncMock) as mock_get:
+            with patch("app.api.redirect.enqueue_click", new_callable=AsyncMock) as mock_log:
+                mock_get.return_value = link_record
+                mock_log.return_value = True
 
                 transport = ASGITransport(app=app)
                 async with AsyncClient(
@@ -179,6 +231,7 @@ class TestRedirectEndpoint:
 
                 assert response.status_code == 302
                 mock_log.assert_called_once()
+                assert mock_log.call_args.kwargs["referrer"] == "https://google.com"
 
 
 class TestPreviewEndpoint:
@@ -211,3 +264,80 @@ class TestPreviewEndpoint:
                 response = await client.get("/nonexistent/preview")
 
             assert response.status_code == 404
+
+
+class TestRedirectFastPath:
+    """Tests for the ASGI redirect fast path."""
+
+    @pytest.fixture
+    def fast_app(self):
+        from app.api.fastpath import RedirectFastPath, reserved_root_paths
+
+        return RedirectFastPath(app, reserved=reserved_root_paths(app.routes))
+
+    @pytest.mark.asyncio
+    async def test_fast_path_redirects_and_enqueues_click(self, fast_app, link_record):
+        """Active links are answered without reaching the router."""
+        with (
+            patch("app.api.fastpath.resolve_short_code", new_callable=AsyncMock) as mock_resolve,
+            patch("app.api.fastpath.enqueue_click", new_callable=AsyncMock) as mock_enqueue,
+            patch("app.api.redirect.resolve_short_code", new_callable=AsyncMock) as router_resolve,
+        ):
+            mock_resolve.return_value = link_record
+
+            transport = ASGITransport(app=fast_app)
+            async with AsyncClient(
+                transport=transport, base_url="http://test", follow_redirects=False
+            ) as client:
+                response = await client.get("/abc123x", headers={"Referer": "https://google.com"})
+
+            assert response.status_code == 302
+            assert response.headers["location"] == "https://example.com/destination"
+            assert mock_enqueue.call_args.kwargs["referrer"] == "https://google.com"
+            router_resolve.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_fast_path_falls_through_for_inactive(self, fast_app, link_record):
+        """Anything but a successful redirect is left to the regular route."""
+        inactive = replace(link_record, is_active=False)
+        with (
+            patch("app.api.fastpath.resolve_short_code", new_callable=AsyncMock) as mock_resolve,
+            patch("app.api.redirect.resolve_short_code", new_callable=AsyncMock) as router_resolve,
+        ):
+            mock_resolve.return_value = inactive
+            router_resolve.return_value = inactive
+
+            transport = ASGITransport(app=fast_app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get("/abc123x")
+
+            assert response.status_code == 410
+            router_resolve.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_fast_path_skips_reserved_paths(self, fast_app):
+        """Root-level app routes never hit the short-code lookup."""
+        with patch("app.api.fastpath.resolve_short_code", new_callable=AsyncMock) as mock_resolve:
+            transport = ASGITransport(app=fast_app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get("/health")
+
+            assert response.status_code == 200
+            mock_resolve.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_fast_path_ignores_head(self, fast_app, link_record):
+        """HEAD requests are answered like the router does and never count as clicks."""
+        with (
+            patch("app.api.fastpath.resolve_short_code", new_callable=AsyncMock) as mock_resolve,
+            patch("app.api.fastpath.enqueue_click", new_callable=AsyncMock) as mock_enqueue,
+        ):
+            mock_resolve.return_value = link_record
+
+            transport = ASGITransport(app=fast_app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.head("/abc123x")
+
+            assert response.status_code == 405
+            mock_resolve.assert_not_called()
+            mock_enqueue.assert_not_called()
@@ -1,16 +1,26 @@
 """Tests for URL shortening endpoints."""
 
+import json
 from datetime import UTC, datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 
+from app.core.normalize import normalize_url, url_hash
 from app.core.security import create_access_token
 from app.main import app
 from app.models.url import ShortURL
 from app.models.user import User
-from app.services.url import generate_short_code, is_valid_custom_alias
+from app.schemas.url import URLCreate
+from app.services.short_code import CounterCodeGenerator, decode_base62, encode_base62
+from app.services.url import (
+    CreateMetrics,
+    create_short_url,
+    create_short_urls,
+    generate_short_code,
+    is_valid_custom_alias,
+)
 
 
 @pytest.fixture
@@ -45,6 +55,10 @@ def mock_short_url(mock_user):
     url.preview_title = "Example Site"
     url.preview_description = "Example description"
     url.preview_image = "https://example.com/image.png"
+    url.preview_status = "done"
+    url.redirect_policy = "temporary"
+    url.redirect_max_age = None
+    url.click_sample_rate = 1
     url.user = MagicMock()
     url.user.id = mock_user.id
     url.user.ref = MagicMock()
@@ -52,6 +66,17 @@ def mock_short_url(mock_user):
     return url
 
 
+@pytest.fixture
+async def owner(mongo):
+    """Add a user to the in-memory MongoDB."""
+    user = User(email="owner@example.com", hashed_password="x")
+    await user.insert()
+    with patch("app.services.url.announce_new_code", new_callable=AsyncMock):
+        with patch("app.services.url.announce_new_codes", new_callable=AsyncMock):
+            with patch("app.services.url.create_metrics", CreateMetrics()) as metrics:
+                yield user, metrics
+
+
 class TestShortCodeGeneration:
     """Tests for short code generation utilities."""
 
@@ -74,6 +99,232 @@ class TestShortCodeGeneration:
         assert len(unique_codes) == 100
 
 
+class TestCounterCodeGeneration:
+    """Tests for counter-based short codes."""
+
+    @pytest.fixture
+    def counters(self):
+        """Mock the MongoDB counter document used for block leases."""
+        state = {"next": 0}
+
+        async def lease(query, update, **kwargs):
+            state["next"] += update["$inc"]["next"]
+            return {"_id": query["_id"], "next": state["next"]}
+
+        collection = MagicMock()
+        collection.database.__getitem__.return_value.find_one_and_update = AsyncMock(
+            side_effect=lease
+        )
+        with patch.object(ShortURL, "get_motor_collection", return_value=collection):
+            yield state
+
+    def test_base62_round_trip(self):
+        """Test fixed-length base62 encoding."""
+        assert encode_base62(0, 7) == "0000000"
+        assert decode_base62(encode_base62(123456789, 7)) == 123456789
+        with pytest.raises(ValueError):
+            encode_base62(62**7, 7)
+
+    @pytest.mark.asyncio
+    async def test_codes_are_unique_and_reversible(self, counters):
+        """Test that counter codes never repeat and map back to their IDs."""
+        generator = CounterCodeGenerator(length=7, block_size=100, key="test")
+        codes = [await generator.next_code() for _ in range(250)]
+
+        assert len(set(codes)) == 250
+        assert all(len(code) == 7 for code in codes)
+        assert [generator.decode(code) for code in codes] == list(range(250))
+        assert generator.stats()["leases"] == 3
+
+    @pytest.mark.asyncio
+    async def test_codes_are_not_sequential(self, counters):
+        """Test that the permutation hides the counter order."""
+        generator = CounterCodeGenerator(length=7, block_size=10, key="test")
+        codes = [await generator.next_code() for _ in range(10)]
+        assert codes != sorted(codes)
+
+    @pytest.mark.asyncio
+    async def test_exhausted_space_raises(self, counters):
+        """Test that running out of codes of the configured length is an error."""
+        generator = CounterCodeGenerator(length=1, block_size=100, key="test")
+        codes = [await generator.next_code() for _ in range(62)]
+        assert len(set(codes)) == 62
+        with pytest.raises(ValueError):
+            await generator.next_code()
+
+
+class TestOptimisticInsert:
+    """Tests for inserting links against the short_code unique index."""
+
+    @pytest.mark.asyncio
+    async def test_taken_alias_is_rejected(self, owner):
+        """Test that the unique index reports a taken custom alias."""
+        user, metrics = owner
+        url_data = URLCreate(original_url="https://example.com", custom_alias="taken")
+        await create_short_url(url_data, user, fetch_preview=False)
+
+        with pytest.raises(ValueError, match="already taken"):
+            await create_short_url(url_data, user, fetch_preview=False)
+        assert metrics.stats()["alias_conflicts"] == 1
+        assert metrics.stats()["retries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_generated_collision_retries(self, owner):
+        """Test that a colliding generated code is replaced and the insert retried."""
+        user, metrics = owner
+        url_data = URLCreate(original_url="https://example.com")
+        with patch(
+            "app.services.url.next_short_code",
+            new_callable=AsyncMock,
+            side_effect=["collide", "collide", "fresh01"],
+        ):
+            first = await create_short_url(url_data, user, fetch_preview=False)
+            second = await create_short_url(url_data, user, fetch_preview=False)
+
+        assert (first.short_code, second.short_code) == ("collide", "fresh01")
+        assert await ShortURL.find_one({"short_code": "fresh01"}) is not None
+        assert metrics.stats()["collisions"] == 1
+        assert metrics.stats()["retries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_retries_are_bounded(self, owner):
+        """Test that a code source that keeps colliding gives up."""
+        user, metrics = owner
+        url_data = URLCreate(original_url="https://example.com")
+        with patch("app.services.url.next_short_code", new_callable=AsyncMock) as mock_next:
+            mock_next.return_value = "stuck01"
+            await create_short_url(url_data, user, fetch_preview=False)
+            with pytest.raises(ValueError, match="max attempts"):
+                await create_short_url(url_data, user, fetch_preview=False)
+        assert metrics.stats()["exhausted"] == 1
+
+
+class TestURLNormalization:
+    """Tests for duplicate detection of equivalent URLs."""
+
+    def test_equivalent_spellings_normalize_equal(self):
+        """Test case, default port, trailing slash and query order normalization."""
+        assert normalize_url("HTTPS://Example.COM:443/path/?b=2&a=1") == (
+            "https://example.com/path?a=1&b=2"
+        )
+        assert normalize_url("http://example.com:80/") == "http://example.com"
+        assert url_hash("https://example.com/x?a=1&b=2") == url_hash(
+            "https://EXAMPLE.com/x/?b=2&a=1"
+        )
+
+    def test_meaningful_differences_are_kept(self):
+        """Test that path case, custom ports and fragments still distinguish URLs."""
+        assert url_hash("https://example.com/Path") != url_hash("https://example.com/path")
+        assert normalize_url("https://example.com:8443/") == "https://example.com:8443"
+        assert normalize_url("https://example.com/#top") == "https://example.com#top"
+        assert normalize_url("https://example.com:bad/") == "https://example.com:bad/"
+
+    @pytest.mark.asyncio
+    async def test_reuse_existing_returns_existing_link(self, owner, mock_short_url):
+        """Test that re-shortening finds the existing link with one indexed lookup."""
+        user, _ = owner
+        url_data = URLCreate(original_url="https://Example.com/a/?y=1&x=2", reuse_existing=True)
+        with patch("app.services.url.ShortURL.find_one", new_callable=AsyncMock) as mock_find:
+            mock_find.return_value = mock_short_url
+            assert await create_short_url(url_data, user) is mock_short_url
+
+        query = mock_find.call_args.args[0]
+        assert query["url_hash"] == {"$in": [url_hash("https://example.com/a?x=2&y=1")]}
+        assert query["user.$id"] == user.id
+
+    @pytest.mark.asyncio
+    async def test_new_links_store_the_hash(self, owner):
+        """Test that created links carry the normalized URL hash."""
+        user, _ = owner
+        url_data = URLCreate(original_url="https://example.com/a/", reuse_existing=True)
+        short_url = await create_short_url(url_data, user, fetch_preview=False)
+        assert short_url.url_hash == url_hash("https://example.com/a")
+
+
+class TestBulkShorten:
+    """Tests for creating many links with one unordered insert."""
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_reports_per_item_results(self, owner):
+        """Test that bad items fail on their own while the rest are inserted."""
+        user, metrics = owner
+        await create_short_url(
+            URLCreate(original_url="https://example.com", custom_alias="taken"),
+            user,
+            fetch_preview=False,
+        )
+        items = [
+            URLCreate(original_url="https://example.com/1"),
+            URLCreate(original_url="https://example.com/2", custom_alias="taken"),
+            URLCreate(original_url="https://example.com/3", custom_alias="fresh"),
+            URLCreate(original_url="https://example.com/4", custom_alias="fresh"),
+            URLCreate(original_url="https://example.com/5"),
+        ]
+        with patch("app.services.url.code_pool.pop_many", new_callable=AsyncMock) as mock_pop:
+            mock_pop.return_value = []
+            results = await create_short_urls(items, user)
+
+        assert results[1] == results[3] == "Custom alias is already taken"
+        created = [results[0], results[2], results[4]]
+        assert all(isinstance(result, ShortURL) for result in created)
+        assert results[2].short_code == "fresh"
+        assert await ShortURL.get_motor_collection().count_documents({}) == 4
+        assert metrics.stats()["alias_conflicts"] == 2
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_validates_items_one_by_one(self, owner):
+        """Test that an invalid raw item gets its own error and the rest are created."""
+        user, _ = owner
+        items = [
+            {"original_url": "https://example.com/1"},
+            {"custom_alias": "ab"},
+            {"original_url": "https://example.com/3", "expiration_days": 0},
+        ]
+        with patch("app.services.url.code_pool.pop_many", new_callable=AsyncMock) as mock_pop:
+            mock_pop.return_value = []
+            results = await create_short_urls(items, user)
+
+        assert isinstance(results[0], ShortURL)
+        assert results[1].startswith("original_url: Field required; custom_alias: ")
+        assert results[2] == "expiration_days: Input should be greater than or equal to 1"
+        assert await ShortURL.get_motor_collection().count_documents({}) == 1
+
+    @pytest.mark.asyncio
+    async def test_bulk_reuse_shares_links_within_a_chunk(self, owner):
+        """Test that items reusing the same new destination get one link between them."""
+        user, _ = owner
+        items = [
+            {"original_url": "https://example.com/a", "reuse_existing": True},
+            {"original_url": "https://EXAMPLE.com/a/", "reuse_existing": True},
+            {"original_url": "https://example.com/a"},
+        ]
+        with patch("app.services.url.code_pool.pop_many", new_callable=AsyncMock) as mock_pop:
+            mock_pop.return_value = []
+            results = await create_short_urls(items, user)
+
+        assert results[1] is results[0]
+        assert results[2].short_code != results[0].short_code
+        assert await ShortURL.get_motor_collection().count_documents({}) == 2
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_retries_colliding_codes(self, owner):
+        """Test that generated codes rejected by the unique index are replaced."""
+        user, metrics = owner
+        await create_short_url(
+            URLCreate(original_url="https://example.com", custom_alias="pool001"),
+            user,
+            fetch_preview=False,
+        )
+        items = [URLCreate(original_url=f"https://example.com/{i}") for i in range(3)]
+        with patch("app.services.url.code_pool.pop_many", new_callable=AsyncMock) as mock_pop:
+            mock_pop.side_effect = [["pool001", "pool002", "pool003"], ["pool004"]]
+            results = await create_short_urls(items, user)
+
+        assert [result.short_code for result in results] == ["pool004", "pool002", "pool003"]
+        assert metrics.stats()["collisions"] == 1
+        assert metrics.stats()["retries"] == 1
+
+
 class TestCustomAliasValidation:
     """Tests for custom alias validation."""
 
@@ -123,6 +374,10 @@ class TestShortenEndpoint:
                 mock_short.preview_title = None
                 mock_short.preview_description = None
                 mock_short.preview_image = None
+                mock_short.preview_status = None
+                mock_short.redirect_policy = "temporary"
+                mock_short.redirect_max_age = None
+                mock_short.click_sample_rate = 1
                 mock_create.return_value = mock_short
 
                 transport = ASGITransport(app=app)
@@ -154,6 +409,10 @@ class TestShortenEndpoint:
                 mock_short.preview_title = None
                 mock_short.preview_description = None
                 mock_short.preview_image = None
+                mock_short.preview_status = None
+                mock_short.redirect_policy = "temporary"
+                mock_short.redirect_max_age = None
+                mock_short.click_sample_rate = 1
                 mock_create.return_value = mock_short
 
                 transport = ASGITransport(app=app)
@@ -182,6 +441,73 @@ class TestShortenEndpoint:
 
         assert response.status_code == 401
 
+    @pytest.mark.asyncio
+    async def test_bulk_shorten_streams_ndjson(self, mock_user, mock_short_url, auth_token):
+        """Test that bulk results stream back one JSON line per item."""
+        with patch("app.core.security.User.find_one", new_callable=AsyncMock) as mock_find:
+            with patch("app.api.urls.create_short_urls", new_callable=AsyncMock) as mock_create:
+                mock_find.return_value = mock_user
+                mock_create.return_value = [
+                    mock_short_url,
+                    "custom_alias: String should have at least 4 characters",
+                ]
+
+                transport = ASGITransport(app=app)
+                async with AsyncClient(transport=transport, base_url="http://test") as client:
+                    response = await client.post(
+                        "/api/v1/urls/shorten/bulk",
+                        json={
+                            "items": [
+                                {"original_url": "https://example.com/a"},
+                                {"original_url": "https://example.com/b", "custom_alias": "a"},
+                            ]
+                        },
+                        headers={"Authorization": f"Bearer {auth_token}"},
+                    )
+
+                # Items are validated one by one, so an invalid item does not 422 the batch
+                assert response.status_code == 200
+                assert response.headers["content-type"] == "application/x-ndjson"
+                lines = [json.loads(line) for line in response.text.splitlines()]
+                assert lines[0]["url"]["short_code"] == mock_short_url.short_code
+                assert lines[1] == {
+                    "index": 1,
+                    "url": None,
+                    "error": "custom_alias: String should have at least 4 characters",
+                }
+
+    @pytest.mark.asyncio
+    async def test_bulk_shorten_reports_failed_chunk(self, mock_user, mock_short_url, auth_token):
+        """Test that a chunk that raises yields an error line per item and the stream goes on."""
+        with (
+            patch("app.api.urls.settings.BULK_SHORTEN_CHUNK_SIZE", 2),
+            patch("app.core.security.User.find_one", new_callable=AsyncMock) as mock_find,
+        ):
+            with patch("app.api.urls.create_short_urls", new_callable=AsyncMock) as mock_create:
+                mock_find.return_value = mock_user
+                mock_create.side_effect = [
+                    [mock_short_url, mock_short_url],
+                    RuntimeError("mongo down"),
+                    [mock_short_url],
+                ]
+
+                transport = ASGITransport(app=app)
+                async with AsyncClient(transport=transport, base_url="http://test") as client:
+                    response = await client.post(
+                        "/api/v1/urls/shorten/bulk",
+                        json={
+                            "items": [
+                                {"original_url": f"https://example.com/{n}"} for n in range(5)
+                            ]
+                        },
+                        headers={"Authorization": f"Bearer {auth_token}"},
+                    )
+
+                lines = [json.loads(line) for line in response.text.splitlines()]
+                assert [line["index"] for line in lines] == [0, 1, 2, 3, 4]
+                assert [line["error"] for line in lines[2:4]] == ["Could not create short URL"] * 2
+                assert lines[4]["url"]["short_code"] == mock_short_url.short_code
+
 
 class TestListURLsEndpoint:
     """Tests for listing user URLs."""
@@ -0,0 +1 @@
+# Standalone background workers
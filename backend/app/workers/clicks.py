@@ -0,0 +1,147 @@
+"""
+Click ingestion worker for CLICK_INGEST_MODE=stream.
+
+Reads click events from the Redis Stream through a consumer group, writes
+them to MongoDB in batches and acknowledges them only once persisted, so
+clicks survive API and worker restarts. Each click log's _id comes from its
+stream entry ID, so entries delivered twice are stored once, and a log is
+marked counted only after its counters are written.
+Run as many as needed:
+
+    python -m app.workers.clicks --consumer worker-1
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+import socket
+
+from redis.exceptions import ResponseError
+
+from app.core.config import settings
+from app.core.database import (
+    close_mongo_connection,
+    close_redis_connection,
+    connect_to_mongo,
+    connect_to_redis,
+    get_redis,
+)
+from app.services.click import record_stream_clicks
+from app.services.click_ingest import decode_click_event
+
+logger = logging.getLogger(__name__)
+
+
+async def ensure_consumer_group(redis) -> None:
+    """Create the stream and consumer group if they do not exist yet."""
+    try:
+        await redis.xgroup_create(
+            settings.CLICK_STREAM_KEY, settings.CLICK_STREAM_GROUP, id="0", mkstream=True
+        )
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def process_entries(redis, entries: list[tuple[str, dict]]) -> int:
+    """Persist a batch of stream entries and acknowledge them. Returns the count stored."""
+    if not entries:
+        return 0
+
+    events = []
+    for entry_id, fields in entries:
+        try:
+            events.append(decode_click_event(fields, stream_id=entry_id))
+        except (KeyError, ValueError):
+            logger.warning("Dropping malformed click event: %r", fields)
+
+    # Counters are written before the ack; if they fail this raises and the
+    # entries stay pending, and the retry counts only the clicks left unmarked
+    await record_stream_clicks(events)
+    await redis.xack(
+        settings.CLICK_STREAM_KEY,
+        settings.CLICK_STREAM_GROUP,
+        *[entry_id for entry_id, _ in entries],
+    )
+    return len(events)
+
+
+async def claim_stale_entries(redis, consumer: str) -> int:
+    """Take over entries left unacknowledged by consumers that died."""
+    claimed = 0
+    start_id = "0-0"
+    while True:
+        response = await redis.xautoclaim(
+            settings.CLICK_STREAM_KEY,
+            settings.CLICK_STREAM_GROUP,
+            consumer,
+            min_idle_time=settings.CLICK_STREAM_CLAIM_IDLE_MS,
+            start_id=start_id,
+            count=settings.CLICK_BATCH_SIZE,
+        )
+        start_id, entries = response[0], response[1]
+        claimed += await process_entries(redis, entries)
+        if start_id == "0-0" or not entries:
+            return claimed
+
+
+async def run(consumer: str, stop: asyncio.Event) -> None:
+    """Consume the click stream until stop is set."""
+    await connect_to_mongo()
+    await connect_to_redis()
+    redis = get_redis()
+    loop = asyncio.get_running_loop()
+    block_ms = int(settings.CLICK_FLUSH_INTERVAL_SECONDS * 1000)
+    next_claim = 0.0
+
+    try:
+        await ensure_consumer_group(redis)
+        logger.info("Consuming %s as %s", settings.CLICK_STREAM_KEY, consumer)
+
+        while not stop.is_set():
+            try:
+                if loop.time() >= next_claim:
+                    await claim_stale_entries(redis, consumer)
+                    next_claim = loop.time() + settings.CLICK_STREAM_CLAIM_IDLE_MS / 1000
+
+                response = await redis.xreadgroup(
+                    settings.CLICK_STREAM_GROUP,
+                    consumer,
+                    {settings.CLICK_STREAM_KEY: ">"},
+                    count=settings.CLICK_BATCH_SIZE,
+                    block=block_ms,
+                )
+                for _, entries in response or []:
+                    await process_entries(redis, entries)
+            except Exception:
+                # Unacknowledged entries are retried through claim_stale_entries
+                logger.exception("Click batch failed, retrying")
+                await asyncio.sleep(1)
+    finally:
+        await close_mongo_connection()
+        await close_redis_connection()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Consume click events from the Redis Stream.")
+    parser.add_argument(
+        "--consumer",
+        default=socket.gethostname(),
+        help="Unique consumer name within the group (default: hostname)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def _main() -> None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await run(args.consumer, stop)
+
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
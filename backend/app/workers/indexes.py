@@ -0,0 +1,142 @@
+"""
+Create the declared MongoDB indexes and report how service queries use them.
+
+Creates any missing index and waits for the builds, then, with --explain,
+prints the winning plan of each query the services run as JSON. Use
+--fail-on-scan in CI or after a deploy to catch queries that fall back to a
+collection scan:
+
+    python -m app.workers.indexes
+    python -m app.workers.indexes --explain --fail-on-scan
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from datetime import timedelta
+
+from beanie import Document
+from bson import ObjectId
+
+from app.core.database import close_mongo_connection, connect_to_mongo, document_models
+from app.core.dates import utc_now
+from app.core.indexes import index_manager, summarize_plan
+from app.core.normalize import url_hash
+from app.models.click import ClickLog, ClickRollup
+from app.models.url import ShortURL
+from app.models.user import User
+from app.services.analytics import clicks_rollup_query, stats_rollup_query
+from app.services.preview_refresh import preview_refresher
+from app.services.url import reusable_link_query
+
+logger = logging.getLogger(__name__)
+
+
+async def sample_values() -> dict:
+    """Take the values to query with from a real link, so plans reflect real data."""
+    doc = await ShortURL.get_motor_collection().find_one({}, {"short_code": 1, "user": 1})
+    if not doc:
+        return {"link_id": ObjectId(), "short_code": "sample1", "user_id": ObjectId()}
+    return {"link_id": doc["_id"], "short_code": doc["short_code"], "user_id": doc["user"].id}
+
+
+def service_queries(sample: dict) -> list[tuple[str, type[Document], dict, list | None]]:
+    """The filters and sorts the services send, named after where they run."""
+    now = utc_now()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    link_id = str(sample["link_id"])
+    user = User.model_construct(id=sample["user_id"])
+
+    return [
+        ("url.get_short_url_by_code", ShortURL, {"short_code": sample["short_code"]}, None),
+        (
+            "url.get_user_urls",
+            ShortURL,
+            {"user.$id": sample["user_id"], "is_active": True},
+            [("created_at", -1)],
+        ),
+        (
+            "url.find_reusable_link",
+            ShortURL,
+            reusable_link_query(user, [url_hash("https://example.com")]),
+            None,
+        ),
+        (
+            "expiry.deactivate_expired",
+            ShortURL,
+            {"is_active": True, "expiration": {"$lte": now}},
+            None,
+        ),
+        (
+            "expiry.archive_expired",
+            ShortURL,
+            {"is_active": False, "expiration": {"$lte": now}},
+            None,
+        ),
+        (
+            "preview_refresh.find_stale",
+            ShortURL,
+            preview_refresher.stale_query(now),
+            [("clicks", -1)],
+        ),
+        ("admin.summary_links_since", ShortURL, {"created_at": {"$gte": today_start}}, None),
+        ("analytics.count_clicks", ClickRollup, clicks_rollup_query(), None),
+        ("analytics.count_clicks_since", ClickRollup, clicks_rollup_query(today_start), None),
+        ("rollup.rebuild_rollups", ClickLog, {"short_url_id": link_id}, None),
+        (
+            "analytics.load_rollups",
+            ClickRollup,
+            stats_rollup_query(link_id, today_start - timedelta(days=30)),
+            None,
+        ),
+        ("auth.get_user_by_email", User, {"email": "someone@example.com"}, None),
+    ]
+
+
+async def explain_queries() -> dict:
+    """Return the summarized winning plan of every service query."""
+    plans = {}
+    for name, model, query, sort in service_queries(await sample_values()):
+        cursor = model.get_motor_collection().find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plans[name] = summarize_plan(await cursor.explain())
+    return plans
+
+
+async def run(explain: bool, fail_on_scan: bool) -> int:
+    """Create missing indexes and optionally report query plans. Returns the exit status."""
+    await connect_to_mongo()
+    try:
+        report = {"created": await index_manager.ensure(document_models())}
+        if index_manager.failed:
+            report["failed"] = index_manager.failed
+        if explain:
+            report["queries"] = await explain_queries()
+        print(json.dumps(report, indent=2))
+    finally:
+        await close_mongo_connection()
+
+    scans = [name for name, plan in report.get("queries", {}).items() if plan["collection_scan"]]
+    if scans:
+        logger.warning("Collection scans: %s", ", ".join(scans))
+    return 1 if index_manager.failed or (fail_on_scan and scans) else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--explain", action="store_true", help="Report each service query plan")
+    parser.add_argument(
+        "--fail-on-scan",
+        action="store_true",
+        help="Exit with status 1 if any query plan scans a whole collection",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(run(args.explain, args.fail_on_scan)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Queue links that predate preview tracking for the preview refresher.
+
+Links stored before previews were tracked have no preview_status at all,
+which the refresher's indexed query does not match. Run once after
+upgrading to mark them pending, so the next refresh passes fetch them:
+
+    python -m app.workers.previews
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.core.database import close_mongo_connection, connect_to_mongo
+from app.models.url import PreviewStatus, ShortURL
+
+logger = logging.getLogger(__name__)
+
+
+async def run() -> int:
+    """Mark untracked active links pending. Returns the exit status."""
+    await connect_to_mongo()
+    try:
+        result = await ShortURL.get_motor_collection().update_many(
+            {"is_active": True, "preview_status": {"$exists": False}},
+            {"$set": {"preview_status": PreviewStatus.PENDING.value, "preview_fetched_at": None}},
+        )
+        logger.info("Queued %d links for a preview refresh", result.modified_count)
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Rebuild click rollups from the raw click logs.
+
+Run once after upgrading, so links clicked before rollups existed get their
+stats back, or to repair rollups after failed writes. Pause click ingestion
+while it runs:
+
+    python -m app.workers.rollups                     # every link
+    python -m app.workers.rollups --short-code abc123
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.core.database import close_mongo_connection, connect_to_mongo
+from app.models.url import ShortURL
+from app.services.rollup import rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+
+async def run(short_code: str | None, batch_size: int) -> int:
+    """Rebuild rollups for one link or all of them. Returns the exit status."""
+    await connect_to_mongo()
+    try:
+        short_url_id = None
+        if short_code:
+            short_url = await ShortURL.find_one({"short_code": short_code})
+            if not short_url:
+                logger.error("No link with short code %s", short_code)
+                return 1
+            short_url_id = str(short_url.id)
+
+        replayed = await rebuild_rollups(short_url_id, batch_size=batch_size)
+        logger.info("Rebuilt rollups from %d click logs", replayed)
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--short-code", help="Only rebuild this link (default: every link)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Click logs per bulk write")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(run(args.short_code, args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()